@@ -2,6 +2,11 @@
 ASGI config for backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests go to Django; WebSocket connections are routed to the
+detection streaming consumers (see detection/streaming.py).
+
+Run with an ASGI server to enable WebSockets, e.g.:
+    uvicorn backend.asgi:application
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +18,26 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Import after Django setup so app modules can use the ORM/settings
+from detection.streaming import websocket_urlpatterns  # noqa: E402
+from detection.pipeline import prewarm_models  # noqa: E402
+
+# Load the detection model in the background instead of on the first frame
+prewarm_models()
+
+
+async def application(scope, receive, send):
+    """
+    Dispatch HTTP to Django and WebSocket connections to their consumer.
+    """
+    if scope["type"] == "websocket":
+        consumer = websocket_urlpatterns.get(scope["path"])
+        if consumer is None:
+            await receive()  # websocket.connect
+            await send({"type": "websocket.close", "code": 4404})
+            return
+        await consumer(scope, receive, send)
+        return
+    await django_application(scope, receive, send)
@@ -0,0 +1,18 @@
+"""
+Celery application for the background jobs (JOB_BACKEND = "celery").
+
+Only needed with the Celery backend (pip install celery redis). Start a worker with:
+    celery -A backend worker --concurrency 2
+
+Settings prefixed with CELERY_ configure it (e.g. CELERY_BROKER_URL).
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+app = Celery("backend")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
@@ -134,9 +134,93 @@ LOGOUT_REDIRECT_URL = "accounts:login"    # Where to redirect after logout
 # RTSP camera stream URL for video processing (update with your actual camera URL)
 CAMERA_RTSP_URL = "rtsp://your_camera_url"
 
+# Cameras read server side by `manage.py run_camera_workers` (camera id -> RTSP URL or video file)
+# e.g. CAMERA_SOURCES="room_12=rtsp://10.0.0.12/stream,room_14=rtsp://10.0.0.14/stream"
+CAMERA_SOURCES = env.dict("CAMERA_SOURCES", default={})
+
+# Adaptive inference rate of server-side cameras (see detection/ratecontrol.py)
+CAMERA_IDLE_FPS      = env.float("CAMERA_IDLE_FPS", default=0.5)       # Empty or quiet room
+CAMERA_PRESENCE_FPS  = env.float("CAMERA_PRESENCE_FPS", default=2.0)   # Someone seen recently
+CAMERA_ACTIVE_FPS    = env.float("CAMERA_ACTIVE_FPS", default=8.0)     # Fall being tracked
+CAMERA_QUIET_SECONDS = env.float("CAMERA_QUIET_SECONDS", default=15.0) # Without anyone seen before idle
+INFERENCE_CPU_BUDGET = env.float("INFERENCE_CPU_BUDGET", default=0.0)  # Inference seconds/second, 0 = unlimited
+
 # Media files settings
 MEDIA_URL  = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
 # Allow same-origin iframes (for embedding dashboards, etc.)
 X_FRAME_OPTIONS = "SAMEORIGIN"
+
+# Inference backend (see detection/backends.py): "ultralytics" (PyTorch) or "onnx" (ONNX Runtime, CPU)
+YOLO_BACKEND   = env("YOLO_BACKEND", default="ultralytics")
+YOLO_IMGSZ     = env.int("YOLO_IMGSZ", default=0)                              # 0 = export size (640)
+YOLO_VARIANT   = env("YOLO_VARIANT", default="")                               # e.g. "int8-416" (see backends.VARIANTS)
+ONNX_PROVIDERS = env.list("ONNX_PROVIDERS", default=["CPUExecutionProvider"])  # e.g. OpenVINOExecutionProvider
+ONNX_THREADS   = env.int("ONNX_THREADS", default=0)                            # 0 = ONNX Runtime default
+YOLO_PREWARM   = env.bool("YOLO_PREWARM", default=True)                        # Load + warm up the model at server start (wsgi/asgi)
+
+# Shared inference server (manage.py run_inference_server): when set, web workers send their
+# frames over this Unix socket + shared memory instead of loading their own copy of the model
+INFERENCE_SERVER_SOCKET = env("INFERENCE_SERVER_SOCKET", default="")
+
+# Whole-video analysis of test uploads (detection/video_analysis.py)
+VIDEO_ANALYSIS_STRIDE     = env.int("VIDEO_ANALYSIS_STRIDE", default=5)       # Infer one frame out of N
+VIDEO_ANALYSIS_BATCH_SIZE = env.int("VIDEO_ANALYSIS_BATCH_SIZE", default=8)   # Frames per model call
+VIDEO_ANALYSIS_WORKERS    = env.int("VIDEO_ANALYSIS_WORKERS", default=2)      # Worker processes (0 = in-process)
+
+# Background jobs (detection/jobs.py): "thread" (pool in the web process), "celery" or "sync"
+JOB_BACKEND       = env("JOB_BACKEND", default="thread")
+JOB_WORKERS       = env.int("JOB_WORKERS", default=2)                          # Jobs running at once ("thread")
+CELERY_BROKER_URL = env("CELERY_BROKER_URL", default="redis://localhost:6379/0")
+
+# Micro-batching of live YOLO inference (see detection/batching.py)
+YOLO_BATCH_WINDOW_MS  = env.float("YOLO_BATCH_WINDOW_MS", default=20.0)  # Collection window per batch
+YOLO_BATCH_MAX_SIZE   = env.int("YOLO_BATCH_MAX_SIZE", default=8)        # Max frames per model call
+
+# Unchanged frames reuse the previous detection instead of running YOLO (see detection/motion.py)
+MOTION_GATE_THRESHOLD     = env.float("MOTION_GATE_THRESHOLD", default=15.0)       # Per-pixel gray-level change; 0 disables
+MOTION_GATE_MIN_CHANGED   = env.float("MOTION_GATE_MIN_CHANGED", default=0.002)    # Fraction of changed pixels that triggers YOLO
+MOTION_GATE_MAX_SKIP_SECS = env.float("MOTION_GATE_MAX_SKIP_SECS", default=2.0)    # YOLO still runs at least this often
+
+# Fall tracker state: "memory" (per process) or "cache" (shared by all workers through
+# Django's cache; configure a cross-process CACHES backend such as Redis or the database)
+FALL_TRACKER_BACKEND     = env("FALL_TRACKER_BACKEND", default="memory")
+FALL_TRACKER_CACHE_ALIAS = env("FALL_TRACKER_CACHE_ALIAS", default="default")
+
+# Background alert writer (see detection/alert_writer.py)
+ALERT_WRITER_QUEUE_SIZE = env.int("ALERT_WRITER_QUEUE_SIZE", default=64)  # Events beyond this are dropped
+ALERT_WRITER_SYNC       = env.bool("ALERT_WRITER_SYNC", default=False)    # Write inline (debugging)
+
+# Snapshot/clip encoding (see detection/encoding.py)
+SNAPSHOT_JPEG_QUALITY = env.int("SNAPSHOT_JPEG_QUALITY", default=80)
+SNAPSHOT_MAX_WIDTH    = env.int("SNAPSHOT_MAX_WIDTH", default=0)     # 0 = keep the frame width
+CLIP_FOURCC           = env("CLIP_FOURCC", default="mp4v")
+CLIP_MAX_WIDTH        = env.int("CLIP_MAX_WIDTH", default=0)         # 0 = keep the frame width
+
+# Per-camera ring buffer of recent frames for alert clips (see detection/framebuffer.py)
+FRAME_BUFFER_SECONDS      = env.float("FRAME_BUFFER_SECONDS", default=15.0)      # 0 disables clips; raised to PRE + POST + 5 s
+FRAME_BUFFER_MAX_BYTES    = env.int("FRAME_BUFFER_MAX_BYTES", default=32 * 1024 * 1024)  # Hard cap per camera
+FRAME_BUFFER_JPEG_QUALITY = env.int("FRAME_BUFFER_JPEG_QUALITY", default=70)
+CLIP_PRE_SECONDS          = env.float("CLIP_PRE_SECONDS", default=5.0)
+CLIP_POST_SECONDS         = env.float("CLIP_POST_SECONDS", default=5.0)
+
+# Dashboard statistics are cached and dropped whenever an alert changes (see detection/stats.py)
+DASHBOARD_STATS_TIMEOUT = env.int("DASHBOARD_STATS_TIMEOUT", default=300)
+
+# Live alert events (/detection/alerts/events/, see detection/events.py). With a Redis URL every
+# process publishes through Redis pub/sub; without it the stream polls the database for alerts
+# saved by other processes (camera workers, jobs, other web workers) every ALERT_EVENTS_POLL_SECS
+ALERT_EVENTS_REDIS_URL = env("ALERT_EVENTS_REDIS_URL", default="")
+ALERT_EVENTS_POLL_SECS = env.float("ALERT_EVENTS_POLL_SECS", default=5.0)
+
+# Alert feed polls (/detection/alerts/feed/?since=) re-send this many seconds before the cursor:
+# an alert's timestamp is set before its row commits, so it can land behind an earlier poll
+ALERT_FEED_OVERLAP_SECS = env.float("ALERT_FEED_OVERLAP_SECS", default=10.0)
+
+# Live alerts are deduplicated per (camera, person) incident (see detection/incidents.py)
+INCIDENT_TTL_SECS = env.float("INCIDENT_TTL_SECS", default=30.0)   # Incident closes after this long unseen
+
+# Per-frame incident samples are inserted in batches (see detection/observations.py)
+OBSERVATION_BATCH_SIZE = env.int("OBSERVATION_BATCH_SIZE", default=200)
+OBSERVATION_FLUSH_SECS = env.float("OBSERVATION_FLUSH_SECS", default=2.0)   # Max wait of a sample
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Load the detection model in the background instead of on the first frame
+from detection.pipeline import prewarm_models  # noqa: E402
+
+prewarm_models()
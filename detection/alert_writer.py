@@ -0,0 +1,184 @@
+"""
+Background alert persistence.
+
+Live frames only need inference and tracking before the response is sent;
+the database writes and snapshot encoding of the resulting alert are handed
+to AlertWriter, a worker thread fed by a bounded queue. When the queue is
+full the event is dropped (and counted) rather than blocking the live path:
+the next sighting of the same incident carries fresher data anyway.
+Due alert clips (framebuffer.PendingClip) go through the same queue, and an
+optional `tick` callback lets batched writers (observations.py) flush from
+the writer thread.
+"""
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import numpy as np
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AlertEvent:
+    """A live detection to persist as (or into) a FallAlert."""
+    camera_id: str
+    frame: np.ndarray
+    confidence: Optional[float]
+    fall_state: str
+    time_on_ground: float
+    track_id: Optional[str] = None
+    bbox: Optional[tuple] = None     # (x1, y1, x2, y2) of the person, if detected on this frame
+    created_at: float = field(default_factory=time.time)
+
+
+class AlertWriter:
+    """
+    Persists AlertEvents on a background thread with a bounded queue.
+
+    Attributes:
+        handler (Callable[[AlertEvent], None]): Does the actual DB/snapshot work.
+        maxsize (int): Queue capacity; events beyond it are dropped.
+        synchronous (bool): Run the handler inline instead (tests, debugging).
+        tick (Callable[[], None] | None): Called on the writer thread after every
+            event and at least every `tick_interval` seconds.
+    """
+    def __init__(
+        self,
+        handler: Callable[[AlertEvent], None],
+        maxsize: int = 64,
+        synchronous: bool = False,
+        tick: Optional[Callable[[], None]] = None,
+        tick_interval: float = 1.0,
+    ) -> None:
+        """
+        Args:
+            handler (Callable[[AlertEvent], None]): Does the actual DB/snapshot work.
+            maxsize (int): Queue capacity.
+            synchronous (bool): Run the handler inline instead of on the writer thread.
+            tick (Callable[[], None] | None): Periodic callback of the writer thread.
+            tick_interval (float): Maximum seconds between two ticks when idle.
+        """
+        self.handler = handler
+        self.maxsize = maxsize
+        self.synchronous = synchronous
+        self.tick = tick
+        self.tick_interval = tick_interval
+
+        self._queue: "queue.Queue[Optional[AlertEvent]]" = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_queue_depth = 0
+        self._write_seconds = 0.0
+        self._lag_seconds = 0.0
+
+    def submit(self, event: AlertEvent) -> bool:
+        """
+        Queue an event without blocking.
+
+        Returns:
+            bool: False if the queue was full and the event was dropped.
+        """
+        self.submitted += 1
+        if self.synchronous:
+            self._handle(event)
+            return True
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return True
+
+    def flush(self) -> None:
+        """Block until every queued event has been handled."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Handle the queued events and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def metrics(self) -> dict:
+        """Queue depth, throughput and drop counters, to spot saturation."""
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self.maxsize,
+            "max_queue_depth": self.max_queue_depth,
+            "submitted": self.submitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "avg_write_ms": (self._write_seconds / self.written * 1000) if self.written else 0.0,
+            "avg_lag_ms": (self._lag_seconds / self.written * 1000) if self.written else 0.0,
+        }
+
+    def _ensure_started(self) -> None:
+        """Start the writer thread on first use."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="alert-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        """Writer loop."""
+        while True:
+            try:
+                event = self._queue.get(timeout=self.tick_interval if self.tick else None)
+            except queue.Empty:
+                self._tick()
+                continue
+            try:
+                if event is None:
+                    return
+                self._handle(event)
+                self._tick()
+            finally:
+                self._queue.task_done()
+
+    def _tick(self) -> None:
+        """Run the tick callback, if any."""
+        if self.tick is None:
+            return
+        try:
+            self.tick()
+        except Exception:
+            logger.exception("Alert writer tick failed")
+        finally:
+            close_old_connections()
+
+    def _handle(self, event: AlertEvent) -> None:
+        """Run the handler for one event and record its timing."""
+        start = time.perf_counter()
+        try:
+            self.handler(event)
+        except Exception:
+            self.errors += 1
+            logger.exception("Failed to persist alert for camera %s", event.camera_id)
+            return
+        finally:
+            if not self.synchronous:
+                close_old_connections()
+        self.written += 1
+        self._write_seconds += time.perf_counter() - start
+        self._lag_seconds += time.time() - event.created_at
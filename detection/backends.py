@@ -0,0 +1,424 @@
+"""
+Inference backends for FallDetectionService.
+
+- "ultralytics": the PyTorch weights run through `ultralytics.YOLO` (default).
+- "onnx": the same network exported to ONNX and run by ONNX Runtime on the
+  CPU, without PyTorch in the request path. Pre-processing (letterbox) and
+  post-processing (class-aware NMS, box rescaling) are done in NumPy and
+  mirror the Ultralytics predictor, so both backends take the same
+  Fall-Detected decisions.
+
+OnnxYoloModel returns result objects exposing `names` and
+`boxes.cpu().numpy().xyxy/cls/conf` like Ultralytics Results, so
+FallDetectionService.to_detection works unchanged on either backend.
+
+A `.pt` path given to the ONNX backend is exported once next to the
+weights (`best.pt` → `best.onnx`, requires the `onnx` package); a
+pre-exported `.onnx` file is loaded directly. Other ONNX Runtime execution
+providers (e.g. "OpenVINOExecutionProvider" from onnxruntime-openvino) can be
+selected with settings.ONNX_PROVIDERS.
+
+Model variants (VARIANTS) trade accuracy for speed: smaller input sizes and
+dynamic INT8 quantization of the ONNX export (`best.int8.onnx`). Compare them
+on labeled footage with `manage.py evaluate_variants`.
+
+Settings:
+    YOLO_BACKEND ("ultralytics" or "onnx"), YOLO_IMGSZ, YOLO_VARIANT,
+    ONNX_PROVIDERS, ONNX_THREADS
+"""
+
+import ast
+import importlib.util
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("ultralytics", "onnx")
+EXPORT_IMGSZ = 640   # Metadata size of the (dynamic) ONNX exports
+
+
+def onnxruntime_available() -> bool:
+    """True if onnxruntime is installed (without importing it)."""
+    return importlib.util.find_spec("onnxruntime") is not None
+
+
+def _onnxruntime():
+    """Import onnxruntime on first use (optional dependency, slow to import)."""
+    try:
+        import onnxruntime
+    except ImportError as e:  # Optional dependency: pip install onnxruntime
+        raise ImportError("The ONNX backend requires onnxruntime (pip install onnxruntime)") from e
+    return onnxruntime
+
+# Ultralytics predictor defaults, kept identical for parity
+DEFAULT_CONF = 0.25
+DEFAULT_IOU = 0.7
+MAX_DET = 300
+MAX_WH = 7680           # Box offset per class for class-aware NMS
+PAD_VALUE = 114
+
+
+@dataclass(frozen=True)
+class ModelVariant:
+    """A way of running the weights: backend, input size and quantization."""
+    name: str
+    backend: str = "onnx"
+    imgsz: Optional[int] = None      # None = export size (640)
+    quantize: Optional[str] = None   # "int8": dynamic INT8 quantization of the ONNX export
+    description: str = ""
+
+    def options(self) -> dict:
+        """Keyword arguments of load_model for this variant."""
+        return {"imgsz": self.imgsz, "quantize": self.quantize} if self.backend == "onnx" else {}
+
+
+# With dynamic exports the letterbox pads to the minimum rectangle, so the 320
+# variants are also the half-resolution letterbox (a 640x480 frame becomes 320x256)
+VARIANTS = {v.name: v for v in (
+    ModelVariant("torch-640", backend="ultralytics", description="PyTorch weights (reference)"),
+    ModelVariant("fp32-640", imgsz=640, description="ONNX Runtime, full resolution"),
+    ModelVariant("fp32-416", imgsz=416, description="ONNX Runtime, 416 px input"),
+    ModelVariant("fp32-320", imgsz=320, description="ONNX Runtime, half-resolution letterbox"),
+    ModelVariant("int8-640", imgsz=640, quantize="int8", description="Dynamic INT8, full resolution"),
+    ModelVariant("int8-416", imgsz=416, quantize="int8", description="Dynamic INT8, 416 px input"),
+    ModelVariant("int8-320", imgsz=320, quantize="int8", description="Dynamic INT8, half-resolution letterbox"),
+)}
+
+
+def get_variant(name: str) -> ModelVariant:
+    """
+    Return a model variant by name.
+
+    Raises:
+        ValueError: If the variant is unknown.
+    """
+    try:
+        return VARIANTS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model variant '{name}', expected one of {sorted(VARIANTS)}") from None
+
+
+@dataclass
+class Letterbox:
+    """Resize/pad parameters of one image, used to map boxes back to it."""
+    orig_shape: Tuple[int, int]   # (height, width) of the source image
+    gain: Tuple[float, float]     # (x, y) resize factors
+    pad: Tuple[int, int]          # (left, top) padding in pixels
+
+
+def letterbox(image: np.ndarray, new_shape: Tuple[int, int] = (640, 640), stride: int = 32,
+              auto: bool = False) -> Tuple[np.ndarray, Letterbox]:
+    """
+    Resize an image keeping its aspect ratio and pad it to `new_shape` (Ultralytics LetterBox).
+
+    Args:
+        image (np.ndarray): BGR image.
+        new_shape (Tuple[int, int]): Target (height, width).
+        stride (int): Model stride.
+        auto (bool): Pad only up to the next multiple of `stride` (minimum rectangle).
+
+    Returns:
+        Tuple[np.ndarray, Letterbox]: The padded image and its parameters.
+    """
+    shape = image.shape[:2]
+    r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])
+    new_unpad = round(shape[1] * r), round(shape[0] * r)
+    dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
+    if auto:
+        dw, dh = dw % stride, dh % stride
+    dw, dh = dw / 2, dh / 2
+
+    if shape[::-1] != new_unpad:
+        image = cv2.resize(image, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = round(dh - 0.1), round(dh + 0.1)
+    left, right = round(dw - 0.1), round(dw + 0.1)
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                               value=(PAD_VALUE,) * 3)
+    gain = (new_unpad[0] / shape[1], new_unpad[1] / shape[0])
+    return image, Letterbox(orig_shape=shape, gain=gain, pad=(left, top))
+
+
+def preprocess(images: Sequence[np.ndarray], imgsz: Tuple[int, int], stride: int = 32,
+               auto: bool = False) -> Tuple[np.ndarray, List[Letterbox]]:
+    """
+    Letterbox BGR images into one normalized NCHW RGB float32 batch.
+
+    Returns:
+        Tuple[np.ndarray, List[Letterbox]]: The batch and the parameters of each image.
+    """
+    auto = auto and len({im.shape for im in images}) == 1
+    padded, boxes = zip(*(letterbox(im, imgsz, stride, auto) for im in images))
+    batch = np.stack(padded)[..., ::-1].transpose(0, 3, 1, 2)   # BGR→RGB, NHWC→NCHW
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0, list(boxes)
+
+
+def box_iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:
+    """IoU of one xyxy box against an (N, 4) array of boxes."""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / (area + areas - inter + 1e-9)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Greedy non-maximum suppression.
+
+    Returns:
+        np.ndarray: Indices of the kept boxes, by decreasing score.
+    """
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        if order.size == 1:
+            break
+        rest = order[1:]
+        order = rest[box_iou(boxes[i], boxes[rest]) <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def postprocess(output: np.ndarray, letterboxes: Sequence[Letterbox], conf: float = DEFAULT_CONF,
+                iou: float = DEFAULT_IOU, max_det: int = MAX_DET) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Decode raw YOLOv8 outputs into boxes of the original images.
+
+    Args:
+        output (np.ndarray): Model output of shape (batch, 4 + classes, anchors),
+            boxes as center x, center y, width, height in letterboxed pixels.
+        letterboxes (Sequence[Letterbox]): Parameters of each image of the batch.
+        conf (float): Minimum class score kept.
+        iou (float): NMS IoU threshold (boxes of different classes never suppress each other).
+        max_det (int): Maximum boxes per image.
+
+    Returns:
+        List[Tuple[np.ndarray, np.ndarray, np.ndarray]]: (xyxy, class ids, scores) per image.
+    """
+    results = []
+    for pred, lb in zip(output.transpose(0, 2, 1), letterboxes):
+        class_scores = pred[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(pred)), class_ids]
+        mask = scores > conf
+        xywh, class_ids, scores = pred[mask, :4], class_ids[mask], scores[mask]
+
+        xyxy = np.empty_like(xywh)
+        xyxy[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+        xyxy[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+
+        keep = nms(xyxy + class_ids[:, None] * MAX_WH, scores, iou)[:max_det]
+        xyxy, class_ids, scores = xyxy[keep], class_ids[keep], scores[keep]
+
+        # Back to the original image
+        xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - lb.pad[0]) / lb.gain[0]
+        xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - lb.pad[1]) / lb.gain[1]
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, lb.orig_shape[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, lb.orig_shape[0])
+        results.append((xyxy.astype(np.float32), class_ids.astype(np.int64), scores.astype(np.float32)))
+    return results
+
+
+@dataclass
+class OnnxBoxes:
+    """Boxes of one image, with the accessors of Ultralytics Boxes."""
+    xyxy: np.ndarray
+    cls: np.ndarray
+    conf: np.ndarray
+
+    def cpu(self) -> "OnnxBoxes":
+        return self
+
+    def numpy(self) -> "OnnxBoxes":
+        return self
+
+
+@dataclass
+class OnnxResult:
+    """Result of one image, with the attributes of Ultralytics Results used by the app."""
+    boxes: OnnxBoxes
+    names: Dict[int, str] = field(default_factory=dict)
+    orig_shape: Tuple[int, int] = (0, 0)
+
+
+class OnnxYoloModel:
+    """
+    YOLOv8 detection model exported to ONNX, run with ONNX Runtime.
+
+    Called like an Ultralytics YOLO model: `model(image)` or `model([images])`
+    returns one OnnxResult per image.
+
+    Attributes:
+        path (str): ONNX file.
+        names (Dict[int, str]): Class names (from the export metadata).
+        imgsz (Tuple[int, int]): Inference size (height, width).
+    """
+    def __init__(self, path: str, imgsz: Optional[int] = None, conf: float = DEFAULT_CONF,
+                 iou: float = DEFAULT_IOU, providers: Optional[List[str]] = None,
+                 threads: int = 0) -> None:
+        """
+        Args:
+            path (str): ONNX file exported by Ultralytics.
+            imgsz (int | None): Inference size; defaults to the export size.
+            conf (float): Minimum class score kept (Ultralytics default 0.25).
+            iou (float): NMS IoU threshold (Ultralytics default 0.7).
+            providers (List[str] | None): ONNX Runtime execution providers (CPU by default).
+            threads (int): Intra-op threads (0 lets ONNX Runtime decide).
+
+        Raises:
+            ImportError: If onnxruntime is not installed.
+        """
+        ort = _onnxruntime()
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            path, sess_options=options, providers=providers or ["CPUExecutionProvider"]
+        )
+        self.path = path
+        self.conf = conf
+        self.iou = iou
+
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = {int(k): v for k, v in ast.literal_eval(meta.get("names", "{}")).items()}
+        self.stride = int(meta.get("stride", 32))
+        export_size = ast.literal_eval(meta.get("imgsz", "[640, 640]"))
+        self.imgsz = (imgsz, imgsz) if imgsz else tuple(export_size)
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Dynamic exports accept any stride multiple: pad to the minimum rectangle like Ultralytics does
+        self.dynamic = not all(isinstance(dim, int) for dim in model_input.shape[2:])
+        self.batch_size = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+
+    def __call__(self, image: np.ndarray | List[np.ndarray]) -> List[OnnxResult]:
+        """Run the model on a BGR image or a list of images."""
+        images = image if isinstance(image, (list, tuple)) else [image]
+        if not images:
+            return []
+        if self.batch_size is not None and len(images) != self.batch_size:
+            # Static batch export: one session run per image
+            return [r for im in images for r in self(im)]
+
+        batch, letterboxes = preprocess(images, self.imgsz, self.stride, auto=self.dynamic)
+        output = self.session.run(None, {self.input_name: batch})[0]
+        return [
+            OnnxResult(OnnxBoxes(xyxy, cls, conf), self.names, lb.orig_shape)
+            for (xyxy, cls, conf), lb in zip(postprocess(output, letterboxes, self.conf, self.iou),
+                                             letterboxes)
+        ]
+
+
+def export_onnx(weights: str, path: Optional[str] = None) -> str:
+    """
+    Export PyTorch weights to ONNX (dynamic batch and image size, 640 px metadata).
+
+    The export runs on a copy of the weights in a temporary directory next to
+    them and is moved into place with os.replace, so a process loading `path`
+    while another one exports never reads a half-written file.
+
+    Args:
+        weights (str): `.pt` weights.
+        path (str | None): Destination (defaults to the weights path with `.onnx`).
+
+    Returns:
+        str: Path of the ONNX file.
+    """
+    from ultralytics import YOLO
+
+    path = path or os.path.splitext(weights)[0] + ".onnx"
+    logger.info("Exporting %s to ONNX", weights)
+    tmpdir = tempfile.mkdtemp(prefix=".export-", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        copy = shutil.copy(weights, tmpdir)
+        exported = YOLO(copy).export(format="onnx", imgsz=EXPORT_IMGSZ, dynamic=True, simplify=False)
+        os.replace(exported, path)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return path
+
+
+def onnx_path_for(weights: str) -> str:
+    """
+    Return the ONNX file for a weights path, exporting `.pt` weights when the
+    ONNX file is missing or older than them. The export is always made at
+    EXPORT_IMGSZ: it is dynamic, and the inference size is chosen when loading.
+    """
+    if not weights.endswith(".pt"):
+        return weights
+    path = os.path.splitext(weights)[0] + ".onnx"
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(weights):
+        export_onnx(weights, path)
+    return path
+
+
+def quantized_path_for(onnx_path: str) -> str:
+    """
+    Return the dynamically INT8-quantized copy of an ONNX file (`best.onnx` →
+    `best.int8.onnx`), creating it when missing or older than the source.
+    Like the export, the quantized model is written to a temporary file and
+    moved into place.
+    """
+    base, ext = os.path.splitext(onnx_path)
+    if base.endswith(".int8"):
+        return onnx_path
+    path = f"{base}.int8{ext}"
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(onnx_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info("Quantizing %s to INT8", onnx_path)
+        fd, tmp = tempfile.mkstemp(prefix=".quantize-", suffix=ext, dir=os.path.dirname(os.path.abspath(path)))
+        os.close(fd)
+        try:
+            quantize_dynamic(onnx_path, tmp, weight_type=QuantType.QUInt8)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return path
+
+
+def load_model(model_path: str, backend: str = "ultralytics", imgsz: Optional[int] = None,
+               providers: Optional[List[str]] = None, threads: int = 0,
+               quantize: Optional[str] = None):
+    """
+    Load the detection model with the requested backend.
+
+    The ONNX options (imgsz, providers, threads, quantize) are ignored by the
+    Ultralytics backend.
+
+    Args:
+        model_path (str): `.pt` weights, or an exported `.onnx` file for the ONNX backend.
+        backend (str): "ultralytics" or "onnx".
+        imgsz (int | None): Inference size for the ONNX backend.
+        providers (List[str] | None): ONNX Runtime execution providers.
+        threads (int): ONNX Runtime intra-op threads.
+        quantize (str | None): "int8" to run a dynamically quantized copy (ONNX backend).
+
+    Raises:
+        ValueError: If the backend or the quantization is unknown.
+    """
+    if backend == "ultralytics":
+        from ultralytics import YOLO
+        return YOLO(model_path)
+    if backend == "onnx":
+        if quantize not in (None, "int8"):
+            raise ValueError(f"Unknown quantization '{quantize}', expected 'int8'")
+        _onnxruntime()
+        path = onnx_path_for(model_path)
+        if quantize:
+            path = quantized_path_for(path)
+        return OnnxYoloModel(path, imgsz=imgsz, providers=providers, threads=threads)
+    raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
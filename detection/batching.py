@@ -0,0 +1,213 @@
+"""
+Micro-batching scheduler for YOLO inference.
+
+Frames submitted by concurrent requests (several browser tabs or cameras
+posting to /run-yolo/) are collected for a short window and run through
+the model as a single batched call. Each caller blocks only on its own
+result. Batched inference gives much better throughput per CPU core than
+a series of batch-of-one calls.
+"""
+
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .services import Detection, FallDetectionService
+
+
+class FrameFuture(Future):
+    """Future of one frame's Detection, with the model seconds spent on the frame."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.cost: Optional[float] = None   # Set before the result
+
+
+class BatchingScheduler:
+    """
+    Collects frames for up to `window_ms` (or `max_batch_size` frames) and
+    runs them as one `FallDetectionService.detect_batch` call.
+
+    Attributes:
+        service (FallDetectionService): Service used to run the batches.
+        window_ms (float): How long the first frame of a batch waits for company.
+        max_batch_size (int): Maximum number of frames in one model call.
+    """
+    def __init__(
+        self,
+        service: FallDetectionService,
+        window_ms: float = 20.0,
+        max_batch_size: int = 8
+    ) -> None:
+        """
+        Args:
+            service (FallDetectionService): Service used to run the batches.
+            window_ms (float): Collection window in milliseconds.
+            max_batch_size (int): Maximum number of frames per batch.
+        """
+        self.service = service
+        self.window_ms = window_ms
+        self.max_batch_size = max(1, int(max_batch_size))
+
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+        # Metrics
+        self._batches = 0
+        self._frames = 0
+        self._last_batch_size = 0
+        self._max_batch_seen = 0
+        self._max_queue_depth = 0
+        self._batch_sizes: Counter = Counter()
+        self._inference_seconds = 0.0
+
+    def submit(self, image: np.ndarray, timeout: Optional[float] = None) -> Detection:
+        """
+        Queue an image for the next batch and wait for its Detection.
+
+        Args:
+            image (np.ndarray): Input image in BGR format.
+            timeout (float | None): Maximum time to wait for the result, in seconds.
+
+        Returns:
+            Detection: Detection record of this image.
+        """
+        return self.submit_async(image).result(timeout=timeout)
+
+    def submit_timed(self, image: np.ndarray, timeout: Optional[float] = None) -> Tuple[Detection, float]:
+        """
+        Like `submit`, also returning the model seconds spent on this image: its
+        share of its own batch's inference time, without the collection window.
+
+        Returns:
+            tuple: (Detection, cost in seconds).
+        """
+        future = self.submit_async(image)
+        detection = future.result(timeout=timeout)
+        return detection, future.cost
+
+    def submit_async(self, image: np.ndarray) -> "FrameFuture":
+        """
+        Queue an image for the next batch and return a Future of its Detection.
+        """
+        self._ensure_started()
+        future = FrameFuture()
+        self._queue.put((image, future))
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+        return future
+
+    def close(self) -> None:
+        """Stop the worker thread once the queued frames have been processed."""
+        with self._lock:
+            self._stopped = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def metrics(self) -> dict:
+        """
+        Return queue-depth and batch-size metrics to tune the window.
+        """
+        return {
+            "window_ms": self.window_ms,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self._max_queue_depth,
+            "batches": self._batches,
+            "frames": self._frames,
+            "avg_batch_size": (self._frames / self._batches) if self._batches else 0.0,
+            "last_batch_size": self._last_batch_size,
+            "max_batch_size_seen": self._max_batch_seen,
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            "avg_batch_latency_ms": (
+                self._inference_seconds / self._batches * 1000 if self._batches else 0.0
+            ),
+        }
+
+    def _ensure_started(self) -> None:
+        """Start the worker thread on first use."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("BatchingScheduler is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="yolo-batching", daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self) -> Optional[List[Tuple[np.ndarray, Future]]]:
+        """
+        Block for the first frame, then gather more until the window closes
+        or the batch is full. Returns None when the scheduler is closed.
+        """
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.window_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Process what we have, then stop on the next loop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        """Worker loop: collect a batch, run it, hand results back."""
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            # Skip callers that already gave up
+            batch = [(img, fut) for img, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                detections = self.service.detect_batch([img for img, _ in batch])
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - start
+
+            if len(detections) != len(batch):
+                # Never leave a caller waiting on a result that will not come
+                error = RuntimeError(
+                    f"detect_batch returned {len(detections)} detections for {len(batch)} frames"
+                )
+                for _, fut in batch:
+                    fut.set_exception(error)
+                continue
+
+            for (_, fut), detection in zip(batch, detections):
+                fut.cost = elapsed / len(batch)
+                fut.set_result(detection)
+
+            size = len(batch)
+            self._inference_seconds += elapsed
+            self._batches += 1
+            self._frames += size
+            self._last_batch_size = size
+            self._max_batch_seen = max(self._max_batch_seen, size)
+            self._batch_sizes[size] += 1
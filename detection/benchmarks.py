@@ -0,0 +1,403 @@
+"""
+Micro-benchmarks for the detection pipeline.
+
+Each benchmark is a plain function that takes keyword options and returns a
+dict of results. They are registered in BENCHMARKS and run through the
+`benchmark` management command:
+
+    python manage.py benchmark ingest --iterations 200
+
+The module also holds the accuracy helpers of the `evaluate_variants`
+command: precision/recall of the Fall-Detected decision on a labeled folder
+with one sub-folder per label, images and/or videos (every
+`video_stride`-th frame of a video takes the label of its folder):
+
+    dataset/fall/...       frames showing a fallen person
+    dataset/no_fall/...    anything else
+"""
+
+import base64
+import glob
+import json
+import os
+import statistics
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+def synthetic_frame(width: int = 640, height: int = 480, seed: int = 0) -> np.ndarray:
+    """
+    Build a deterministic BGR frame with camera-like content (smooth gradients + noise),
+    so JPEG sizes are realistic rather than trivially compressible.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = (x[None, :] * 0.6 + y * 0.4)
+    frame = np.stack([base, base[::-1], np.flip(base, axis=1)], axis=-1)
+    frame += rng.normal(0, 12, frame.shape).astype(np.float32)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def time_call(fn: Callable[[], object], iterations: int) -> Dict[str, float]:
+    """
+    Time `fn` over `iterations` calls and return mean/p50/p95 latencies in milliseconds.
+    """
+    samples: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def bench_ingest(iterations: int = 200, **options) -> dict:
+    """
+    Compare per-frame parse latency and bytes on the wire of the JSON/base64
+    contract against the raw `image/jpeg` and multipart bodies.
+    """
+    from django.test import RequestFactory
+    from .ingest import decode_request_frame
+
+    _, buf = cv2.imencode(".jpg", synthetic_frame(), [cv2.IMWRITE_JPEG_QUALITY, 80])
+    jpeg = buf.tobytes()
+    json_body = json.dumps({"image": base64.b64encode(jpeg).decode()}).encode()
+    factory = RequestFactory()
+
+    def json_request():
+        return factory.post("/run-yolo/", data=json_body, content_type="application/json")
+
+    def raw_request():
+        return factory.post("/run-yolo/", data=jpeg, content_type="image/jpeg")
+
+    def multipart_request():
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        upload = SimpleUploadedFile("frame.jpg", jpeg, content_type="image/jpeg")
+        return factory.post("/run-yolo/", data={"image": upload})
+
+    results = {}
+    for name, build in (("json_base64", json_request),
+                        ("raw_jpeg", raw_request),
+                        ("multipart", multipart_request)):
+        sample = build()
+        wire_bytes = len(sample.body)
+        requests = [build() for _ in range(iterations)]
+        it = iter(requests)
+        timings = time_call(lambda: decode_request_frame(next(it)), iterations)
+        results[name] = {"wire_bytes": wire_bytes, **timings}
+
+    results["json_overhead_pct"] = (
+        (results["json_base64"]["wire_bytes"] / results["raw_jpeg"]["wire_bytes"] - 1) * 100
+    )
+    return results
+
+
+def _random_boxes(rng, count: int, width: int = 640, height: int = 480) -> np.ndarray:
+    """Random xyxy boxes of person-on-the-floor size inside a frame."""
+    x1 = rng.uniform(0, width - 200, count)
+    y1 = rng.uniform(0, height - 120, count)
+    w = rng.uniform(80, 200, count)
+    h = rng.uniform(40, 120, count)
+    return np.stack([x1, y1, x1 + w, y1 + h], axis=1)
+
+
+def bench_association(iterations: int = 200, cameras: int = 48, people: int = 5, **options) -> dict:
+    """
+    Time the vectorized track/detection association for many cameras × people per frame,
+    and a full tracker update of every camera: one camera at a time as the live
+    pipeline does it, and batched across cameras with TrackerRegistry.update_many.
+    """
+    from .tracking import associate, TrackerRegistry
+
+    rng = np.random.default_rng(0)
+    tracks = np.stack([_random_boxes(rng, people) for _ in range(cameras)])
+    dets = tracks + rng.normal(0, 4, tracks.shape)  # small jitter between frames
+
+    per_camera = time_call(
+        lambda: [associate(tracks[c], dets[c]) for c in range(cameras)], iterations
+    )
+    batched = time_call(lambda: associate(tracks, dets), iterations)
+
+    # Full tracker update (association + state updates) for every camera
+    boxes_by_camera = {f"cam_{c}": dets[c] for c in range(cameras)}
+    live = TrackerRegistry()
+    trackers = {cid: live.get(cid) for cid in boxes_by_camera}
+    for c, tracker in enumerate(trackers.values()):
+        tracker.update_frame(tracks[c])
+
+    def update_each_camera():
+        for cid, tracker in trackers.items():
+            with tracker.transaction():
+                tracker.update_frame(boxes_by_camera[cid])
+
+    per_camera_update = time_call(update_each_camera, iterations)
+
+    batched_registry = TrackerRegistry()
+    batched_registry.update_many({f"cam_{c}": tracks[c] for c in range(cameras)})
+    batched_update = time_call(lambda: batched_registry.update_many(boxes_by_camera), iterations)
+
+    matched = (associate(tracks, dets) == np.arange(people)).mean()
+    return {
+        "cameras": cameras,
+        "people_per_camera": people,
+        "association_per_camera_loop": per_camera,
+        "association_batched": batched,
+        "tracker_update_per_camera_loop": per_camera_update,
+        "tracker_update_batched": batched_update,
+        "match_rate": float(matched),
+    }
+
+
+def compare_detections(reference: list, candidate: list) -> dict:
+    """
+    Compare the detections of two detectors on the same frames.
+
+    Returns:
+        dict: Frames with the same fall decision, the same number of boxes, the
+        largest box coordinate and confidence differences on those frames.
+    """
+    same_decision = same_boxes = 0
+    max_box_diff = max_conf_diff = 0.0
+    for ref, cand in zip(reference, candidate):
+        same_decision += ref.fall == cand.fall
+        if len(ref.boxes) != len(cand.boxes):
+            continue
+        same_boxes += 1
+        if len(ref.boxes):
+            max_box_diff = max(max_box_diff, float(np.abs(ref.boxes - cand.boxes).max()))
+            max_conf_diff = max(max_conf_diff, float(np.abs(ref.scores - cand.scores).max()))
+    return {
+        "frames": len(reference),
+        "same_decision": same_decision,
+        "same_box_count": same_boxes,
+        "max_box_diff_px": round(max_box_diff, 3),
+        "max_conf_diff": round(max_conf_diff, 5),
+    }
+
+
+def bench_backends(iterations: int = 50, model: str = "model_dl/best.pt", **options) -> dict:
+    """
+    Compare load time, latency and Fall-Detected parity of the PyTorch and ONNX Runtime backends.
+    """
+    from .backends import BACKENDS
+    from .services import FallDetectionService
+
+    frames = [synthetic_frame(seed=i) for i in range(8)]
+    results, detections = {}, {}
+    for backend in BACKENDS:
+        start = time.perf_counter()
+        try:
+            service = FallDetectionService(model, backend=backend)
+        except ImportError as e:
+            results[backend] = {"error": str(e)}
+            continue
+        load_seconds = time.perf_counter() - start
+        service.detect(frames[0])  # Warm-up
+
+        it = iter(range(iterations))
+        results[backend] = {
+            "load_seconds": load_seconds,
+            **time_call(lambda: service.detect(frames[next(it) % len(frames)]), iterations),
+        }
+        detections[backend] = [service.detect(frame) for frame in frames]
+
+    if len(detections) == 2:
+        results["parity"] = compare_detections(detections["ultralytics"], detections["onnx"])
+    return results
+
+
+def bench_inference_server(iterations: int = 50, **options) -> dict:
+    """
+    Compare in-process inference with the round trip to a `run_inference_server` process.
+
+    Reports the latency of each, the transport alone (frame written to shared
+    memory + socket round trip, no inference) at 480p and 1080p next to
+    pickling the same frame, and whether both paths detect the same boxes.
+    The server runs without a batching window; in production a lone frame
+    also waits up to YOLO_BATCH_WINDOW_MS for frames of other workers.
+    """
+    import pickle
+    import subprocess
+    import sys
+    import tempfile
+    from django.conf import settings
+    from .inference_server import InferenceClient
+    from .pipeline import local_fall_service
+
+    frames = [synthetic_frame(seed=i) for i in range(8)]
+    hd_frame = synthetic_frame(1920, 1080)
+    path = os.path.join(tempfile.mkdtemp(), "inference.sock")
+    server = subprocess.Popen(
+        [sys.executable, str(settings.BASE_DIR / "manage.py"), "run_inference_server",
+         "--socket", path, "--window-ms", "0"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    client = InferenceClient(path)
+    try:
+        client.wait_ready(timeout=120)
+        service = local_fall_service(lazy=False)
+        service.detect(frames[0])  # Warm-up
+        client.detect(frames[0])
+
+        it = iter(range(iterations * 2))
+        results = {
+            "in_process": time_call(lambda: service.detect(frames[next(it) % len(frames)]), iterations),
+            "remote": time_call(lambda: client.detect(frames[next(it) % len(frames)]), iterations),
+        }
+        results["overhead_p50_ms"] = results["remote"]["p50_ms"] - results["in_process"]["p50_ms"]
+        for label, frame in (("480p", frames[0]), ("1080p", hd_frame)):
+            results[f"transport_{label}"] = time_call(lambda: client.ping([frame]), iterations)
+            results[f"pickle_{label}"] = time_call(lambda: pickle.loads(pickle.dumps(frame)), iterations)
+        results["parity"] = compare_detections(
+            [service.detect(frame) for frame in frames], client.detect_batch(frames)
+        )
+        return results
+    finally:
+        client.close()
+        server.terminate()
+        server.wait(timeout=30)
+
+
+# Name -> benchmark function, used by the `benchmark` management command
+BENCHMARKS: Dict[str, Callable[..., dict]] = {
+    "ingest": bench_ingest,
+    "association": bench_association,
+    "backends": bench_backends,
+    "inference_server": bench_inference_server,
+}
+
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+POSITIVE_LABEL = "fall"
+NEGATIVE_LABEL = "no_fall"
+
+
+def rss_mb() -> float | None:
+    """Resident memory of the process in MiB (None where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _video_frames(path: str, stride: int) -> List[np.ndarray]:
+    """Every `stride`-th frame of a video file."""
+    frames = []
+    cap = cv2.VideoCapture(path)
+    try:
+        index = 0
+        while True:
+            ret, image = cap.read()
+            if not ret:
+                break
+            if index % stride == 0:
+                frames.append(image)
+            index += 1
+    finally:
+        cap.release()
+    return frames
+
+
+def load_labeled_frames(root: str, video_stride: int = 5,
+                        max_per_label: int | None = None) -> Tuple[List[np.ndarray], List[bool]]:
+    """
+    Load the frames of a labeled folder (`fall/` and `no_fall/` sub-folders).
+
+    Args:
+        root (str): Dataset folder.
+        video_stride (int): Keep one video frame out of this many.
+        max_per_label (int | None): Cap on the frames per label.
+
+    Returns:
+        Tuple[List[np.ndarray], List[bool]]: Frames and whether each shows a fall.
+
+    Raises:
+        FileNotFoundError: If neither sub-folder exists.
+    """
+    frames, labels = [], []
+    found = False
+    for label, positive in ((POSITIVE_LABEL, True), (NEGATIVE_LABEL, False)):
+        folder = os.path.join(root, label)
+        if not os.path.isdir(folder):
+            continue
+        found = True
+        loaded = []
+        for name in sorted(glob.glob(os.path.join(folder, "**", "*"), recursive=True)):
+            if os.path.isdir(name):
+                continue
+            if name.lower().endswith(VIDEO_EXTENSIONS):
+                loaded.extend(_video_frames(name, video_stride))
+            else:
+                image = cv2.imread(name)
+                if image is not None:
+                    loaded.append(image)
+            if max_per_label and len(loaded) >= max_per_label:
+                break
+        loaded = loaded[:max_per_label] if max_per_label else loaded
+        frames.extend(loaded)
+        labels.extend([positive] * len(loaded))
+    if not found:
+        raise FileNotFoundError(f"{root} has no '{POSITIVE_LABEL}/' or '{NEGATIVE_LABEL}/' folder")
+    return frames, labels
+
+
+def evaluate_detector(detect: Callable[[np.ndarray], object], frames: Sequence[np.ndarray],
+                      labels: Sequence[bool]) -> dict:
+    """
+    Precision/recall of the Fall-Detected decision, with latency and peak memory.
+
+    Args:
+        detect (Callable): Returns the Detection of a frame (its `fall` flag is
+            decided at the service's conf_threshold).
+        frames (Sequence[np.ndarray]): Labeled frames.
+        labels (Sequence[bool]): True for frames showing a fall.
+
+    Returns:
+        dict: Confusion counts, precision, recall, F1, latency percentiles (ms)
+        and peak resident memory (MiB).
+    """
+    tp = fp = fn = tn = 0
+    timings = []
+    peak_rss = rss_mb()
+    for frame, positive in zip(frames, labels):
+        started = time.perf_counter()
+        predicted = detect(frame).fall
+        timings.append((time.perf_counter() - started) * 1000)
+        current = rss_mb()
+        if current is not None:
+            peak_rss = max(peak_rss or 0.0, current)
+
+        if predicted and positive:
+            tp += 1
+        elif predicted:
+            fp += 1
+        elif positive:
+            fn += 1
+        else:
+            tn += 1
+
+    precision = tp / (tp + fp) if tp + fp else None
+    recall = tp / (tp + fn) if tp + fn else None
+    f1 = 2 * precision * recall / (precision + recall) if precision and recall else None
+    timings = np.asarray(timings) if timings else np.zeros(1)
+    return {
+        "frames": len(frames),
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "precision": round(precision, 4) if precision is not None else None,
+        "recall": round(recall, 4) if recall is not None else None,
+        "f1": round(f1, 4) if f1 is not None else None,
+        "mean_ms": round(float(timings.mean()), 2),
+        "p50_ms": round(float(np.percentile(timings, 50)), 2),
+        "p95_ms": round(float(np.percentile(timings, 95)), 2),
+        "peak_rss_mb": round(peak_rss, 1) if peak_rss is not None else None,
+    }
@@ -0,0 +1,281 @@
+"""
+Server-side camera ingestion.
+
+Instead of relying on a browser tab capturing a webcam, the facility's IP
+cameras can be read directly by a worker process:
+- CameraReader: one thread per camera reading `cv2.VideoCapture` and keeping
+  only the latest frame, so a slow model never builds a backlog.
+- CameraWorkerPool: hands the latest frame of every camera to a shared pool
+  of inference threads running the live detection pipeline (tracking and
+  alert creation happen server side). With a RateController, each camera is
+  only inferred at the rate its activity calls for (see ratecontrol.py).
+
+A local video file can stand in for an RTSP URL, which makes the whole
+chain testable offline (`realtime=True` paces file reads at the video FPS).
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+import cv2
+import numpy as np
+from django.db import close_old_connections
+
+from .ratecontrol import RateController
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CameraFrame:
+    """Latest frame of a camera with its capture time and sequence number."""
+    image: np.ndarray
+    timestamp: float
+    seq: int
+
+
+class CameraReader(threading.Thread):
+    """
+    Reads a camera stream (or video file) in its own thread and keeps only the latest frame.
+
+    Attributes:
+        camera_id (str): Identifier of the camera (used as alert source).
+        source (str): RTSP/HTTP URL, device index or path to a video file.
+        frames_read (int): Number of frames read from the source.
+        frames_skipped (int): Frames overwritten before anyone consumed them.
+    """
+    def __init__(
+        self,
+        camera_id: str,
+        source: str,
+        realtime: bool = False,
+        reconnect_delay: float = 2.0,
+        capture_factory: Callable[[str], cv2.VideoCapture] = cv2.VideoCapture,
+    ) -> None:
+        """
+        Args:
+            camera_id (str): Identifier of the camera.
+            source (str): RTSP/HTTP URL, device index or path to a video file.
+            realtime (bool): Pace reads at the source FPS (for video files standing in for a camera).
+            reconnect_delay (float): Seconds to wait before reopening a dropped live stream.
+            capture_factory (Callable): Factory creating the capture object.
+        """
+        super().__init__(name=f"camera-{camera_id}", daemon=True)
+        self.camera_id = camera_id
+        self.source = source
+        self.realtime = realtime
+        self.reconnect_delay = reconnect_delay
+        self.capture_factory = capture_factory
+
+        self.frames_read = 0
+        self.frames_skipped = 0
+        self.finished = threading.Event()
+
+        self._lock = threading.Lock()
+        self._latest: Optional[CameraFrame] = None
+        self._consumed_seq = 0
+        self._stop_event = threading.Event()
+
+    @property
+    def is_live(self) -> bool:
+        """True for network streams/devices, False for local video files."""
+        return str(self.source).isdigit() or "://" in str(self.source)
+
+    def stop(self) -> None:
+        """Ask the reader thread to stop."""
+        self._stop_event.set()
+
+    def latest(self) -> Optional[CameraFrame]:
+        """
+        Return the latest frame if it has not been returned before, else None.
+        """
+        with self._lock:
+            frame = self._latest
+            if frame is None or frame.seq <= self._consumed_seq:
+                return None
+            self._consumed_seq = frame.seq
+            return frame
+
+    def has_pending(self) -> bool:
+        """True if a frame was read but not consumed yet."""
+        with self._lock:
+            return self._latest is not None and self._latest.seq > self._consumed_seq
+
+    def run(self) -> None:
+        """Read frames until stopped; reconnect live streams, stop at the end of files."""
+        try:
+            while not self._stop_event.is_set():
+                self._read_stream()
+                if not self.is_live:
+                    break
+                self._stop_event.wait(self.reconnect_delay)
+        finally:
+            self.finished.set()
+
+    def _read_stream(self) -> None:
+        """Open the source once and read it until it ends or the reader stops."""
+        source = int(self.source) if str(self.source).isdigit() else self.source
+        cap = self.capture_factory(source)
+        try:
+            if not cap.isOpened():
+                return
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            frame_period = 1.0 / fps if fps > 0 else 0.04
+            next_due = time.monotonic()
+
+            while not self._stop_event.is_set():
+                ret, image = cap.read()
+                if not ret:
+                    return
+                self._store(image)
+
+                if self.realtime:
+                    next_due += frame_period
+                    delay = next_due - time.monotonic()
+                    if delay > 0:
+                        self._stop_event.wait(delay)
+        finally:
+            cap.release()
+
+    def _store(self, image: np.ndarray) -> None:
+        """Replace the latest frame, counting the previous one as skipped if unread."""
+        with self._lock:
+            self.frames_read += 1
+            if self._latest is not None and self._latest.seq > self._consumed_seq:
+                self.frames_skipped += 1
+            self._latest = CameraFrame(image=image, timestamp=time.time(), seq=self.frames_read)
+
+
+class CameraWorkerPool:
+    """
+    Dispatches the latest frame of each camera to a shared pool of inference threads.
+
+    A camera never has more than one frame in flight: while its previous frame
+    is being processed, newer frames simply replace each other in the reader.
+
+    Attributes:
+        readers (Dict[str, CameraReader]): Readers keyed by camera id.
+        frames_processed (Dict[str, int]): Processed frame count per camera.
+    """
+    def __init__(
+        self,
+        readers: Dict[str, CameraReader],
+        process: Callable[[np.ndarray, str], dict],
+        workers: int = 2,
+        poll_interval: float = 0.005,
+        rate: Optional[RateController] = None,
+    ) -> None:
+        """
+        Args:
+            readers (Dict[str, CameraReader]): Readers keyed by camera id.
+            process (Callable): Called as process(image, camera_id) for each frame,
+                typically `live_pipeline.process`.
+            workers (int): Number of inference threads shared by all cameras.
+            poll_interval (float): Sleep between dispatch rounds when idle, in seconds.
+            rate (RateController | None): Paces each camera by its activity; every
+                frame the workers can keep up with is inferred when None.
+        """
+        self.readers = readers
+        self.process = process
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.rate = rate
+
+        self.frames_processed: Dict[str, int] = {cid: 0 for cid in readers}
+        self.errors: Dict[str, int] = {cid: 0 for cid in readers}
+        self.last_result: Dict[str, dict] = {}
+        self._in_flight: Dict[str, Future] = {}
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        """Stop dispatching and stop every reader."""
+        self._stop_event.set()
+        for reader in self.readers.values():
+            reader.stop()
+
+    def run(self, duration: Optional[float] = None) -> None:
+        """
+        Start the readers and dispatch frames until stopped, `duration` elapsed,
+        or every (file) source is exhausted.
+        """
+        for reader in self.readers.values():
+            if not reader.is_alive():
+                reader.start()
+
+        deadline = time.monotonic() + duration if duration else None
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference") as pool:
+            while not self._stop_event.is_set():
+                if deadline and time.monotonic() >= deadline:
+                    break
+                dispatched = self._dispatch(pool)
+                if not dispatched:
+                    if self._exhausted():
+                        break
+                    time.sleep(self.poll_interval)
+            self.stop()
+            for future in list(self._in_flight.values()):
+                future.result()
+
+    def metrics(self) -> dict:
+        """Per-camera read/skip/processed counters (and rate tier when paced)."""
+        rates = self.rate.metrics()["cameras"] if self.rate is not None else {}
+        return {
+            cid: {
+                "frames_read": reader.frames_read,
+                "frames_skipped": reader.frames_skipped,
+                "frames_processed": self.frames_processed[cid],
+                "errors": self.errors[cid],
+                **({"tier": rates[cid]["tier"], "fps": rates[cid]["fps"]} if cid in rates else {}),
+            }
+            for cid, reader in self.readers.items()
+        }
+
+    def _exhausted(self) -> bool:
+        """True once every reader ended and no frame is pending or in flight."""
+        for cid, reader in self.readers.items():
+            if not reader.finished.is_set() or cid in self._in_flight or reader.has_pending():
+                return False
+        return True
+
+    def _dispatch(self, pool: ThreadPoolExecutor) -> bool:
+        """Submit the latest frame of every idle camera. Returns True if anything was submitted."""
+        dispatched = False
+        for cid, reader in self.readers.items():
+            future = self._in_flight.get(cid)
+            if future is not None:
+                if not future.done():
+                    continue
+                del self._in_flight[cid]
+
+            if self.rate is not None and not self.rate.due(cid):
+                continue  # Newer frames keep replacing the pending one in the reader
+            frame = reader.latest()
+            if frame is None:
+                continue
+            self._in_flight[cid] = pool.submit(self._run_one, cid, frame)
+            dispatched = True
+        return dispatched
+
+    def _run_one(self, camera_id: str, frame: CameraFrame) -> None:
+        """
+        Run the pipeline on one frame (inference thread). Only the model time of
+        inferred frames (`inference_cost` of the result) counts toward the CPU
+        budget; a failed frame backs the camera off instead of retrying at once.
+        """
+        try:
+            result = self.process(frame.image, camera_id)
+            self.last_result[camera_id] = result
+            self.frames_processed[camera_id] += 1
+            if self.rate is not None:
+                self.rate.update(camera_id, result, cost=result.get("inference_cost"))
+        except Exception:
+            self.errors[camera_id] += 1
+            logger.exception("Detection failed for camera %s", camera_id)
+            if self.rate is not None:
+                self.rate.failed(camera_id)
+        finally:
+            close_old_connections()
@@ -0,0 +1,155 @@
+"""
+Snapshot and clip encoding for alerts.
+
+Snapshots are JPEG-encoded in memory with `cv2.imencode` (no colour
+conversion, no temporary file). Clips are written by `cv2.VideoWriter`, which
+needs a path: with a local storage backend they are written directly at
+their final location, otherwise through a temporary file that is streamed
+into the storage backend in chunks (never read back into memory).
+
+Quality and resolution come from settings:
+    SNAPSHOT_JPEG_QUALITY, SNAPSHOT_MAX_WIDTH, CLIP_FOURCC, CLIP_MAX_WIDTH
+"""
+
+import os
+import tempfile
+import uuid
+from typing import Iterable, Optional
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+
+
+def resize_to_width(frame: np.ndarray, max_width: Optional[int]) -> np.ndarray:
+    """
+    Downscale a frame (keeping its aspect ratio) if it is wider than max_width.
+    """
+    if not max_width or frame.shape[1] <= max_width:
+        return frame
+    scale = max_width / frame.shape[1]
+    size = (max_width, max(1, round(frame.shape[0] * scale)))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def encode_jpeg(frame: np.ndarray, quality: Optional[int] = None,
+                max_width: Optional[int] = None) -> bytes:
+    """
+    Encode a BGR frame to JPEG bytes in memory.
+
+    Args:
+        frame (np.ndarray): Image in BGR format.
+        quality (int | None): JPEG quality (defaults to settings.SNAPSHOT_JPEG_QUALITY).
+        max_width (int | None): Downscale wider frames (defaults to settings.SNAPSHOT_MAX_WIDTH).
+
+    Returns:
+        bytes: Encoded JPEG.
+    """
+    if quality is None:
+        quality = getattr(settings, "SNAPSHOT_JPEG_QUALITY", 80)
+    if max_width is None:
+        max_width = getattr(settings, "SNAPSHOT_MAX_WIDTH", None)
+
+    ok, buf = cv2.imencode(
+        ".jpg", resize_to_width(frame, max_width), [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    )
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buf.tobytes()
+
+
+def snapshot_file(frame: np.ndarray, **kwargs) -> ContentFile:
+    """
+    Encode a frame as an in-memory JPEG ContentFile with a unique name.
+    """
+    return ContentFile(encode_jpeg(frame, **kwargs), name=f"{uuid.uuid4().hex}.jpg")
+
+
+def write_video(path: str, frames: Iterable[np.ndarray], fps: float,
+                fourcc: Optional[str] = None, max_width: Optional[int] = None) -> int:
+    """
+    Write frames to a video file at `path`.
+
+    Args:
+        path (str): Destination file.
+        frames (Iterable[np.ndarray]): BGR frames (all of the same size).
+        fps (float): Frame rate of the clip.
+        fourcc (str | None): Codec (defaults to settings.CLIP_FOURCC).
+        max_width (int | None): Downscale wider frames (defaults to settings.CLIP_MAX_WIDTH).
+
+    Returns:
+        int: Number of frames written.
+    """
+    fourcc = fourcc or getattr(settings, "CLIP_FOURCC", "mp4v")
+    if max_width is None:
+        max_width = getattr(settings, "CLIP_MAX_WIDTH", None)
+
+    out = None
+    written = 0
+    try:
+        for frame in frames:
+            frame = resize_to_width(frame, max_width)
+            if out is None:
+                height, width = frame.shape[:2]
+                out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+            out.write(frame)
+            written += 1
+    finally:
+        if out is not None:
+            out.release()
+    return written
+
+
+def save_clip(field_file, frames: Iterable[np.ndarray], fps: float,
+              filename: str = "clip.mp4", **kwargs) -> int:
+    """
+    Encode frames into a FileField (e.g. FallAlert.video_clip) without reading the clip back.
+
+    With a local storage backend the clip is written in place; other backends
+    receive the temporary file as a stream. The model instance is not saved.
+
+    Args:
+        field_file: FieldFile to store the clip in (alert.video_clip).
+        frames (Iterable[np.ndarray]): BGR frames of the clip.
+        fps (float): Frame rate of the clip.
+        filename (str): Name passed to the field's upload_to.
+
+    Returns:
+        int: Number of frames written (0 means nothing was stored).
+    """
+    storage = field_file.storage
+    name = field_file.field.generate_filename(field_file.instance, filename)
+
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        path = None
+
+    if path is not None:
+        # Local storage: write straight at the final location
+        name = storage.get_available_name(name)
+        path = storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        written = write_video(path, frames, fps, **kwargs)
+        if written:
+            field_file.name = name
+        elif os.path.exists(path):
+            os.unlink(path)
+        return written
+
+    suffix = os.path.splitext(filename)[1] or ".mp4"
+    tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    tmp.close()
+    try:
+        written = write_video(tmp.name, frames, fps, **kwargs)
+        if written:
+            with open(tmp.name, "rb") as fh:
+                field_file.save(filename, File(fh), save=False)
+        return written
+    finally:
+        try:
+            os.unlink(tmp.name)
+        except OSError:
+            pass
@@ -0,0 +1,308 @@
+"""
+In-process publish/subscribe of alert events for live screens.
+
+Signal handlers publish an event when a FallAlert is created, escalates
+(monitoring → alert → urgent) or is acknowledged; every connected
+server-sent events client (see views.AlertEventStreamView) has its own
+Subscription and receives it immediately, so screens no longer poll the
+database.
+
+Subscriptions can be consumed from a thread (`get`) or from the ASGI event
+loop (`aget`); publishing is thread-safe (alerts are written by the
+AlertWriter thread as well as by request threads).
+
+Alerts are also saved by other processes (camera workers, Celery jobs, the
+other web workers). With ALERT_EVENTS_REDIS_URL set, every notification goes
+through a Redis pub/sub channel (RedisEventRelay) and each process delivers
+what it receives to its own subscriptions. Without it the broker only sees
+the alerts of its own process, and the event stream polls the database for
+alerts created elsewhere (see views.AlertEventStreamView).
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Callable, Deque, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Fall states in escalation order; a save moving up this order publishes "alert.escalated"
+ESCALATION_ORDER = {"monitoring": 0, "alert": 1, "urgent": 2}
+
+
+def alert_payload(alert) -> dict:
+    """JSON representation of a FallAlert for live screens and the alerts feed."""
+    return {
+        "id": alert.pk,
+        "timestamp": alert.timestamp.isoformat(),
+        "detected_by": alert.detected_by,
+        "fall_state": alert.fall_state,
+        "time_on_ground": alert.time_on_ground,
+        "yolo_confidence": alert.yolo_confidence,
+        "acknowledged": alert.acknowledged,
+        "snapshot_url": alert.image_snapshot.url if alert.image_snapshot else None,
+        "clip_url": alert.video_clip.url if alert.video_clip else None,
+    }
+
+
+def notification_type(previous, alert) -> Optional[str]:
+    """
+    Return the notification to publish for a saved alert, if any.
+
+    Args:
+        previous: (fall_state, acknowledged) before the save, or None for a new alert.
+        alert: The saved FallAlert.
+    """
+    if previous is None:
+        return "alert.created"
+    old_state, was_acknowledged = previous
+    if alert.acknowledged and not was_acknowledged:
+        return "alert.acknowledged"
+    if ESCALATION_ORDER.get(alert.fall_state, -1) > ESCALATION_ORDER.get(old_state, -1):
+        return "alert.escalated"
+    return None
+
+
+@dataclass
+class AlertNotification:
+    """An alert change pushed to live screens."""
+    type: str          # "alert.created", "alert.escalated" or "alert.acknowledged"
+    data: dict
+    id: str = ""       # SSE id; the alert cursor, used to resume after a reconnection
+
+    def to_sse(self) -> str:
+        """Serialize as a server-sent event."""
+        lines = []
+        if self.id:
+            lines.append(f"id: {self.id}")
+        lines.append(f"event: {self.type}")
+        lines.append(f"data: {json.dumps(self.data)}")
+        return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """
+    Event queue of one client. When the client is too slow the oldest events are dropped.
+
+    Attributes:
+        dropped (int): Events dropped because the queue was full.
+    """
+    def __init__(self, broker: "EventBroker", maxsize: int = 100) -> None:
+        """
+        Args:
+            broker (EventBroker): Broker the subscription belongs to.
+            maxsize (int): Events kept for a slow client.
+        """
+        self.broker = broker
+        self.dropped = 0
+        self._events: Deque[AlertNotification] = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    def push(self, event: AlertNotification) -> None:
+        """Queue an event (any thread)."""
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._cond.notify()
+            loop, ready = self._loop, self._ready
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass  # Loop closed: the client is gone
+
+    def get(self, timeout: Optional[float] = None) -> Optional[AlertNotification]:
+        """Wait for the next event from a thread; None on timeout."""
+        with self._cond:
+            if not self._events:
+                self._cond.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+    async def aget(self, timeout: Optional[float] = None) -> Optional[AlertNotification]:
+        """Wait for the next event on the event loop; None on timeout."""
+        with self._cond:
+            if self._loop is None:
+                self._loop = asyncio.get_running_loop()
+                self._ready = asyncio.Event()
+            self._ready.clear()
+            if self._events:
+                return self._events.popleft()
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        with self._cond:
+            return self._events.popleft() if self._events else None
+
+    def close(self) -> None:
+        """Stop receiving events."""
+        self.broker.unsubscribe(self)
+
+
+def _redis():
+    """Import redis (optional dependency: pip install redis)."""
+    try:
+        import redis
+    except ImportError as e:
+        raise ImportError("ALERT_EVENTS_REDIS_URL requires the redis package: pip install redis") from e
+    return redis
+
+
+class RedisEventRelay:
+    """
+    Carries notifications between server processes over a Redis pub/sub channel.
+
+    Every process publishes to the channel; a listener thread, started with
+    the first local subscriber, hands what it receives (its own notifications
+    included) to the local subscriptions.
+
+    Attributes:
+        url (str): Redis URL.
+        channel (str): Pub/sub channel.
+    """
+    def __init__(self, url: str, channel: str = "fall_alert_events") -> None:
+        """
+        Args:
+            url (str): Redis URL, e.g. redis://localhost:6379/0.
+            channel (str): Pub/sub channel.
+        """
+        self.url = url
+        self.channel = channel
+        self._client = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Redis client, created on first use."""
+        if self._client is None:
+            self._client = _redis().Redis.from_url(self.url)
+        return self._client
+
+    def publish(self, event: AlertNotification) -> None:
+        """Send a notification to every process."""
+        self.client.publish(self.channel, json.dumps(asdict(event)))
+
+    def listen(self, deliver: Callable[[AlertNotification], None]) -> None:
+        """Start the listener thread (once), calling `deliver` for every notification."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, args=(deliver,), name="alert-event-relay", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self, deliver: Callable[[AlertNotification], None]) -> None:
+        """Listener loop; reconnects after a Redis error."""
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    deliver(AlertNotification(**json.loads(message["data"])))
+            except Exception:
+                logger.exception("Alert event relay disconnected; reconnecting")
+                time.sleep(1.0)
+
+
+class EventBroker:
+    """
+    Fans out published events to every subscription, through the relay
+    (every process) when there is one.
+
+    Attributes:
+        relay (RedisEventRelay | None): Cross-process channel.
+    """
+    def __init__(self, maxsize: int = 100, relay: Optional[RedisEventRelay] = None) -> None:
+        """
+        Args:
+            maxsize (int): Events kept per subscription for slow clients.
+            relay (RedisEventRelay | None): Cross-process channel; events only reach
+                the subscriptions of this process when None.
+        """
+        self.maxsize = maxsize
+        self.relay = relay
+        self._subscriptions: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.relay_errors = 0
+
+    @property
+    def cross_process(self) -> bool:
+        """True if events published by other processes are received."""
+        return self.relay is not None
+
+    def subscribe(self) -> Subscription:
+        """Create a subscription receiving every event published from now on."""
+        if self.relay is not None:
+            self.relay.listen(self.deliver)
+        subscription = Subscription(self, self.maxsize)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscription."""
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event: AlertNotification) -> int:
+        """
+        Push an event to every subscription (of every process, with a relay).
+
+        Returns:
+            int: Number of local subscriptions reached (0 when sent through the
+            relay, which delivers it asynchronously).
+        """
+        self.published += 1
+        if self.relay is not None:
+            try:
+                self.relay.publish(event)
+                return 0
+            except Exception:
+                self.relay_errors += 1
+                logger.exception("Could not relay alert event; delivering it locally")
+        return self.deliver(event)
+
+    def deliver(self, event: AlertNotification) -> int:
+        """
+        Push an event to the subscriptions of this process.
+
+        Returns:
+            int: Number of subscriptions reached.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.push(event)
+        return len(subscriptions)
+
+    def metrics(self) -> dict:
+        """Connected clients and event counters."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        return {
+            "subscribers": len(subscriptions),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in subscriptions),
+            "relay": "redis" if self.relay is not None else None,
+            "relay_errors": self.relay_errors,
+        }
+
+
+def broker_from_settings() -> EventBroker:
+    """Build the broker, relayed through Redis when settings.ALERT_EVENTS_REDIS_URL is set."""
+    from django.conf import settings
+    url = getattr(settings, "ALERT_EVENTS_REDIS_URL", "")
+    return EventBroker(relay=RedisEventRelay(url) if url else None)
+
+
+# Process-wide broker used by the signal handlers and the SSE endpoint
+alert_events = broker_from_settings()
@@ -0,0 +1,392 @@
+"""
+In-memory ring buffer of recent frames per camera, used to build alert clips.
+
+A live stream cannot be seeked into the past, so every live frame is kept
+(JPEG-encoded, to bound memory) for the last few seconds:
+- FrameRingBuffer: frames of one camera, evicted by age and by a hard byte cap.
+  Appending only stages the raw frame; the JPEG encode happens later, off the
+  request thread.
+- FrameBufferRegistry: one buffer per camera id, plus the encoder thread that
+  drains the staged frames of every buffer.
+- ClipRecorder: when an alert is created it schedules a clip covering the
+  pre-fall window plus a post-fall tail; once the tail has elapsed the clip is
+  written from the buffer into `FallAlert.video_clip` without reconnecting to
+  the camera.
+
+The buffers must outlive a clip by the time it takes to get written (the
+next frame or writer tick, plus the writer queue), so they keep at least
+CLIP_PRE_SECONDS + CLIP_POST_SECONDS + CLIP_WRITE_MARGIN seconds.
+
+Sizes come from settings:
+    FRAME_BUFFER_SECONDS, FRAME_BUFFER_MAX_BYTES, FRAME_BUFFER_JPEG_QUALITY,
+    CLIP_PRE_SECONDS, CLIP_POST_SECONDS
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+from .encoding import encode_jpeg, save_clip
+
+logger = logging.getLogger(__name__)
+
+# Seconds a due clip may wait to be written before its first frames are evicted
+CLIP_WRITE_MARGIN = 5.0
+
+
+class FrameRingBuffer:
+    """
+    Last `max_seconds` of a camera as (timestamp, JPEG bytes), capped at `max_bytes`.
+
+    `append` only stages the raw frame (by reference, so callers must not modify
+    it afterwards); `encode_pending` encodes the staged frames. Reads encode what
+    is still staged first, so a clip always sees every frame.
+
+    Attributes:
+        max_seconds (float): Frames older than this (relative to the newest) are evicted.
+        max_bytes (int): Hard cap on the encoded bytes held; oldest frames are evicted first.
+        jpeg_quality (int): Quality of the buffered frames.
+        max_width (int | None): Frames wider than this are downscaled before encoding.
+        max_staged (int): Raw frames kept waiting for the encoder; the oldest are
+            dropped beyond it, so a stalled encoder cannot exhaust memory.
+    """
+    def __init__(
+        self,
+        max_seconds: float = 10.0,
+        max_bytes: int = 32 * 1024 * 1024,
+        jpeg_quality: int = 70,
+        max_width: Optional[int] = None,
+        max_staged: int = 64,
+    ) -> None:
+        """
+        Args:
+            max_seconds (float): Seconds of history kept.
+            max_bytes (int): Hard memory cap for the encoded frames.
+            jpeg_quality (int): Quality of the buffered frames.
+            max_width (int | None): Downscale wider frames before encoding.
+            max_staged (int): Raw frames kept waiting for the encoder.
+        """
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.jpeg_quality = jpeg_quality
+        self.max_width = max_width
+        self.max_staged = max_staged
+
+        self._frames: Deque[Tuple[float, bytes]] = deque()
+        self._staged: Deque[Tuple[float, np.ndarray]] = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._encode_lock = threading.Lock()  # Keeps concurrent encoders in frame order
+
+        # Metrics
+        self.frames_added = 0
+        self.frames_evicted = 0
+        self.frames_dropped = 0
+        self._frames_encoded = 0
+        self._encode_seconds = 0.0
+
+    def __len__(self) -> int:
+        self.encode_pending()
+        return len(self._frames)
+
+    @property
+    def nbytes(self) -> int:
+        """Encoded bytes currently held."""
+        self.encode_pending()
+        return self._bytes
+
+    @property
+    def staged(self) -> int:
+        """Raw frames waiting to be encoded."""
+        return len(self._staged)
+
+    def append(self, frame: np.ndarray, timestamp: Optional[float] = None) -> None:
+        """
+        Stage a BGR frame for encoding; cheap enough for the request thread.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            self._staged.append((timestamp, frame))
+            self.frames_added += 1
+            while len(self._staged) > self.max_staged:
+                self._staged.popleft()
+                self.frames_dropped += 1
+
+    def encode_pending(self) -> int:
+        """
+        Encode the staged frames into the buffer, evicting old frames as needed.
+
+        Returns:
+            int: Number of frames encoded.
+        """
+        encoded = 0
+        with self._encode_lock:
+            while True:
+                with self._lock:
+                    if not self._staged:
+                        return encoded
+                    timestamp, frame = self._staged.popleft()
+                start = time.perf_counter()
+                data = encode_jpeg(frame, quality=self.jpeg_quality, max_width=self.max_width)
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self._frames.append((timestamp, data))
+                    self._bytes += len(data)
+                    self._frames_encoded += 1
+                    self._encode_seconds += elapsed
+                    self._evict(timestamp)
+                encoded += 1
+
+    def window(self, start: float, end: float) -> List[Tuple[float, bytes]]:
+        """
+        Return the buffered (timestamp, JPEG bytes) between `start` and `end`, oldest first.
+        """
+        self.encode_pending()
+        with self._lock:
+            return [(ts, data) for ts, data in self._frames if start <= ts <= end]
+
+    def metrics(self) -> dict:
+        """Memory held, span, encoder backlog and encode cost of the buffer."""
+        with self._lock:
+            span = self._frames[-1][0] - self._frames[0][0] if self._frames else 0.0
+            return {
+                "frames": len(self._frames),
+                "bytes": self._bytes,
+                "seconds": span,
+                "staged": len(self._staged),
+                "frames_added": self.frames_added,
+                "frames_evicted": self.frames_evicted,
+                "frames_dropped": self.frames_dropped,
+                "avg_encode_ms": (
+                    self._encode_seconds / self._frames_encoded * 1000 if self._frames_encoded else 0.0
+                ),
+            }
+
+    def _evict(self, now: float) -> None:
+        """Drop frames past the time window or over the byte cap (lock held)."""
+        frames = self._frames
+        while frames and (now - frames[0][0] > self.max_seconds or self._bytes > self.max_bytes):
+            _, data = frames.popleft()
+            self._bytes -= len(data)
+            self.frames_evicted += 1
+
+
+class FrameBufferRegistry:
+    """
+    One FrameRingBuffer per camera id, created on first use, and the encoder
+    thread that JPEG-encodes the frames staged by `append`.
+
+    Attributes:
+        background (bool): Encode on the encoder thread; otherwise frames stay
+            staged until they are read (tests, benchmarks).
+    """
+    def __init__(self, background: bool = True, **buffer_kwargs) -> None:
+        """
+        Args:
+            background (bool): Start an encoder thread on the first append.
+            **buffer_kwargs: Passed to every FrameRingBuffer.
+        """
+        self.background = background
+        self.buffer_kwargs = buffer_kwargs
+        self._buffers: Dict[str, FrameRingBuffer] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, camera_id: str) -> FrameRingBuffer:
+        """Return the buffer of a camera, creating it if needed."""
+        buffer = self._buffers.get(camera_id)
+        if buffer is None:
+            with self._lock:
+                buffer = self._buffers.setdefault(camera_id, FrameRingBuffer(**self.buffer_kwargs))
+        return buffer
+
+    def append(self, camera_id: str, frame: np.ndarray, timestamp: Optional[float] = None) -> None:
+        """Buffer a frame of a camera; it is encoded on the encoder thread."""
+        self.get(camera_id).append(frame, timestamp)
+        if self.background:
+            self._ensure_started()
+            self._wake.set()
+
+    def metrics(self) -> dict:
+        """Per-camera buffer metrics and the total memory held."""
+        cameras = {cid: buffer.metrics() for cid, buffer in list(self._buffers.items())}
+        return {
+            "total_bytes": sum(m["bytes"] for m in cameras.values()),
+            "cameras": cameras,
+        }
+
+    def _ensure_started(self) -> None:
+        """Start the encoder thread on first use."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="frame-encoder", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        """Encoder loop: drain the staged frames of every camera whenever one arrives."""
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            for buffer in list(self._buffers.values()):
+                try:
+                    buffer.encode_pending()
+                except Exception:
+                    logger.exception("Failed to encode buffered frames")
+
+
+@dataclass
+class PendingClip:
+    """A clip to write once its post-fall tail has been buffered."""
+    alert_id: int
+    camera_id: str
+    start: float
+    end: float
+    created_at: float = field(default_factory=time.time)
+
+
+class ClipRecorder:
+    """
+    Writes alert clips (pre-fall window + post-fall tail) from the frame buffers.
+
+    Attributes:
+        buffers (FrameBufferRegistry): Source of the frames.
+        pre_seconds (float): Seconds of video before the fall.
+        post_seconds (float): Seconds of video after the fall.
+    """
+    def __init__(self, buffers: FrameBufferRegistry, pre_seconds: float = 5.0,
+                 post_seconds: float = 5.0) -> None:
+        """
+        Args:
+            buffers (FrameBufferRegistry): Source of the frames.
+            pre_seconds (float): Seconds of video before the fall.
+            post_seconds (float): Seconds of video after the fall.
+
+        Raises:
+            ValueError: If the buffers do not keep the clip plus CLIP_WRITE_MARGIN seconds.
+        """
+        required = pre_seconds + post_seconds + CLIP_WRITE_MARGIN
+        buffered = buffers.buffer_kwargs.get("max_seconds", 10.0)
+        if buffered < required:
+            raise ValueError(
+                f"Frame buffers keep {buffered:g}s but clips of {pre_seconds:g}s + {post_seconds:g}s "
+                f"need at least {required:g}s to be written before their first frames are evicted"
+            )
+        self.buffers = buffers
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+
+        self._pending: List[PendingClip] = []
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.clips_written = 0
+        self.clips_empty = 0
+        self.clips_requeued = 0
+        self._write_seconds = 0.0
+
+    def schedule(self, alert_id: int, camera_id: str, timestamp: float) -> PendingClip:
+        """Schedule the clip of an alert detected at `timestamp`."""
+        clip = PendingClip(
+            alert_id=alert_id,
+            camera_id=camera_id,
+            start=timestamp - self.pre_seconds,
+            end=timestamp + self.post_seconds,
+        )
+        with self._lock:
+            self._pending.append(clip)
+        return clip
+
+    def due(self, now: Optional[float] = None) -> List[PendingClip]:
+        """
+        Remove and return the clips whose post-fall tail has elapsed.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            ready = [clip for clip in self._pending if clip.end <= now]
+            if ready:
+                self._pending = [clip for clip in self._pending if clip.end > now]
+        for clip in ready:
+            clip.created_at = now  # Writer lag is measured from here, not from the fall
+        return ready
+
+    def requeue(self, clip: PendingClip) -> None:
+        """
+        Put back a due clip that could not be handed to the writer; it is due again
+        on the next frame or writer tick (within CLIP_WRITE_MARGIN of its frames).
+        """
+        with self._lock:
+            self._pending.append(clip)
+            self.clips_requeued += 1
+
+    def write(self, clip: PendingClip) -> bool:
+        """
+        Encode the buffered frames of a clip into its alert's `video_clip`.
+
+        Returns:
+            bool: True if a clip was stored.
+        """
+        from .models import FallAlert
+
+        alert = FallAlert.objects.filter(pk=clip.alert_id).first()
+        frames = self.buffers.get(clip.camera_id).window(clip.start, clip.end)
+        if alert is None or not frames:
+            self.clips_empty += 1
+            return False
+
+        start = time.perf_counter()
+        # Playback at the rate the frames were actually buffered
+        span = frames[-1][0] - frames[0][0]
+        fps = (len(frames) - 1) / span if len(frames) > 1 and span > 0 else 1.0
+        written = save_clip(alert.video_clip, self._decode(frames), fps,
+                            filename=f"{alert.pk}_{int(clip.start)}.mp4")
+        if written:
+            alert.save(update_fields=["video_clip"])
+            self.clips_written += 1
+            self._write_seconds += time.perf_counter() - start
+        else:
+            self.clips_empty += 1
+        return bool(written)
+
+    def metrics(self) -> dict:
+        """Pending/written clip counters and the average clip encode time."""
+        return {
+            "pending": len(self._pending),
+            "written": self.clips_written,
+            "empty": self.clips_empty,
+            "requeued": self.clips_requeued,
+            "avg_write_ms": (
+                self._write_seconds / self.clips_written * 1000 if self.clips_written else 0.0
+            ),
+        }
+
+    @staticmethod
+    def _decode(frames: List[Tuple[float, bytes]]) -> Iterator[np.ndarray]:
+        """Decode buffered JPEGs one at a time."""
+        for _, data in frames:
+            image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if image is not None:
+                yield image
+
+
+def buffers_from_settings() -> FrameBufferRegistry:
+    """
+    Build the frame buffer registry from settings, long enough for the clips
+    (FRAME_BUFFER_SECONDS is raised to the clip length plus CLIP_WRITE_MARGIN).
+    """
+    clip_seconds = getattr(settings, "CLIP_PRE_SECONDS", 5.0) + getattr(settings, "CLIP_POST_SECONDS", 5.0)
+    return FrameBufferRegistry(
+        max_seconds=max(getattr(settings, "FRAME_BUFFER_SECONDS", 15.0), clip_seconds + CLIP_WRITE_MARGIN),
+        max_bytes=getattr(settings, "FRAME_BUFFER_MAX_BYTES", 32 * 1024 * 1024),
+        jpeg_quality=getattr(settings, "FRAME_BUFFER_JPEG_QUALITY", 70),
+        max_width=getattr(settings, "CLIP_MAX_WIDTH", None) or None,
+    )
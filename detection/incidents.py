@@ -0,0 +1,265 @@
+"""
+Alert deduplication per incident.
+
+A person lying on the floor is seen on every frame; only a few of those
+observations deserve a database write. IncidentEngine keeps the open
+incident (alert id, state, last sighting) of every (camera, track) pair in a
+tracker state backend (process memory or Django's cache, see
+tracking.backend_from_settings) and calls its IncidentHandler only when
+- an incident opens (first sighting, or previous one expired): create the alert,
+- an incident escalates (monitoring → alert → urgent): update the alert,
+- an incident closes (person recovered, or not seen for `ttl` seconds):
+  record its final state.
+Every other observation only refreshes the incident in the backend.
+
+Expired incidents close on the next sighting of their camera, and on
+`close_all_expired`, which the live pipeline calls from the AlertWriter tick
+so an incident closes even when its camera sees nobody anymore.
+
+All updates of a camera's incidents happen under the backend lock of that
+camera, so concurrent workers cannot open two alerts for the same incident.
+
+An incident whose alert was deleted is reopened as a new alert: when its
+handler raises IncidentLost on escalation, or once `discard_alerts` dropped
+it (the live pipeline does so for the alerts its observation samples could
+not be written to).
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .tracking import backend_from_settings
+
+logger = logging.getLogger(__name__)
+
+# Fall states in escalation order
+SEVERITY = {"monitoring": 0, "alert": 1, "urgent": 2}
+CLOSING_STATE = "recovered"
+
+
+@dataclass
+class Incident:
+    """Open incident of one (camera, track)."""
+    alert_id: int
+    fall_state: str
+    opened_at: float
+    last_seen: float
+    time_on_ground: float = 0.0
+    confidence: Optional[float] = None
+
+
+@dataclass
+class Observation:
+    """One sighting of a person on the floor."""
+    camera_id: str
+    track_id: Optional[str]
+    fall_state: str
+    time_on_ground: float = 0.0
+    confidence: Optional[float] = None
+    payload: object = None       # Passed to the handler (e.g. the AlertEvent with its frame)
+    timestamp: Optional[float] = None
+
+
+class IncidentLost(Exception):
+    """Raised by an IncidentHandler when the alert of an incident no longer exists."""
+
+
+class IncidentHandler:
+    """
+    Database side of the incident engine. Subclasses implement `open`;
+    escalation and closing are optional.
+    """
+
+    def open(self, observation: Observation) -> int:
+        """Create the alert of a new incident and return its id."""
+        raise NotImplementedError
+
+    def escalate(self, incident: Incident, observation: Observation) -> None:
+        """
+        Record a more severe fall state on the incident's alert.
+
+        Raises:
+            IncidentLost: If the alert was deleted (the engine opens a new incident).
+        """
+
+    def close(self, incident: Incident, final_state: Optional[str]) -> None:
+        """Record the final state of an incident (`final_state` is None when it expired)."""
+
+
+class IncidentEngine:
+    """
+    Opens, escalates and closes incidents per (camera, track), writing only on transitions.
+
+    Attributes:
+        handler (IncidentHandler): Performs the database writes.
+        ttl (float): Seconds without sighting after which an incident closes.
+        backend: Tracker state backend storing the incidents of each camera.
+    """
+    OPENED, ESCALATED, DEDUPLICATED, CLOSED = "opened", "escalated", "deduplicated", "closed"
+
+    def __init__(self, handler: IncidentHandler, ttl: float = 30.0, backend=None,
+                 prefix: str = "incidents") -> None:
+        """
+        Args:
+            handler (IncidentHandler): Performs the database writes.
+            ttl (float): Seconds without sighting after which an incident closes.
+            backend: State backend (defaults to settings.FALL_TRACKER_BACKEND).
+            prefix (str): Prefix of the backend keys.
+        """
+        self.handler = handler
+        self.ttl = ttl
+        self.backend = backend if backend is not None else backend_from_settings()
+        self.prefix = prefix
+        self._cameras = set()  # Cameras observed by this process, swept by close_all_expired
+
+        # Metrics
+        self.counts = {self.OPENED: 0, self.ESCALATED: 0, self.DEDUPLICATED: 0, self.CLOSED: 0}
+
+    def key(self, camera_id: str) -> str:
+        """Backend key of a camera's incidents."""
+        return f"{self.prefix}:{camera_id}"
+
+    def observe(self, observation: Observation) -> tuple:
+        """
+        Apply one observation.
+
+        Returns:
+            tuple: (action, alert id) where action is "opened", "escalated",
+            "deduplicated" or "closed".
+        """
+        now = observation.timestamp if observation.timestamp is not None else time.time()
+        track = observation.track_id or "default"
+        key = self.key(observation.camera_id)
+        self._cameras.add(observation.camera_id)
+
+        with self.backend.locked(key):
+            incidents: Dict[str, Incident] = self.backend.load(key)
+            self._close_expired(incidents, now)
+
+            incident = incidents.get(track)
+            if incident is None:
+                if observation.fall_state == CLOSING_STATE:
+                    action, alert_id = self.DEDUPLICATED, None  # Nothing open to close
+                else:
+                    action, alert_id = self.OPENED, self._open(incidents, track, observation, now)
+            else:
+                alert_id = incident.alert_id
+                incident.last_seen = now
+                incident.time_on_ground = observation.time_on_ground
+                incident.confidence = observation.confidence
+                if observation.fall_state == CLOSING_STATE:
+                    self.handler.close(incident, CLOSING_STATE)
+                    del incidents[track]
+                    action = self.CLOSED
+                elif SEVERITY.get(observation.fall_state, 0) > SEVERITY.get(incident.fall_state, 0):
+                    incident.fall_state = observation.fall_state
+                    try:
+                        self.handler.escalate(incident, observation)
+                        action = self.ESCALATED
+                    except IncidentLost:
+                        logger.info("Alert %s of an open incident was deleted; reopening", alert_id)
+                        action, alert_id = self.OPENED, self._open(incidents, track, observation, now)
+                else:
+                    action = self.DEDUPLICATED
+
+            self.backend.save(key, incidents)
+
+        self.counts[action] += 1
+        return action, alert_id
+
+    def close_expired(self, camera_id: str, now: Optional[float] = None) -> List[Incident]:
+        """Close the incidents of a camera not seen for `ttl` seconds."""
+        key = self.key(camera_id)
+        with self.backend.locked(key):
+            incidents = self.backend.load(key)
+            closed = self._close_expired(incidents, time.time() if now is None else now)
+            if closed:
+                self.backend.save(key, incidents)
+        return closed
+
+    def close_all_expired(self, now: Optional[float] = None) -> List[Incident]:
+        """Close the expired incidents of every camera observed by this process."""
+        now = time.time() if now is None else now
+        closed = []
+        for camera_id in list(self._cameras):
+            closed.extend(self.close_expired(camera_id, now))
+        return closed
+
+    def discard_alerts(self, alert_ids) -> int:
+        """
+        Forget the incidents (of the cameras observed by this process) whose alert
+        is one of `alert_ids`, without closing them: their next sighting opens a
+        new alert.
+
+        Returns:
+            int: Number of incidents forgotten.
+        """
+        alert_ids = set(alert_ids)
+        discarded = 0
+        for camera_id in list(self._cameras):
+            key = self.key(camera_id)
+            with self.backend.locked(key):
+                incidents = self.backend.load(key)
+                lost = [track for track, incident in incidents.items() if incident.alert_id in alert_ids]
+                for track in lost:
+                    del incidents[track]
+                if lost:
+                    self.backend.save(key, incidents)
+                    discarded += len(lost)
+        return discarded
+
+    def discard(self, camera_id: str, track_id: Optional[str]) -> None:
+        """Forget one incident without closing it (e.g. its alert was deleted)."""
+        key = self.key(camera_id)
+        with self.backend.locked(key):
+            incidents = self.backend.load(key)
+            if incidents.pop(track_id or "default", None) is not None:
+                self.backend.save(key, incidents)
+
+    def open_incidents(self, camera_id: str) -> Dict[str, Incident]:
+        """Incidents currently open on a camera, keyed by track id."""
+        key = self.key(camera_id)
+        with self.backend.locked(key):
+            return dict(self.backend.load(key))
+
+    def clear(self, camera_id: str) -> None:
+        """Forget the incidents of a camera without closing them."""
+        key = self.key(camera_id)
+        with self.backend.locked(key):
+            self.backend.save(key, {})
+
+    def metrics(self) -> dict:
+        """Number of observations per action; `deduplicated` ones cost no database write."""
+        return dict(self.counts)
+
+    def _open(self, incidents: Dict[str, Incident], track: str, observation: Observation, now: float) -> int:
+        """Open a new incident for a track (backend lock held) and return its alert id."""
+        alert_id = self.handler.open(observation)
+        incidents[track] = Incident(
+            alert_id=alert_id,
+            fall_state=observation.fall_state,
+            opened_at=now,
+            last_seen=now,
+            time_on_ground=observation.time_on_ground,
+            confidence=observation.confidence,
+        )
+        return alert_id
+
+    def _close_expired(self, incidents: Dict[str, Incident], now: float) -> List[Incident]:
+        """
+        Close and remove expired incidents (backend lock held). A track seen
+        again after the TTL therefore opens a new incident.
+        """
+        closed = []
+        for track, incident in list(incidents.items()):
+            if now - incident.last_seen > self.ttl:
+                closed.append(incidents.pop(track))
+        for incident in closed:
+            try:
+                self.handler.close(incident, None)
+            except Exception:
+                logger.exception("Failed to close incident of alert %s", incident.alert_id)
+            self.counts[self.CLOSED] += 1
+        return closed
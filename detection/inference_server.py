@@ -0,0 +1,536 @@
+"""
+Standalone inference server shared by the Django worker processes.
+
+Every Django worker that imports the pipeline would otherwise hold its own
+copy of the model: memory grows with the worker count and the copies compete
+for the same cores. With INFERENCE_SERVER_SOCKET set, the pipeline's
+`fall_service` is an InferenceClient and a single process started with
+
+    python manage.py run_inference_server
+
+owns the FallDetectionService. Frames from all workers are micro-batched
+together there (BatchingScheduler), so web workers scale independently of
+model memory.
+
+Transport: a local Unix stream socket carries small length-prefixed JSON
+messages; the pixels travel through a `multiprocessing.shared_memory` buffer
+owned by each client thread. The client writes the frames into its buffer
+and the server runs the model on NumPy views of that same memory, so frames
+are never pickled or copied through the socket. The buffer is grown (and
+re-announced by name) when a larger batch comes in.
+
+A client thread's connection and buffer are released when the thread ends
+(short-lived request threads do not leak sockets or /dev/shm segments).
+The socket is only accessible to the server's user (mode 0600), and the
+server refuses to replace the socket of another server that still answers.
+
+Messages (one reply per request):
+    {"op": "detect", "shm": name, "frames": [[offset, [h, w, 3]], ...]}
+        → {"ok": true, "detections": [...], "server_ms": float}
+    {"op": "ping"}  (optionally with "shm"/"frames": attaches them, no inference)
+        → {"ok": true, "frames": n, ...server metrics}
+    errors → {"ok": false, "error": "..."}
+"""
+
+import errno
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import struct
+import threading
+import time
+import weakref
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .batching import BatchingScheduler
+from .services import Detection, FallDetectionService
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("!I")   # Length prefix of every JSON message
+MIN_BUFFER_SIZE = 4 * 2 ** 20   # Shared buffers start at 4 MiB (a few 1080p frames)
+
+_created: set = set()   # Shared buffers created by this process (clients)
+
+
+class InferenceServerError(RuntimeError):
+    """The inference server rejected a request or failed to process it."""
+
+
+def _send(sock: socket.socket, message: dict) -> None:
+    """Send one length-prefixed JSON message."""
+    data = json.dumps(message).encode()
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    """Read exactly `size` bytes, or None if the peer closed the connection."""
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(sock: socket.socket) -> Optional[dict]:
+    """Receive one length-prefixed JSON message (None on end of stream)."""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exact(sock, _HEADER.unpack(header)[0])
+    return None if data is None else json.loads(data)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to a client's shared buffer without adopting it: the client owns
+    (and unlinks) it, so the server's resource tracker must not track it.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        if name not in _created:   # Client in the same process: keep its registration
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def encode_detection(detection: Detection) -> dict:
+    """Detection → JSON-serializable dict (float32 values round-trip exactly)."""
+    return {
+        "fall": detection.fall,
+        "confidence": detection.confidence,
+        "boxes": detection.boxes.tolist(),
+        "class_ids": detection.class_ids.tolist(),
+        "scores": detection.scores.tolist(),
+        "names": detection.names,
+        "conf_threshold": detection.conf_threshold,
+    }
+
+
+def decode_detection(data: dict) -> Detection:
+    """Inverse of encode_detection."""
+    return Detection(
+        fall=data["fall"],
+        confidence=data["confidence"],
+        boxes=np.asarray(data["boxes"], dtype=np.float32).reshape(-1, 4),
+        class_ids=np.asarray(data["class_ids"], dtype=np.int64),
+        scores=np.asarray(data["scores"], dtype=np.float32),
+        names={int(k): v for k, v in data["names"].items()},
+        conf_threshold=data["conf_threshold"],
+    )
+
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+    """Serves the requests of one client connection (one client thread)."""
+
+    def handle(self) -> None:
+        server: "InferenceServer" = self.server.inference
+        buffers: Dict[str, shared_memory.SharedMemory] = {}
+        try:
+            while True:
+                request = _recv(self.request)
+                if request is None:
+                    return
+                try:
+                    reply = server.handle(request, buffers)
+                except (KeyError, ValueError) as e:
+                    logger.warning("Rejected inference request: %s", e)
+                    reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                except Exception as e:
+                    logger.exception("Inference request failed")
+                    reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                _send(self.request, reply)
+        except OSError:
+            logger.debug("Inference client disconnected", exc_info=True)
+        finally:
+            server.release(buffers.values())
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class InferenceServer:
+    """
+    Runs the model for every client connected to a Unix socket.
+
+    Attributes:
+        service (FallDetectionService): Service owning the model.
+        path (str): Path of the Unix socket.
+        scheduler (BatchingScheduler): Batches the frames of all connections together.
+        request_timeout (float): Maximum wait for a batch result, in seconds.
+    """
+    def __init__(
+        self,
+        service: FallDetectionService,
+        path: str,
+        window_ms: float = 20.0,
+        max_batch_size: int = 8,
+        request_timeout: float = 30.0,
+    ) -> None:
+        """
+        Args:
+            service (FallDetectionService): Service owning the model.
+            path (str): Path of the Unix socket (replaced if it already exists).
+            window_ms (float): Micro-batching window across clients.
+            max_batch_size (int): Maximum frames per model call.
+            request_timeout (float): Maximum wait for a batch result, in seconds.
+        """
+        self.service = service
+        self.path = path
+        self.scheduler = BatchingScheduler(service, window_ms=window_ms, max_batch_size=max_batch_size)
+        self.request_timeout = request_timeout
+
+        self._server: Optional[_UnixServer] = None
+        self._lock = threading.Lock()
+        self._stale: List[shared_memory.SharedMemory] = []   # Buffers still referenced by a batch
+
+        # Metrics
+        self.requests = 0
+        self.frames = 0
+        self.connections = 0
+
+    def bind(self) -> None:
+        """
+        Create the socket so clients can connect: readable and writable by this
+        user only, in a directory created private (0700) when missing. A stale
+        socket left by a crashed server is replaced.
+
+        Raises:
+            OSError: If another server answers on the socket (EADDRINUSE) or the
+                path exists and is not a socket (EEXIST).
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), mode=0o700, exist_ok=True)
+        self._remove_stale_socket()
+        server = _UnixServer(self.path, _ConnectionHandler, bind_and_activate=False)
+        try:
+            server.server_bind()
+            os.chmod(self.path, 0o600)   # Before listen(): no client can connect with looser rights
+            server.server_activate()
+        except OSError:
+            server.server_close()
+            raise
+        server.inference = self
+        self._server = server
+
+    def _remove_stale_socket(self) -> None:
+        """Unlink the socket of a server that no longer answers."""
+        try:
+            mode = os.lstat(self.path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise OSError(errno.EEXIST, f"{self.path} exists and is not a socket")
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.unlink(self.path)   # Nobody listening: left over by a crashed server
+            return
+        finally:
+            probe.close()
+        raise OSError(errno.EADDRINUSE, f"An inference server is already listening on {self.path}")
+
+    def serve_forever(self) -> None:
+        """Serve clients until `shutdown` is called."""
+        if self._server is None:
+            self.bind()
+        logger.info("Inference server listening on %s", self.path)
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stop serving, let the queued frames finish and remove the socket."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        self.scheduler.close()
+
+    def handle(self, request: dict, buffers: Dict[str, shared_memory.SharedMemory]) -> dict:
+        """
+        Process one request of a connection.
+
+        Args:
+            request (dict): Decoded request message.
+            buffers (Dict[str, SharedMemory]): Shared buffers attached by this connection.
+
+        Returns:
+            dict: Reply message.
+
+        Raises:
+            ValueError: If the request is malformed.
+        """
+        with self._lock:
+            self.requests += 1
+        op = request.get("op")
+        frames = self._frames(request, buffers) if request.get("frames") else []
+        if op == "ping":
+            return {"ok": True, "frames": len(frames), **self.metrics()}
+        if op != "detect":
+            raise ValueError(f"Unknown operation '{op}'")
+
+        started = time.perf_counter()
+        futures = [self.scheduler.submit_async(frame) for frame in frames]
+        detections = [future.result(timeout=self.request_timeout) for future in futures]
+        with self._lock:
+            self.frames += len(frames)
+        return {
+            "ok": True,
+            "detections": [encode_detection(d) for d in detections],
+            "server_ms": (time.perf_counter() - started) * 1000,
+        }
+
+    def release(self, buffers) -> None:
+        """Detach from the buffers of a closed connection."""
+        with self._lock:
+            self.connections += 1
+        self._detach(buffers)
+
+    def _detach(self, buffers) -> None:
+        """Close shared buffers, deferring those a batch still references."""
+        with self._lock:
+            pending, self._stale = [*self._stale, *buffers], []
+            for shm in pending:
+                try:
+                    shm.close()
+                except BufferError:
+                    # A finished batch may still hold views of it; retry later
+                    self._stale.append(shm)
+
+    def metrics(self) -> dict:
+        """Request/frame counters and the batching metrics of the server."""
+        return {
+            "requests": self.requests,
+            "frames_inferred": self.frames,
+            "closed_connections": self.connections,
+            "batching": self.scheduler.metrics(),
+        }
+
+    def _frames(self, request: dict, buffers: Dict[str, shared_memory.SharedMemory]) -> List[np.ndarray]:
+        """NumPy views of the frames of a request, in the client's shared buffer."""
+        name = request["shm"]
+        shm = buffers.get(name)
+        if shm is None:
+            # The client replaced its buffer with a larger one
+            self._detach([buffers.pop(old) for old in list(buffers)])
+            shm = buffers[name] = _attach(name)
+
+        frames = []
+        for offset, shape in request["frames"]:
+            shape = tuple(int(v) for v in shape)
+            if len(shape) != 3 or shape[2] != 3:
+                raise ValueError(f"Expected an HxWx3 BGR frame, got shape {shape}")
+            if offset < 0 or offset + int(np.prod(shape)) > shm.size:
+                raise ValueError("Frame lies outside the shared buffer")
+            frames.append(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset))
+        return frames
+
+
+class _Connection:
+    """Socket and shared buffer of one client thread."""
+
+    def __init__(self, path: str, timeout: float) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self.shm: Optional[shared_memory.SharedMemory] = None
+
+    def buffer(self, size: int) -> shared_memory.SharedMemory:
+        """Shared buffer of at least `size` bytes (replaced when too small)."""
+        if self.shm is None or self.shm.size < size:
+            self.free()
+            self.shm = shared_memory.SharedMemory(create=True, size=max(size, MIN_BUFFER_SIZE))
+            _created.add(self.shm.name)
+        return self.shm
+
+    def free(self) -> None:
+        """Release the shared buffer."""
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            _created.discard(self.shm.name)
+            self.shm = None
+
+    def close(self) -> None:
+        self.sock.close()
+        self.free()
+
+
+class _ThreadToken:
+    """Held in a client thread's locals only: collected when the thread ends."""
+
+
+class InferenceClient:
+    """
+    Drop-in replacement of FallDetectionService (`detect`, `detect_batch`)
+    that sends the frames to an InferenceServer.
+
+    Each thread gets its own connection and shared buffer, so concurrent
+    requests of a worker do not serialize on one socket. They are closed and
+    unlinked when the thread ends.
+
+    Attributes:
+        path (str): Path of the server's Unix socket.
+        timeout (float): Socket timeout, in seconds.
+    """
+    backend = "remote"
+
+    def __init__(self, path: str, timeout: float = 30.0) -> None:
+        """
+        Args:
+            path (str): Path of the server's Unix socket.
+            timeout (float): Socket timeout, in seconds.
+        """
+        self.path = path
+        self.timeout = timeout
+
+        self._local = threading.local()
+        self._connections: List[_Connection] = []
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.round_trips = 0
+        self.round_trip_seconds = 0.0
+        self.server_seconds = 0.0
+
+    def detect(self, image: np.ndarray) -> Detection:
+        """Run the model on one BGR image on the server."""
+        return self.detect_batch([image])[0]
+
+    def detect_batch(self, images: List[np.ndarray]) -> List[Detection]:
+        """
+        Run the model on several BGR images in one round trip.
+
+        Raises:
+            InferenceServerError: If the server could not process the frames.
+            OSError: If the server cannot be reached.
+        """
+        if not images:
+            return []
+        images = [np.ascontiguousarray(image, dtype=np.uint8) for image in images]
+        reply = self._request({"op": "detect"}, images)
+        self.server_seconds += reply["server_ms"] / 1000
+        return [decode_detection(d) for d in reply["detections"]]
+
+    def ping(self, images: Optional[List[np.ndarray]] = None) -> dict:
+        """Round trip without inference (optionally transferring frames); returns the server metrics."""
+        return self._request({"op": "ping"}, images or [])
+
+    def wait_ready(self, timeout: float = 30.0) -> None:
+        """
+        Block until the server answers.
+
+        Raises:
+            TimeoutError: If the server is not reachable within `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.ping()
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"No inference server on {self.path}")
+                time.sleep(0.1)
+
+    def warm_up(self) -> None:
+        """Connect to the server (ModelRegistry.prewarm hook); the model is warmed up there."""
+        self.ping()
+
+    @property
+    def is_loaded(self) -> bool:
+        """True once this process talked to the server."""
+        return self.round_trips > 0
+
+    def load_metrics(self) -> dict:
+        """Round-trip timings, in the shape of FallDetectionService.load_metrics."""
+        return {
+            "backend": self.backend,
+            "socket": self.path,
+            "loaded": self.is_loaded,
+            "round_trips": self.round_trips,
+            "avg_round_trip_ms": (
+                round(self.round_trip_seconds / self.round_trips * 1000, 3) if self.round_trips else None
+            ),
+            "avg_server_ms": (
+                round(self.server_seconds / self.round_trips * 1000, 3) if self.round_trips else None
+            ),
+        }
+
+    def close(self) -> None:
+        """Close every connection and unlink the shared buffers."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+    def _connection(self) -> _Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = _Connection(self.path, self.timeout)
+            with self._lock:
+                self._connections.append(connection)
+            # The thread's locals are cleared when it ends, which releases the connection
+            token = _ThreadToken()
+            weakref.finalize(token, self._release, connection)
+            self._local.connection, self._local.token = connection, token
+        return connection
+
+    def _drop_connection(self) -> None:
+        if getattr(self._local, "connection", None) is not None:
+            self._local.connection = self._local.token = None   # Finalizes the token
+
+    def _release(self, connection: _Connection) -> None:
+        """Close a connection whose thread ended or dropped it."""
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        connection.close()
+
+    def _request(self, message: dict, images: List[np.ndarray]) -> dict:
+        """Write the frames to the shared buffer, send the message and wait for the reply."""
+        started = time.perf_counter()
+        for attempt in (1, 2):
+            try:
+                connection = self._connection()
+                if images:
+                    shm = connection.buffer(sum(image.nbytes for image in images))
+                    frames, offset = [], 0
+                    for image in images:
+                        shm.buf[offset:offset + image.nbytes] = image.reshape(-1)
+                        frames.append([offset, list(image.shape)])
+                        offset += image.nbytes
+                    message = {**message, "shm": shm.name, "frames": frames}
+                _send(connection.sock, message)
+                reply = _recv(connection.sock)
+                if reply is None:
+                    raise ConnectionResetError("Inference server closed the connection")
+                break
+            except (ConnectionError, FileNotFoundError):
+                # Server restarted: retry once on a fresh connection
+                self._drop_connection()
+                if attempt == 2:
+                    raise
+            except OSError:
+                # Timeouts included: the server may still be running these frames, so
+                # never send them again; the late reply would also desync this socket
+                self._drop_connection()
+                raise
+        if not reply.get("ok"):
+            raise InferenceServerError(reply.get("error", "unknown error"))
+        self.round_trips += 1
+        self.round_trip_seconds += time.perf_counter() - started
+        return reply
@@ -0,0 +1,93 @@
+"""
+Frame ingestion helpers for the live detection endpoints.
+
+Frames can reach the server in three shapes:
+- JSON body with a base64 string: {"image": "<base64 jpeg>"} (legacy contract)
+- Raw binary body with an image content type (e.g. `image/jpeg`)
+- multipart/form-data with the encoded image in an `image` file part
+
+Binary payloads are decoded straight from the request buffer: `np.frombuffer`
+wraps the bytes without copying them before `cv2.imdecode`.
+"""
+
+import base64
+import json
+
+import cv2
+import numpy as np
+
+
+class FrameDecodeError(ValueError):
+    """Raised when a request does not contain a decodable image."""
+
+
+def decode_image_buffer(buffer) -> np.ndarray:
+    """
+    Decode an encoded image (JPEG, PNG, ...) from any bytes-like buffer.
+
+    Args:
+        buffer: bytes, bytearray or memoryview holding the encoded image.
+
+    Returns:
+        np.ndarray: Decoded BGR image.
+    """
+    if buffer is None or len(buffer) == 0:
+        raise FrameDecodeError("No image provided")
+    img = cv2.imdecode(np.frombuffer(buffer, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise FrameDecodeError("Image décompressée est None")
+    return img
+
+
+def decode_json_frame(body: bytes) -> np.ndarray:
+    """
+    Decode the legacy JSON contract: {"image": "<base64 jpeg>"}.
+    """
+    try:
+        payload = json.loads(body.decode("utf-8"))
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise FrameDecodeError("Invalid JSON") from e
+
+    base64_data = payload.get("image") if isinstance(payload, dict) else None
+    if not base64_data:
+        raise FrameDecodeError("No image provided")
+    try:
+        img_bytes = base64.b64decode(base64_data)
+    except (ValueError, TypeError) as e:
+        raise FrameDecodeError(f"Invalid image data: {e}") from e
+    return decode_image_buffer(img_bytes)
+
+
+def _upload_buffer(upload):
+    """
+    Return the bytes of an uploaded file, without a copy when it lives in memory.
+    """
+    inner = getattr(upload, "file", None)
+    if hasattr(inner, "getbuffer"):
+        return inner.getbuffer()
+    upload.seek(0)
+    return upload.read()
+
+
+def decode_request_frame(request) -> np.ndarray:
+    """
+    Decode the frame of a live detection request, whatever its content type.
+
+    Args:
+        request: Django HttpRequest posted to the detection endpoint.
+
+    Returns:
+        np.ndarray: Decoded BGR image.
+
+    Raises:
+        FrameDecodeError: If the body does not contain a decodable image.
+    """
+    content_type = request.content_type or ""
+    if content_type.startswith("image/") or content_type == "application/octet-stream":
+        return decode_image_buffer(request.body)
+    if content_type == "multipart/form-data":
+        upload = request.FILES.get("image")
+        if upload is None:
+            raise FrameDecodeError("No image provided")
+        return decode_image_buffer(_upload_buffer(upload))
+    return decode_json_frame(request.body)
@@ -0,0 +1,524 @@
+"""
+Background jobs for work too slow for an HTTP request.
+
+Uploaded video analysis and clip extraction can take seconds to minutes.
+Request handlers `enqueue` a job and return immediately with its id; the
+client polls its status and progress (JobStatusView) and may cancel it
+(JobCancelView).
+
+A job is a registered function `fn(ctx, **params) -> dict` plus a Job row
+holding its state. The function reports progress with `ctx.progress(...)`,
+which is also where a cancellation request stops it (JobCancelled), so
+cancellation is cooperative and works the same with every backend. A kind
+may register a `cleanup(**params)` hook, run when a job of that kind will
+never run: cancelled while queued, or lost by a stopped process (e.g. the
+uploaded video of an analysis is deleted).
+
+Backends (settings.JOB_BACKEND):
+- "thread" (default): a fixed-size pool of JOB_WORKERS threads in the web
+  process. Jobs queued or running when the process stops are lost: each
+  job records the process holding it (host, pid and process start time, so
+  a reused pid is not mistaken for the original process), and the first
+  request of a process marks the jobs of stopped processes of the same host
+  failed (JobQueue.recover).
+- "celery": jobs are sent to the `detection.run_job` task of a Celery worker
+  (`celery -A backend worker`, broker CELERY_BROKER_URL; requires the dev
+  extras celery/redis).
+- "sync": run in the calling thread (tests, management commands).
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when its cancellation was requested."""
+
+
+class JobContext:
+    """
+    Handle given to a running job function to report progress.
+
+    Progress is written to the Job row at most every `interval` seconds, and
+    each write checks whether a cancellation was requested.
+    """
+    def __init__(self, job: Job, interval: float = 0.5) -> None:
+        """
+        Args:
+            job (Job): The running job.
+            interval (float): Minimum seconds between two progress writes.
+        """
+        self.job = job
+        self.interval = interval
+        self._last_write = float("-inf")
+
+    def progress(self, fraction: float, message: str = "", force: bool = False) -> None:
+        """
+        Report progress (0-1) and stop the job if it was cancelled.
+
+        Raises:
+            JobCancelled: If a cancellation was requested.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_write < self.interval:
+            return
+        self._last_write = now
+        fields = {"progress": min(max(float(fraction), 0.0), 1.0)}
+        if message:
+            fields["message"] = message[:255]
+        Job.objects.filter(pk=self.job.pk).update(**fields)
+        if Job.objects.filter(pk=self.job.pk, cancel_requested=True).exists():
+            raise JobCancelled()
+
+
+class JobRegistry:
+    """Job functions by kind."""
+
+    def __init__(self) -> None:
+        self._functions: Dict[str, Callable[..., dict]] = {}
+        self._cleanups: Dict[str, Callable[..., None]] = {}
+
+    def register(self, kind: str, cleanup: Optional[Callable[..., None]] = None) -> Callable:
+        """
+        Decorator registering a job function under `kind`.
+
+        Args:
+            kind (str): Name of the job kind.
+            cleanup (Callable | None): Called with the job params when a job of this
+                kind will never run (cancelled while queued, or lost).
+        """
+        def decorator(fn: Callable[..., dict]) -> Callable[..., dict]:
+            self._functions[kind] = fn
+            if cleanup is not None:
+                self._cleanups[kind] = cleanup
+            return fn
+        return decorator
+
+    def get(self, kind: str) -> Callable[..., dict]:
+        """
+        Return the function of a kind.
+
+        Raises:
+            KeyError: If no function is registered under `kind`.
+        """
+        return self._functions[kind]
+
+    def cleanup(self, job: Job) -> None:
+        """Run the cleanup hook of a job that will never run, if its kind has one."""
+        cleanup = self._cleanups.get(job.kind)
+        if cleanup is None:
+            return
+        try:
+            cleanup(**job.params)
+        except Exception:
+            logger.exception("Cleanup of job %s (%s) failed", job.pk, job.kind)
+
+    def __contains__(self, kind: str) -> bool:
+        return kind in self._functions
+
+
+job_registry = JobRegistry()
+
+
+def run_job(job_id) -> Optional[Job]:
+    """
+    Execute a queued job (called by every backend's worker).
+
+    The job only starts if it is still queued (it may have been cancelled
+    meanwhile); its outcome is written to the row.
+
+    Returns:
+        Job | None: The finished job, or None if it was not queued anymore.
+    """
+    started = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+        status=Job.RUNNING, started_at=timezone.now()
+    )
+    if not started:
+        return None
+    job = Job.objects.get(pk=job_id)
+    fields = {}
+    try:
+        result = job_registry.get(job.kind)(JobContext(job), **job.params)
+        fields.update(status=Job.SUCCEEDED, progress=1.0, result=result or {})
+    except JobCancelled:
+        fields.update(status=Job.CANCELLED, message="Cancelled")
+    except Exception as e:
+        logger.exception("Job %s (%s) failed", job.pk, job.kind)
+        fields.update(status=Job.FAILED, error=f"{type(e).__name__}: {e}")
+    fields["finished_at"] = timezone.now()
+    Job.objects.filter(pk=job.pk).update(**fields)
+    job.refresh_from_db()
+    return job
+
+
+class SynchronousJobBackend:
+    """Runs jobs in the calling thread."""
+
+    def submit(self, job_id) -> None:
+        run_job(job_id)
+
+    def close(self) -> None:
+        pass
+
+    def lost_jobs(self) -> List[Job]:
+        return []
+
+    def metrics(self) -> dict:
+        return {"backend": "sync"}
+
+
+class ThreadPoolJobBackend:
+    """
+    Runs jobs on a fixed-size pool of threads of this process.
+
+    Attributes:
+        workers (int): Number of jobs running at once.
+    """
+    def __init__(self, workers: int = 2) -> None:
+        """
+        Args:
+            workers (int): Number of jobs running at once.
+        """
+        self.workers = max(1, int(workers))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @staticmethod
+    def worker_id() -> str:
+        """
+        Return "host:pid:start" of this process (read on every call: forked workers
+        get a new pid). `start` is empty where the start time cannot be read.
+        """
+        pid = os.getpid()
+        return f"{socket.gethostname()}:{pid}:{_process_start(pid)}"
+
+    def submit(self, job_id) -> None:
+        """Record this process on the job and queue it for the next free worker thread."""
+        Job.objects.filter(pk=job_id).update(worker=self.worker_id())
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            self._pending += 1
+        self._executor.submit(self._run, job_id)
+
+    def lost_jobs(self) -> List[Job]:
+        """
+        Queued or running jobs held by processes of this host that no longer exist,
+        including those whose pid now belongs to a process started later.
+        """
+        host = socket.gethostname()
+        unfinished = Job.objects.filter(status__in=(Job.QUEUED, Job.RUNNING), worker__startswith=f"{host}:")
+        return [job for job in unfinished if not _worker_alive(job.worker)]
+
+    def close(self, wait: bool = True) -> None:
+        """Stop the worker threads (queued jobs are dropped)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def metrics(self) -> dict:
+        return {"backend": "thread", "workers": self.workers, "pending": self._pending}
+
+    def _run(self, job_id) -> None:
+        # Worker threads own their database connection, like request threads
+        close_old_connections()
+        try:
+            run_job(job_id)
+        except Exception:
+            logger.exception("Job %s could not be run", job_id)
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._pending -= 1
+
+
+def _worker_alive(worker: str) -> bool:
+    """True if the "host:pid[:start]" process of a job still runs on this host."""
+    _, _, token = worker.partition(":")
+    pid, _, start = token.partition(":")
+    if not _process_alive(pid):
+        return False
+    # A live pid with another start time was reused by a newer process
+    return not start or start == _process_start(int(pid))
+
+
+def _process_alive(pid: str) -> bool:
+    """True if a process with this pid exists on this host."""
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True   # Exists, owned by another user
+    return True
+
+
+def _process_start(pid: int) -> str:
+    """
+    Start time of a process in clock ticks since boot (Linux /proc), or "" if unknown.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return ""
+    # Fields after the parenthesized command name, which may contain spaces; starttime is field 22
+    fields = stat.rpartition(")")[2].split()
+    return fields[19] if len(fields) > 19 else ""
+
+
+class CeleryJobBackend:
+    """Sends jobs to the `detection.run_job` task of a Celery worker."""
+
+    def submit(self, job_id) -> None:
+        from backend.celery import app  # Optional dependency: pip install celery redis
+        app.send_task("detection.run_job", args=[str(job_id)])
+
+    def close(self) -> None:
+        pass
+
+    def lost_jobs(self) -> List[Job]:
+        return []   # The broker keeps the jobs of a restarted worker
+
+    def metrics(self) -> dict:
+        return {"backend": "celery"}
+
+
+JOB_BACKENDS = {
+    "thread": lambda: ThreadPoolJobBackend(getattr(settings, "JOB_WORKERS", 2)),
+    "celery": CeleryJobBackend,
+    "sync": SynchronousJobBackend,
+}
+
+
+class JobQueue:
+    """
+    Creates, dispatches and cancels jobs.
+
+    Attributes:
+        backend: Executes the submitted jobs (see JOB_BACKENDS).
+    """
+    def __init__(self, backend) -> None:
+        """
+        Args:
+            backend: Job backend (ThreadPoolJobBackend, CeleryJobBackend or SynchronousJobBackend).
+        """
+        self.backend = backend
+
+    def enqueue(self, kind: str, params: Optional[dict] = None, user=None) -> Job:
+        """
+        Create a job and hand it to the backend once the transaction commits.
+
+        Args:
+            kind (str): Registered job function.
+            params (dict | None): JSON keyword arguments of the function.
+            user: User submitting the job (anonymous users are not recorded).
+
+        Returns:
+            Job: The queued job.
+
+        Raises:
+            KeyError: If no function is registered under `kind`.
+        """
+        job_registry.get(kind)
+        job = Job.objects.create(
+            kind=kind,
+            params=params or {},
+            created_by=user if user is not None and user.is_authenticated else None,
+        )
+        transaction.on_commit(lambda: self.backend.submit(job.pk))
+        return job
+
+    def cancel(self, job: Job) -> Job:
+        """
+        Cancel a job: a queued job never starts, a running job stops at its
+        next progress report. Finished jobs are left unchanged.
+
+        Returns:
+            Job: The refreshed job.
+        """
+        if Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+            status=Job.CANCELLED, cancel_requested=True, message="Cancelled", finished_at=timezone.now()
+        ):
+            job_registry.cleanup(job)   # Never started: e.g. delete its upload
+        else:
+            Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(cancel_requested=True)
+        job.refresh_from_db()
+        return job
+
+    def recover(self) -> int:
+        """
+        Mark the jobs the backend lost (their process stopped) failed and run
+        their cleanup hook.
+
+        Returns:
+            int: Number of jobs marked failed.
+        """
+        failed = 0
+        for job in self.backend.lost_jobs():
+            if Job.objects.filter(pk=job.pk, status=job.status).update(
+                status=Job.FAILED, error="Lost: the process running the job stopped",
+                finished_at=timezone.now(),
+            ):
+                logger.warning("Job %s (%s) was lost by %s", job.pk, job.kind, job.worker)
+                job_registry.cleanup(job)
+                failed += 1
+        return failed
+
+    def metrics(self) -> dict:
+        """Backend metrics and job counts by status."""
+        from django.db.models import Count
+        counts = dict(Job.objects.values_list("status").annotate(n=Count("pk")).order_by())
+        return {**self.backend.metrics(), "jobs": counts}
+
+
+def job_queue_from_settings() -> JobQueue:
+    """
+    Build the job queue from settings.JOB_BACKEND.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    name = getattr(settings, "JOB_BACKEND", "thread")
+    if name not in JOB_BACKENDS:
+        raise ValueError(f"Unknown job backend '{name}', expected one of {sorted(JOB_BACKENDS)}")
+    return JobQueue(JOB_BACKENDS[name]())
+
+
+def job_payload(job: Job) -> dict:
+    """JSON representation of a job for status polling."""
+    return {
+        "id": str(job.pk),
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "result": job.result,
+        "error": job.error,
+        "cancel_requested": job.cancel_requested,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+# Process-wide queue used by the views
+job_queue = job_queue_from_settings()
+
+
+def _recover_lost_jobs(**kwargs) -> None:
+    """Fail the jobs lost by stopped processes, once, on the first request of this process."""
+    request_started.disconnect(_recover_lost_jobs)
+    try:
+        job_queue.recover()
+    except Exception:
+        logger.exception("Could not recover lost jobs")
+
+
+request_started.connect(_recover_lost_jobs)
+
+
+def _delete_upload(upload: str, **params) -> None:
+    """Delete the uploaded video of an analysis that will never run."""
+    from django.core.files.storage import default_storage
+    default_storage.delete(upload)
+
+
+@job_registry.register("analyze_upload", cleanup=_delete_upload)
+def analyze_upload(ctx: JobContext, upload: str, name: str, description: str = "") -> dict:
+    """
+    Analyze an uploaded video (kept in the default storage until done) and
+    open a test alert if a fall was tracked.
+
+    Returns:
+        dict: Decision, per-second timeline, annotated peak frame (base64 JPEG)
+        and the id of the alert, if any.
+    """
+    import base64
+    from dataclasses import asdict
+
+    import cv2
+    from django.core.files.storage import default_storage
+
+    from .models import FallAlert
+    from .pipeline import TRACKING_ENABLED, video_analyzer
+
+    try:
+        ctx.progress(0.0, "Analysing video", force=True)
+        analysis = video_analyzer.analyze(
+            default_storage.path(upload),
+            progress=lambda fraction: ctx.progress(fraction, "Analysing video"),
+        )
+    finally:
+        default_storage.delete(upload)
+
+    preview = analysis.peak_detection.draw(analysis.peak_frame)
+    _, buf = cv2.imencode(".jpg", preview)
+    alert_id = None
+    if analysis.fall:
+        alert_data = {
+            "detected_by": "test_upload",
+            "description": description or f"Test upload: {name}",
+            "yolo_confidence": analysis.confidence,
+            "yolo_class": "Fall-Detected",
+        }
+        if TRACKING_ENABLED:
+            alert_data["fall_state"] = analysis.max_state
+        alert = FallAlert.objects.create(**alert_data)
+        alert.save_snapshot_from_frame(analysis.peak_frame)
+        alert.save()
+        alert_id = alert.pk
+
+    confidence = analysis.confidence
+    return {
+        "name": name,
+        "fall": analysis.fall,
+        "confidence": float(confidence) if confidence is not None else None,
+        "max_state": analysis.max_state,
+        "duration": analysis.duration,
+        "frames": analysis.frames,
+        "fall_seconds": analysis.fall_seconds(),
+        "peak_timestamp": analysis.peak_timestamp,
+        "timeline": [
+            {**asdict(s), "confidence": float(s.confidence) if s.confidence is not None else None}
+            for s in analysis.timeline
+        ],
+        "elapsed": analysis.elapsed,
+        "preview": base64.b64encode(buf).decode(),
+        "alert_id": alert_id,
+    }
+
+
+@job_registry.register("attach_clip")
+def attach_clip(ctx: JobContext, alert_id: int, source: str, duration: float = 10.0) -> dict:
+    """
+    Extract the clip around an alert from a recorded source and attach it.
+
+    Returns:
+        dict: Whether a clip was attached, and its URL.
+    """
+    from .models import FallAlert
+    from .services import VideoClipService
+
+    ctx.progress(0.0, "Extracting clip", force=True)
+    alert = FallAlert.objects.get(pk=alert_id)
+    attached = VideoClipService(source).attach_clip_to_alert(
+        alert, start_time=alert.timestamp.timestamp(), duration=duration
+    )
+    return {"attached": bool(attached), "clip_url": alert.video_clip.url if alert.video_clip else None}
@@ -0,0 +1,36 @@
+"""
+Management command running the detection micro-benchmarks.
+
+Usage:
+    python manage.py benchmark ingest --iterations 200
+    python manage.py benchmark --list
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = "Run a detection pipeline micro-benchmark and print its results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("name", nargs="?", help="Benchmark to run")
+        parser.add_argument("--iterations", type=int, default=200, help="Iterations per measurement")
+        parser.add_argument("--list", action="store_true", help="List available benchmarks")
+
+    def handle(self, *args, **options):
+        if options["list"] or not options["name"]:
+            for name, fn in BENCHMARKS.items():
+                summary = (fn.__doc__ or "").strip().splitlines()[0] if fn.__doc__ else ""
+                self.stdout.write(f"{name:12s} {summary}")
+            return
+
+        name = options["name"]
+        if name not in BENCHMARKS:
+            raise CommandError(f"Unknown benchmark '{name}'. Use --list to see available ones.")
+
+        results = BENCHMARKS[name](iterations=options["iterations"])
+        self.stdout.write(json.dumps(results, indent=2, default=str))
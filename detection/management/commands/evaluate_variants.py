@@ -0,0 +1,95 @@
+"""
+Management command measuring the accuracy/speed trade-off of the model variants.
+
+Runs each variant (see detection.backends.VARIANTS) over a labeled folder
+(`fall/` and `no_fall/` sub-folders of images and/or videos) and reports the
+precision and recall of the Fall-Detected decision at the service's
+conf_threshold, next to the per-frame latency, load time and memory. Each
+variant runs in a fresh process so memory figures do not add up.
+
+Usage:
+    python manage.py evaluate_variants --dataset data/falls
+    python manage.py evaluate_variants --dataset data/falls --variant fp32-640 --variant int8-416
+    python manage.py evaluate_variants --dataset data/falls --conf 0.6 --video-stride 10
+"""
+
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.backends import VARIANTS
+
+
+def evaluate_variant(variant: str, options: dict) -> dict:
+    """Load one variant and evaluate it on the dataset (runs in a child process)."""
+    import django
+    django.setup()
+
+    from detection.benchmarks import evaluate_detector, load_labeled_frames, rss_mb
+    from detection.services import FallDetectionService
+
+    frames, labels = load_labeled_frames(
+        options["dataset"], options["video_stride"], options["max_frames"]
+    )
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    service = FallDetectionService(
+        options["model"], conf_threshold=options["conf"], variant=variant, threads=options["threads"]
+    )
+    load_seconds = time.perf_counter() - started
+    rss_loaded = rss_mb()
+
+    for frame in frames[:options["warmup"]]:
+        service.detect(frame)
+    report = evaluate_detector(service.detect, frames, labels)
+    report["load_seconds"] = round(load_seconds, 2)
+    if rss_before is not None:
+        report["model_rss_mb"] = round(rss_loaded - rss_before, 1)
+    report["description"] = VARIANTS[variant].description
+    return report
+
+
+class Command(BaseCommand):
+    help = "Evaluate precision/recall, latency and memory of each model variant on a labeled folder."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dataset", required=True, help="Folder with fall/ and no_fall/ sub-folders")
+        parser.add_argument("--model", default="model_dl/best.pt", help="PyTorch weights the variants derive from")
+        parser.add_argument(
+            "--variant", action="append", choices=sorted(VARIANTS), default=[],
+            help="Variant to evaluate (repeatable, default: all)",
+        )
+        parser.add_argument("--conf", type=float, default=0.7, help="Fall confidence threshold")
+        parser.add_argument("--video-stride", type=int, default=5, help="Keep one video frame out of N")
+        parser.add_argument("--max-frames", type=int, default=None, help="Cap on the frames per label")
+        parser.add_argument("--warmup", type=int, default=3, help="Untimed frames per variant")
+        parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads")
+        parser.add_argument(
+            "--in-process", action="store_true",
+            help="Run every variant in this process (faster, memory figures accumulate)",
+        )
+
+    def handle(self, *args, **options):
+        variants = options["variant"] or list(VARIANTS)
+        params = {key: options[key] for key in (
+            "dataset", "model", "conf", "video_stride", "max_frames", "warmup", "threads",
+        )}
+
+        report = {}
+        for variant in variants:
+            self.stderr.write(f"Evaluating {variant}...")
+            try:
+                if options["in_process"]:
+                    report[variant] = evaluate_variant(variant, params)
+                else:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                        report[variant] = pool.submit(evaluate_variant, variant, params).result()
+            except FileNotFoundError as e:
+                raise CommandError(str(e)) from e
+            except ImportError as e:
+                report[variant] = {"error": str(e)}
+
+        self.stdout.write(json.dumps({"conf_threshold": options["conf"], "variants": report}, indent=2))
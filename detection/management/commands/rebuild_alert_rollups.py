@@ -0,0 +1,24 @@
+"""
+Management command recomputing the AlertRollup counters from FallAlert.
+
+Rollups are maintained incrementally by signal handlers; rebuild them after
+bulk imports, `QuerySet.update()` calls (which send no signals) or a
+TIME_ZONE change.
+
+Usage:
+    python manage.py rebuild_alert_rollups
+"""
+
+from django.core.management.base import BaseCommand
+
+from detection.rollups import rebuild_alert_rollups
+from detection.stats import invalidate_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per day/hour/source/state alert rollups from scratch."
+
+    def handle(self, *args, **options):
+        buckets = rebuild_alert_rollups()
+        invalidate_dashboard_stats()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} alert rollup bucket(s)"))
@@ -0,0 +1,77 @@
+"""
+Management command reading IP cameras server side and running fall detection on them.
+
+Usage:
+    python manage.py run_camera_workers                         # cameras from settings.CAMERA_SOURCES
+    python manage.py run_camera_workers --camera room_12=rtsp://10.0.0.12/stream
+    python manage.py run_camera_workers --camera test=clip.mp4 --realtime   # offline stand-in
+    python manage.py run_camera_workers --fixed-rate            # infer every frame the workers keep up with
+
+By default each camera is inferred at the rate its activity calls for
+(settings CAMERA_*_FPS, INFERENCE_CPU_BUDGET; see detection/ratecontrol.py).
+"""
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from detection.cameras import CameraReader, CameraWorkerPool
+from detection.ratecontrol import rate_controller_from_settings
+
+
+class Command(BaseCommand):
+    help = "Read camera streams with one reader thread per camera and run live fall detection on them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--camera", action="append", default=[], metavar="ID=SOURCE",
+            help="Camera id and RTSP URL / video file (repeatable). Defaults to settings.CAMERA_SOURCES.",
+        )
+        parser.add_argument("--workers", type=int, default=2, help="Inference threads shared by all cameras")
+        parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+        parser.add_argument(
+            "--realtime", action="store_true",
+            help="Read video files at their native FPS, as a live camera would deliver them",
+        )
+        parser.add_argument(
+            "--fixed-rate", action="store_true",
+            help="Do not adapt the inference rate of each camera to its activity",
+        )
+
+    def handle(self, *args, **options):
+        sources = self._parse_sources(options["camera"]) or dict(getattr(settings, "CAMERA_SOURCES", {}))
+        if not sources:
+            raise CommandError("No camera configured. Use --camera ID=SOURCE or settings.CAMERA_SOURCES.")
+
+        from detection.pipeline import live_pipeline, model_registry
+
+        # Load the model before the cameras start so the first frames are not delayed
+        model_registry.prewarm(background=False)
+        self.stdout.write(json.dumps(model_registry.metrics()))
+
+        readers = {
+            camera_id: CameraReader(camera_id, source, realtime=options["realtime"])
+            for camera_id, source in sources.items()
+        }
+        rate = None if options["fixed_rate"] else rate_controller_from_settings()
+        pool = CameraWorkerPool(readers, live_pipeline.process, workers=options["workers"], rate=rate)
+
+        self.stdout.write(f"Starting {len(readers)} camera(s) with {options['workers']} inference worker(s)")
+        try:
+            pool.run(duration=options["duration"])
+        except KeyboardInterrupt:
+            pool.stop()
+
+        self.stdout.write(json.dumps(pool.metrics(), indent=2))
+        if rate is not None:
+            self.stdout.write(json.dumps(rate.metrics(), indent=2))
+
+    def _parse_sources(self, values):
+        sources = {}
+        for value in values:
+            camera_id, sep, source = value.partition("=")
+            if not sep or not camera_id or not source:
+                raise CommandError(f"Invalid --camera value '{value}', expected ID=SOURCE")
+            sources[camera_id] = source
+        return sources
@@ -0,0 +1,74 @@
+"""
+Management command running the shared inference server.
+
+Loads the fall detection model once (YOLO_* / ONNX_* settings) and serves
+every Django worker configured with the same INFERENCE_SERVER_SOCKET.
+
+Usage:
+    python manage.py run_inference_server
+    python manage.py run_inference_server --socket /run/fall/inference.sock
+"""
+
+import json
+import os
+import signal
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Per-user private directory (created 0700 by the server), never a shared /tmp path
+DEFAULT_SOCKET = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"fall-inference-{os.getuid()}"),
+    "fall-inference.sock",
+)
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = "Serve fall detection inference to the web workers over a Unix socket and shared memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--socket", default=getattr(settings, "INFERENCE_SERVER_SOCKET", "") or DEFAULT_SOCKET,
+            help="Unix socket path (default: INFERENCE_SERVER_SOCKET)",
+        )
+        parser.add_argument(
+            "--window-ms", type=float, default=getattr(settings, "YOLO_BATCH_WINDOW_MS", 20.0),
+            help="Micro-batching window across workers (default: YOLO_BATCH_WINDOW_MS)",
+        )
+        parser.add_argument("--no-warmup", action="store_true", help="Load the model on the first frame")
+
+    def handle(self, *args, **options):
+        from detection.inference_server import InferenceServer
+        from detection.pipeline import local_fall_service
+
+        service = local_fall_service(lazy=options["no_warmup"])
+        if not options["no_warmup"]:
+            service.warm_up()
+            self.stdout.write(json.dumps(service.load_metrics()))
+
+        server = InferenceServer(
+            service,
+            options["socket"],
+            window_ms=options["window_ms"],
+            max_batch_size=getattr(settings, "YOLO_BATCH_MAX_SIZE", 8),
+        )
+        try:
+            server.bind()
+        except OSError as e:
+            raise CommandError(f"Cannot listen on {options['socket']}: {e}") from e
+
+        # Exit cleanly (socket removed) on SIGTERM as on Ctrl-C
+        signal.signal(signal.SIGTERM, _interrupt)
+        self.stdout.write(f"Inference server listening on {options['socket']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+        self.stdout.write(json.dumps(server.metrics(), indent=2))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+def backfill_alert_rollups(apps, schema_editor):
+    """Build the rollups of the alerts that existed before the table."""
+    from detection.rollups import rebuild_alert_rollups
+    rebuild_alert_rollups(apps.get_model('detection', 'FallAlert'), apps.get_model('detection', 'AlertRollup'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0004_fallalert_fall_state_fallalert_time_on_ground'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('detected_by', models.CharField(max_length=64)),
+                ('fall_state', models.CharField(blank=True, max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('acknowledged_count', models.IntegerField(default=0)),
+                ('response_count', models.IntegerField(default=0)),
+                ('response_seconds', models.FloatField(default=0.0)),
+                ('accurate_count', models.IntegerField(default=0)),
+                ('inaccurate_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['date', 'hour'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'hour', 'detected_by', 'fall_state'), name='unique_alert_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_alert_rollups, migrations.RunPython.noop),
+    ]
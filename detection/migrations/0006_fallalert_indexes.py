@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0005_alertrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fallalert',
+            index=models.Index(fields=['-timestamp'], name='fallalert_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fallalert',
+            index=models.Index(fields=['detected_by', '-timestamp'], name='fallalert_source_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fallalert',
+            index=models.Index(condition=models.Q(('acknowledged', False)), fields=['-timestamp'], name='fallalert_pending_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fallalert',
+            index=models.Index(condition=models.Q(('is_accurate__isnull', False)), fields=['is_accurate', '-timestamp'], name='fallalert_marked_idx'),
+        ),
+    ]
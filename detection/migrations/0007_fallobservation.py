@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('detection', '0006_fallalert_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FallObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('track_id', models.CharField(blank=True, max_length=32)),
+                ('confidence', models.FloatField(blank=True, null=True)),
+                ('fall_state', models.CharField(blank=True, max_length=20)),
+                ('time_on_ground', models.FloatField(default=0.0)),
+                ('x1', models.IntegerField(blank=True, null=True)),
+                ('y1', models.IntegerField(blank=True, null=True)),
+                ('x2', models.IntegerField(blank=True, null=True)),
+                ('y2', models.IntegerField(blank=True, null=True)),
+                ('alert', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='observations', to='detection.fallalert')),
+            ],
+            options={
+                'ordering': ['timestamp'],
+                'indexes': [models.Index(fields=['alert', 'timestamp'], name='fallobs_alert_ts_idx')],
+            },
+        ),
+    ]
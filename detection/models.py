@@ -2,23 +2,28 @@
 Models for the detection app.
 
 Defines the FallAlert model, which represents a detected fall incident,
-and utility functions for dynamically generating upload paths for snapshots and video clips.
+the FallObservation model holding the per-frame samples of an alert, the
+AlertRollup model holding incrementally maintained alert counters, the Job
+model tracking background work (see jobs.py), and
+utility functions for dynamically generating upload paths for snapshots and video clips.
 """
 
 import os
 import uuid
-import tempfile
 from django.db import models
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
 from django.utils import timezone
-from django.conf import settings
-from PIL import Image
 import numpy as np
-import cv2
+
+from .encoding import snapshot_file
 
 User = get_user_model()
 
+# FallAlert fields that determine its AlertRollup bucket and counters
+ROLLUP_FIELDS = {
+    "timestamp", "detected_by", "fall_state", "acknowledged", "acknowledged_at", "is_accurate",
+}
+
 def snapshot_upload_to(instance, filename):
     """
     Generate a dynamic upload path for snapshot images.
@@ -180,6 +185,55 @@ class FallAlert(models.Model):
 
     class Meta:
         ordering = ["-timestamp"]
+        indexes = [
+            # Default ordering, recent alerts, date range filters
+            models.Index(fields=["-timestamp"], name="fallalert_ts_idx"),
+            # Per-source throttle lookup (latest alert of a camera) and source filters/lists
+            models.Index(fields=["detected_by", "-timestamp"], name="fallalert_source_ts_idx"),
+            # Alerts waiting for a caregiver, newest first
+            models.Index(
+                fields=["-timestamp"], condition=models.Q(acknowledged=False),
+                name="fallalert_pending_ts_idx",
+            ),
+            # Alerts whose accuracy has been reviewed
+            models.Index(
+                fields=["is_accurate", "-timestamp"], condition=models.Q(is_accurate__isnull=False),
+                name="fallalert_marked_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Keep the rollup contribution of the loaded row, so a later save can
+        move it between AlertRollup buckets (see rollups.py).
+        """
+        instance = super().from_db(db, field_names, values)
+        if not instance.get_deferred_fields() & ROLLUP_FIELDS:
+            instance._rollup_snapshot = instance.rollup_contribution()
+        return instance
+
+    def rollup_contribution(self):
+        """
+        Return (bucket key, counter values) of this alert in AlertRollup.
+
+        The bucket is (date, hour, detected_by, fall_state) in the current time zone.
+        """
+        local = timezone.localtime(self.timestamp)
+        key = (local.date(), local.hour, self.detected_by, self.fall_state or "")
+
+        responded = self.acknowledged and self.acknowledged_at is not None
+        values = {
+            "count": 1,
+            "acknowledged_count": int(bool(self.acknowledged)),
+            "response_count": int(responded),
+            "response_seconds": (
+                (self.acknowledged_at - self.timestamp).total_seconds() if responded else 0.0
+            ),
+            "accurate_count": int(self.is_accurate is True),
+            "inaccurate_count": int(self.is_accurate is False),
+        }
+        return key, values
 
     def __str__(self):
         """
@@ -194,39 +248,25 @@ class FallAlert(models.Model):
         """
         Save an OpenCV frame (BGR numpy.ndarray) as a JPEG image to image_snapshot.
 
-        Converts the frame from BGR to RGB, encodes it as JPEG using PIL,
-        and saves it to the image_snapshot field. Cleans up the temporary file after saving.
+        The frame is encoded in memory with cv2.imencode (quality and maximum
+        width from settings.SNAPSHOT_JPEG_QUALITY / SNAPSHOT_MAX_WIDTH) and
+        saved to the image_snapshot field without a temporary file.
         """
-        # Convert BGR to RGB for PIL compatibility
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img_pil = Image.fromarray(rgb)
-        tmp_io = tempfile.NamedTemporaryFile(suffix=".jpg", delete=False)
-        img_pil.save(tmp_io, format="JPEG")
-        tmp_io.flush()
-        tmp_io.seek(0)
-
-        # Generate a unique filename and save to the model field
-        filename = os.path.basename(tmp_io.name)
-        django_file = ContentFile(tmp_io.read(), name=filename)
-        self.image_snapshot.save(filename, django_file, save=False)
-
-        tmp_io.close()
-        try:
-            os.unlink(tmp_io.name)
-        except OSError:
-            pass
+        django_file = snapshot_file(frame)
+        self.image_snapshot.save(django_file.name, django_file, save=False)
 
     def mark_acknowledged(self, user):
         """
         Mark this alert as acknowledged by the given user.
 
         Sets acknowledged to True, records the user and the current timestamp,
-        and saves the model instance.
+        and saves these fields only.
         """
         self.acknowledged = True
         self.acknowledged_by = user
         self.acknowledged_at = timezone.now()
-        self.save()
+        # Only these columns: the row may have been escalated since this instance was loaded
+        self.save(update_fields=["acknowledged", "acknowledged_by", "acknowledged_at"])
 
     def mark_accuracy(self, user, is_accurate):
         """
@@ -236,12 +276,12 @@ class FallAlert(models.Model):
             user: The user marking the accuracy.
             is_accurate (bool): True if the detection was accurate, False otherwise.
 
-        Updates the is_accurate field, records the user and timestamp, and saves the model.
+        Updates the is_accurate field, records the user and timestamp, and saves these fields only.
         """
         self.is_accurate = is_accurate
         self.accuracy_marked_by = user
         self.accuracy_marked_at = timezone.now()
-        self.save()
+        self.save(update_fields=["is_accurate", "accuracy_marked_by", "accuracy_marked_at"])
         
     def get_urgency_color(self):
         """Returns CSS color corresponding to fall state."""
@@ -261,4 +301,169 @@ class FallAlert(models.Model):
             'urgent': 'Urgent',
             'recovered': 'Recovered'
         }
-        return display_map.get(self.fall_state, 'Unknown')
\ No newline at end of file
+        return display_map.get(self.fall_state, 'Unknown')
+
+
+class FallObservation(models.Model):
+    """
+    One live sighting of a fallen person, linked to the alert of its incident.
+
+    Samples are compact and append-only: they are written in batches with
+    bulk_create (see observations.py) so reviewers can replay confidence and
+    state over time instead of only seeing the last values on the alert.
+
+    Fields:
+        alert: Alert of the incident.
+        timestamp: Capture time of the frame.
+        track_id: Tracked person within the camera.
+        confidence: YOLO confidence of the frame.
+        fall_state: Fall state at that time.
+        time_on_ground: Seconds on the ground at that time.
+        x1, y1, x2, y2: Bounding box of the person (pixels), if any.
+    """
+    alert = models.ForeignKey(
+        FallAlert,
+        on_delete=models.CASCADE,
+        related_name="observations",
+        db_index=False,  # Covered by fallobs_alert_ts_idx
+    )
+    timestamp = models.DateTimeField()
+    track_id = models.CharField(max_length=32, blank=True)
+    confidence = models.FloatField(null=True, blank=True)
+    fall_state = models.CharField(max_length=20, blank=True)
+    time_on_ground = models.FloatField(default=0.0)
+    x1 = models.IntegerField(null=True, blank=True)
+    y1 = models.IntegerField(null=True, blank=True)
+    x2 = models.IntegerField(null=True, blank=True)
+    y2 = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["timestamp"]
+        indexes = [
+            models.Index(fields=["alert", "timestamp"], name="fallobs_alert_ts_idx"),
+        ]
+
+    def __str__(self):
+        """Return the alert, time and state of the sample."""
+        return f"FallObservation alert={self.alert_id} {self.fall_state} at {self.timestamp:%H:%M:%S.%f}"
+
+    @property
+    def bbox(self):
+        """(x1, y1, x2, y2) or None."""
+        if self.x1 is None:
+            return None
+        return (self.x1, self.y1, self.x2, self.y2)
+
+
+class AlertRollup(models.Model):
+    """
+    Alert counters per (date, hour, detected_by, fall_state) bucket.
+
+    Maintained incrementally by signal handlers whenever a FallAlert is
+    created, updated or deleted (see rollups.py), so dashboard and reporting
+    reads scan a few rows per day instead of every alert. Rebuild from
+    scratch with `python manage.py rebuild_alert_rollups`.
+
+    Fields:
+        date: Local date of the alerts.
+        hour: Local hour of day (0-23).
+        detected_by: Source of detection.
+        fall_state: Fall state of the alerts ('' when unknown).
+        count: Number of alerts.
+        acknowledged_count: Acknowledged alerts.
+        response_count: Acknowledged alerts with an acknowledgement time.
+        response_seconds: Sum of their response times in seconds.
+        accurate_count: Alerts marked accurate.
+        inaccurate_count: Alerts marked as false positives.
+    """
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    detected_by = models.CharField(max_length=64)
+    fall_state = models.CharField(max_length=20, blank=True)
+    count = models.IntegerField(default=0)
+    acknowledged_count = models.IntegerField(default=0)
+    response_count = models.IntegerField(default=0)
+    response_seconds = models.FloatField(default=0.0)
+    accurate_count = models.IntegerField(default=0)
+    inaccurate_count = models.IntegerField(default=0)
+
+    COUNTERS = (
+        "count", "acknowledged_count", "response_count", "response_seconds",
+        "accurate_count", "inaccurate_count",
+    )
+
+    class Meta:
+        ordering = ["date", "hour"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["date", "hour", "detected_by", "fall_state"], name="unique_alert_rollup_bucket"
+            ),
+        ]
+
+    def __str__(self):
+        """Return the bucket and its alert count."""
+        return f"AlertRollup {self.date} {self.hour:02d}h {self.detected_by}/{self.fall_state or '-'}: {self.count}"
+
+
+class Job(models.Model):
+    """
+    A unit of background work (video analysis, clip extraction) run by the
+    job queue instead of the HTTP request (see jobs.py).
+
+    The row is the job's shared state: the worker writes its status and
+    progress, request handlers poll it and ask for cancellation.
+
+    Fields:
+        id: Random UUID, used in the status/cancel URLs.
+        kind: Registered job function name.
+        params: JSON arguments of the function.
+        status: queued → running → succeeded / failed / cancelled.
+        progress: Fraction done (0-1).
+        message: Last progress message.
+        result: JSON result of a succeeded job.
+        error: Error message of a failed job.
+        cancel_requested: Set by a cancel request; the running job stops at its next progress report.
+        worker: "host:pid" of the process whose thread backend holds the job (empty for
+            the other backends); lets a restarted process fail the jobs it lost.
+        created_by: User who submitted the job.
+        created_at, started_at, finished_at: Lifecycle timestamps.
+    """
+    QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+        (CANCELLED, "Cancelled"),
+    ]
+    FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=64)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.FloatField(default=0.0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    cancel_requested = models.BooleanField(default=False)
+    worker = models.CharField(max_length=128, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="job_status_created_idx"),
+        ]
+
+    def __str__(self):
+        """Return the kind, status and progress of the job."""
+        return f"Job {self.kind} {self.status} {self.progress:.0%}"
+
+    @property
+    def finished(self) -> bool:
+        """True once the job succeeded, failed or was cancelled."""
+        return self.status in self.FINISHED
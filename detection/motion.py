@@ -0,0 +1,139 @@
+"""
+Motion gate: skip YOLO on frames that did not change.
+
+In a care room most consecutive frames are nearly identical. Before running
+inference, MotionGate compares the frame with the last frame the model
+actually processed for that camera (grayscale, downscaled to `width` pixels
+wide) and counts the pixels whose gray level changed by more than
+`threshold`. When fewer than `min_changed` of the pixels changed, the
+previous Detection is reused and the model is not called. Counting changed
+pixels instead of averaging the difference keeps a small change (a person
+falling far from the camera covers about 1% of the frame) from being
+diluted by the static background, while sensor noise and slow lighting
+drifts stay under the per-pixel threshold.
+
+Only inference is skipped: the pipeline still feeds the reused detection to
+the fall tracker, so the time on ground of an immobile person keeps growing
+and escalates to urgent as usual. The model is still run at least every
+`max_skip_seconds`, whatever the frame rate, so a slow change (a person
+slowly sliding) is never ignored for long.
+
+Thresholds come from settings:
+    MOTION_GATE_THRESHOLD (0 disables the gate), MOTION_GATE_MIN_CHANGED,
+    MOTION_GATE_MAX_SKIP_SECS
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from .services import Detection
+
+
+@dataclass
+class _Reference:
+    """Last frame processed by the model for one camera."""
+    thumbnail: np.ndarray
+    detection: Detection
+    inferred_at: float   # time.monotonic() when the model processed it
+
+
+class MotionGate:
+    """
+    Per-camera cache of the last detection, reused while the scene is static.
+
+    Attributes:
+        threshold (float): Change of a thumbnail pixel (gray levels, 0-255) above which
+            it counts as changed.
+        min_changed (float): Fraction of changed pixels from which a frame is
+            considered changed.
+        width (int): Width frames are downscaled to before comparison.
+        max_skip_seconds (float): Longest time a detection may be reused.
+    """
+    def __init__(self, threshold: float = 15.0, min_changed: float = 0.002, width: int = 64,
+                 max_skip_seconds: float = 2.0) -> None:
+        """
+        Args:
+            threshold (float): Change of a pixel (gray levels) above which it counts as changed.
+            min_changed (float): Fraction of changed pixels from which a frame is changed.
+            width (int): Width of the comparison thumbnails.
+            max_skip_seconds (float): Longest time a detection may be reused.
+        """
+        self.threshold = threshold
+        self.min_changed = min_changed
+        self.width = width
+        self.max_skip_seconds = max_skip_seconds
+
+        self._references: Dict[str, _Reference] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.frames = 0
+        self.skipped = 0
+
+    def thumbnail(self, img: np.ndarray) -> np.ndarray:
+        """Small grayscale version of a BGR frame used for comparison."""
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        height = max(1, round(gray.shape[0] * self.width / gray.shape[1]))
+        return cv2.resize(gray, (self.width, height), interpolation=cv2.INTER_AREA)
+
+    def changed_fraction(self, reference: np.ndarray, thumbnail: np.ndarray) -> float:
+        """Fraction of the thumbnail pixels that changed by more than `threshold`."""
+        return np.count_nonzero(cv2.absdiff(reference, thumbnail) > self.threshold) / thumbnail.size
+
+    def reuse(self, camera_id: str, img: np.ndarray, now: Optional[float] = None) -> Optional[Detection]:
+        """
+        Return the previous detection of the camera if the frame is unchanged.
+
+        Args:
+            camera_id (str): Source of the frame.
+            img (np.ndarray): Frame in BGR format.
+            now (float | None): Current time.monotonic() (defaults to now).
+
+        Returns:
+            Detection | None: The detection to reuse, or None when the model must run
+            (then call `remember` with its result).
+        """
+        now = time.monotonic() if now is None else now
+        thumbnail = self.thumbnail(img)
+        with self._lock:
+            self.frames += 1
+            reference = self._references.get(camera_id)
+            if (
+                reference is None
+                or now - reference.inferred_at >= self.max_skip_seconds
+                or reference.thumbnail.shape != thumbnail.shape
+                or self.changed_fraction(reference.thumbnail, thumbnail) >= self.min_changed
+            ):
+                return None
+            self.skipped += 1
+            return reference.detection
+
+    def remember(self, camera_id: str, img: np.ndarray, detection: Detection,
+                 now: Optional[float] = None) -> None:
+        """Store the frame the model just processed and its detection."""
+        reference = _Reference(self.thumbnail(img), detection, time.monotonic() if now is None else now)
+        with self._lock:
+            self._references[camera_id] = reference
+
+    def reset(self, camera_id: Optional[str] = None) -> None:
+        """Forget the reference frame of a camera (or of every camera)."""
+        with self._lock:
+            if camera_id is None:
+                self._references.clear()
+            else:
+                self._references.pop(camera_id, None)
+
+    def metrics(self) -> dict:
+        """Frames seen, frames that skipped inference and the skip rate."""
+        with self._lock:
+            return {
+                "frames": self.frames,
+                "skipped": self.skipped,
+                "skip_rate": self.skipped / self.frames if self.frames else 0.0,
+                "cameras": len(self._references),
+            }
@@ -0,0 +1,162 @@
+"""
+Batched persistence of per-frame FallObservation samples.
+
+Every live sighting attached to an incident becomes a FallObservation. The
+samples are buffered by ObservationRecorder and inserted with bulk_create,
+one INSERT per batch, when the batch is full or its oldest sample is older
+than `max_delay` (the AlertWriter calls `flush_due` when it is idle), instead
+of rewriting the alert row on every frame.
+
+A batch rejected by the database because an alert was deleted meanwhile is
+written again without the samples of the missing alerts, so one deleted
+alert does not lose the samples of every other incident. The ids of those
+alerts are kept for `pop_deleted_alerts` (the live pipeline then reopens
+their incidents).
+
+Batch sizes come from settings:
+    OBSERVATION_BATCH_SIZE, OBSERVATION_FLUSH_SECS
+"""
+
+import datetime
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from django.db import IntegrityError
+
+from .models import FallAlert, FallObservation
+
+logger = logging.getLogger(__name__)
+
+
+class ObservationRecorder:
+    """
+    Buffers FallObservation samples and writes them in batches.
+
+    Attributes:
+        batch_size (int): Samples per bulk_create.
+        max_delay (float): Seconds a sample may wait in the buffer.
+    """
+    def __init__(self, batch_size: int = 200, max_delay: float = 2.0) -> None:
+        """
+        Args:
+            batch_size (int): Samples per bulk_create.
+            max_delay (float): Seconds a sample may wait in the buffer.
+        """
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+
+        self._pending: List[FallObservation] = []
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.dropped = 0
+        self._deleted_alerts: set = set()
+
+    def add(self, alert_id: int, timestamp: float, fall_state: str, time_on_ground: float,
+            confidence: Optional[float] = None, bbox: Optional[tuple] = None,
+            track_id: Optional[str] = None) -> None:
+        """
+        Buffer one sample, writing the batch when it is full.
+
+        Args:
+            alert_id (int): Alert of the incident.
+            timestamp (float): Capture time of the frame (UNIX timestamp).
+            fall_state (str): Fall state at that time.
+            time_on_ground (float): Seconds on the ground at that time.
+            confidence (float | None): YOLO confidence.
+            bbox (tuple | None): (x1, y1, x2, y2) in pixels.
+            track_id (str | None): Tracked person within the camera.
+        """
+        x1, y1, x2, y2 = (int(v) for v in bbox) if bbox is not None else (None,) * 4
+        sample = FallObservation(
+            alert_id=alert_id,
+            timestamp=datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc),
+            track_id=track_id or "",
+            confidence=confidence,
+            fall_state=fall_state,
+            time_on_ground=time_on_ground,
+            x1=x1, y1=y1, x2=x2, y2=y2,
+        )
+        with self._lock:
+            self._pending.append(sample)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush_due(self) -> int:
+        """Write the buffer if its oldest sample waited `max_delay` seconds."""
+        with self._lock:
+            due = self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay
+        return self.flush() if due else 0
+
+    def flush(self) -> int:
+        """
+        Write every buffered sample.
+
+        Returns:
+            int: Number of samples written.
+        """
+        with self._lock:
+            pending, self._pending, self._oldest = self._pending, [], None
+        if not pending:
+            return 0
+        try:
+            FallObservation.objects.bulk_create(pending, batch_size=self.batch_size)
+        except IntegrityError:
+            # Typically an alert was deleted meanwhile: keep the samples of the others
+            pending = self._without_deleted_alerts(pending)
+            if not self._retry(pending):
+                return 0
+        except Exception:
+            self.errors += 1
+            logger.exception("Failed to write %d fall observations", len(pending))
+            return 0
+        self.written += len(pending)
+        self.batches += 1
+        return len(pending)
+
+    def _without_deleted_alerts(self, samples: List[FallObservation]) -> List[FallObservation]:
+        """Drop the samples of alerts that no longer exist."""
+        existing = set(
+            FallAlert.objects.filter(pk__in={s.alert_id for s in samples}).values_list("pk", flat=True)
+        )
+        kept = [s for s in samples if s.alert_id in existing]
+        self.dropped += len(samples) - len(kept)
+        with self._lock:
+            self._deleted_alerts.update(s.alert_id for s in samples if s.alert_id not in existing)
+        return kept
+
+    def pop_deleted_alerts(self) -> set:
+        """Ids of the alerts found deleted while writing their samples since the last call."""
+        with self._lock:
+            deleted, self._deleted_alerts = self._deleted_alerts, set()
+        return deleted
+
+    def _retry(self, samples: List[FallObservation]) -> bool:
+        """Write the filtered batch once more; False if it failed again."""
+        try:
+            FallObservation.objects.bulk_create(samples, batch_size=self.batch_size)
+        except Exception:
+            self.errors += 1
+            logger.exception("Failed to write %d fall observations", len(samples))
+            return False
+        return True
+
+    def metrics(self) -> dict:
+        """Buffered, written, batch and dropped (deleted alert) counters."""
+        return {
+            "pending": len(self._pending),
+            "written": self.written,
+            "batches": self.batches,
+            "avg_batch_size": self.written / self.batches if self.batches else 0.0,
+            "errors": self.errors,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,121 @@
+"""
+Keyset (cursor) pagination over alerts ordered newest first.
+
+OFFSET pagination re-reads every skipped row and needs a COUNT(*) per page;
+a keyset page instead continues from the (timestamp, id) of the last row
+seen, which the timestamp index serves directly whatever the page depth.
+
+Cursors are opaque URL-safe strings encoding that (timestamp, id) pair.
+"""
+
+import base64
+import datetime
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from django.db.models import Q, QuerySet
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor cannot be decoded."""
+
+
+def encode_cursor(timestamp: datetime.datetime, pk: int) -> str:
+    """Encode the position of an alert as an opaque cursor."""
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    """
+    Decode a cursor into (timestamp, id).
+
+    Raises:
+        InvalidCursor: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.rsplit("|", 1)
+        return datetime.datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor '{cursor}'") from e
+
+
+def cursor_for(alert) -> str:
+    """Cursor pointing at an alert."""
+    return encode_cursor(alert.timestamp, alert.pk)
+
+
+def older_than(cursor: str) -> Q:
+    """Rows after the cursor in newest-first order."""
+    timestamp, pk = decode_cursor(cursor)
+    return Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lt=pk)
+
+
+def newer_than(cursor: str) -> Q:
+    """Rows before the cursor in newest-first order."""
+    timestamp, pk = decode_cursor(cursor)
+    return Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk)
+
+
+def overlap_before(cursor: str, seconds: float) -> Q:
+    """
+    Rows at most `seconds` older than the cursor (the cursor row excluded).
+
+    A row is stamped before it commits, so a row committed after a poll can
+    sort before that poll's cursor; re-reading this window catches it.
+    """
+    timestamp, _ = decode_cursor(cursor)
+    return older_than(cursor) & Q(timestamp__gte=timestamp - datetime.timedelta(seconds=seconds))
+
+
+@dataclass
+class KeysetPage:
+    """One page of alerts (newest first) and the cursors around it."""
+    object_list: List = field(default_factory=list)
+    has_next: bool = False        # Older alerts exist
+    has_previous: bool = False    # Newer alerts exist
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        """Cursor of the last (oldest) alert of the page."""
+        return cursor_for(self.object_list[-1]) if self.has_next and self.object_list else None
+
+    @property
+    def previous_cursor(self) -> Optional[str]:
+        """Cursor of the first (newest) alert of the page."""
+        return cursor_for(self.object_list[0]) if self.has_previous and self.object_list else None
+
+
+def keyset_page(queryset: QuerySet, page_size: int, after: Optional[str] = None,
+                before: Optional[str] = None) -> KeysetPage:
+    """
+    Return one newest-first page of `queryset`.
+
+    Args:
+        queryset (QuerySet): Filtered alerts (any ordering is replaced).
+        page_size (int): Alerts per page.
+        after (str | None): Return the alerts older than this cursor (next page).
+        before (str | None): Return the alerts newer than this cursor (previous page).
+
+    Returns:
+        KeysetPage: The page; one extra row is fetched to know whether more exist.
+
+    Raises:
+        InvalidCursor: If a cursor is malformed.
+    """
+    if before:
+        rows = list(
+            queryset.filter(newer_than(before)).order_by("timestamp", "pk")[:page_size + 1]
+        )
+        has_more = len(rows) > page_size
+        return KeysetPage(object_list=rows[:page_size][::-1], has_next=True, has_previous=has_more)
+
+    if after:
+        queryset = queryset.filter(older_than(after))
+    rows = list(queryset.order_by("-timestamp", "-pk")[:page_size + 1])
+    return KeysetPage(
+        object_list=rows[:page_size],
+        has_next=len(rows) > page_size,
+        has_previous=after is not None,
+    )
@@ -0,0 +1,486 @@
+"""
+Live detection pipeline shared by every live frame source.
+
+A live frame goes through the same steps whether it comes from the HTTP
+endpoint (/run-yolo/), the WebSocket stream or a server-side camera worker:
+1. YOLO inference (batched with concurrent frames by the BatchingScheduler),
+   skipped when the frame did not change since the last inference (MotionGate)
+2. Fall tracking per camera and per person (time on ground, monitoring → alert → urgent)
+3. Alert deduplication per (camera, person) incident: the database is only
+   written when an incident opens, escalates or closes (see incidents.py).
+   This runs on the background AlertWriter so the response does not wait;
+   every sighting is also kept as a FallObservation sample, inserted in batches
+4. Every frame is kept in the camera's ring buffer; new alerts get a clip of
+   the seconds around the fall, written by the AlertWriter once the tail is in
+
+The module also owns the process-wide model instances so the model is loaded
+once and shared by all entry points. The model is registered lazily in
+`model_registry`: importing this module (management commands, migrations,
+tests) neither imports torch nor reads the weights. Serving processes call
+`prewarm_models()` at startup to load it in the background. With
+INFERENCE_SERVER_SOCKET set, the model lives in the `run_inference_server`
+process instead and `fall_service` is a client of it (see inference_server.py).
+"""
+
+import atexit
+import logging
+import time
+
+from django.conf import settings
+import numpy as np
+
+from .models import FallAlert
+from .services import FallDetectionService, ModelRegistry
+from .batching import BatchingScheduler
+from .inference_server import InferenceClient
+from .alert_writer import AlertEvent, AlertWriter
+from .framebuffer import ClipRecorder, PendingClip, buffers_from_settings
+from .incidents import Incident, IncidentEngine, IncidentHandler, IncidentLost, Observation
+from .motion import MotionGate
+from .observations import ObservationRecorder
+from .video_analysis import VideoAnalyzer
+
+logger = logging.getLogger(__name__)
+
+
+def local_fall_service(lazy: bool = True) -> FallDetectionService:
+    """
+    Build the in-process fall detection service from the YOLO_* / ONNX_* settings.
+
+    Args:
+        lazy (bool): Load the weights on first use instead of now.
+    """
+    return FallDetectionService(
+        conf_threshold=0.70,
+        backend=getattr(settings, "YOLO_BACKEND", "ultralytics"),
+        variant=getattr(settings, "YOLO_VARIANT", None),
+        imgsz=getattr(settings, "YOLO_IMGSZ", None),
+        providers=getattr(settings, "ONNX_PROVIDERS", None),
+        threads=getattr(settings, "ONNX_THREADS", 0),
+        lazy=lazy,
+    )
+
+
+# Instantiate the fall detection service globally to avoid reloading the model on every request;
+# the weights are loaded on first use (or by prewarm_models), or by the shared inference server
+INFERENCE_SERVER_SOCKET = getattr(settings, "INFERENCE_SERVER_SOCKET", "")
+model_registry = ModelRegistry()
+if INFERENCE_SERVER_SOCKET:
+    fall_service = model_registry.register("fall", InferenceClient(INFERENCE_SERVER_SOCKET))
+    atexit.register(fall_service.close)
+else:
+    fall_service = model_registry.register("fall", local_fall_service())
+
+
+def prewarm_models(background: bool = True):
+    """
+    Load and warm up the models at server start (YOLO_PREWARM setting), so the
+    first live frame does not wait for the weights.
+
+    Args:
+        background (bool): Warm up in a daemon thread and return immediately.
+
+    Returns:
+        threading.Thread | None: The warm-up thread, if one was started.
+    """
+    if not getattr(settings, "YOLO_PREWARM", True):
+        return None
+    return model_registry.prewarm(background=background)
+
+
+# Live frames from concurrent requests are grouped into batched model calls
+# (the inference server batches across workers, so a client does not wait for company)
+inference_scheduler = BatchingScheduler(
+    fall_service,
+    window_ms=0.0 if INFERENCE_SERVER_SOCKET else getattr(settings, "YOLO_BATCH_WINDOW_MS", 20.0),
+    max_batch_size=getattr(settings, "YOLO_BATCH_MAX_SIZE", 8),
+)
+
+# Import tracking system
+try:
+    from .tracking import tracker_registry, FallState, STATE_SEVERITY
+    TRACKING_ENABLED = True
+except ImportError:
+    TRACKING_ENABLED = False
+    print("⚠️ Tracking system not available")
+
+
+class InferenceError(Exception):
+    """Raised when YOLO inference or tracking fails for a frame."""
+
+
+class LiveDetectionPipeline:
+    """
+    Runs inference, tracking and deduplicated alert persistence for live frames.
+
+    Attributes:
+        scheduler (BatchingScheduler): Scheduler used to run inference.
+        motion (MotionGate | None): Reuses the previous detection of static frames.
+        incidents (IncidentEngine): Decides which sightings are written to the database.
+    """
+    DEFAULT_CAMERA = "live_camera"  # Browser webcam; server-side cameras use their own id
+
+    def __init__(self, scheduler: BatchingScheduler, writer: AlertWriter | None = None,
+                 clips: ClipRecorder | None = None, incident_ttl: float = 30.0,
+                 observations: ObservationRecorder | None = None,
+                 motion: MotionGate | None = None) -> None:
+        """
+        Args:
+            scheduler (BatchingScheduler): Scheduler used to run inference.
+            writer (AlertWriter | None): Background writer for alerts; alerts are
+                persisted inline when None.
+            clips (ClipRecorder | None): Buffers frames and records alert clips;
+                no clips are recorded when None.
+            incident_ttl (float): Seconds without sighting after which an incident closes.
+            observations (ObservationRecorder | None): Records every sighting of an
+                incident as a FallObservation sample; not recorded when None.
+            motion (MotionGate | None): Skips inference on unchanged frames; every
+                frame is inferred when None.
+        """
+        self.scheduler = scheduler
+        self.writer = writer
+        self.clips = clips
+        self.observations = observations
+        self.motion = motion
+        self.incidents = IncidentEngine(LiveAlertHandler(clips), ttl=incident_ttl)
+        self.sweep_interval = 1.0
+        self._next_sweep = 0.0
+
+    def process(self, img: np.ndarray, camera_id: str = DEFAULT_CAMERA) -> dict:
+        """
+        Process one live frame and return the JSON-serializable detection state.
+
+        Args:
+            img (np.ndarray): Decoded frame in BGR format.
+            camera_id (str): Source of the frame; used as alert `detected_by`
+                and to select the camera's tracker and incidents.
+
+        Returns:
+            dict: {"fall": bool, "confidence", "fall_state", "time_on_ground", "bbox",
+            "tracks": [...one entry per tracked person...], "people": number of
+            detected persons (any class), "inference_cost": model seconds spent on
+            the frame (None when the motion gate reused the previous detection)}
+
+        Raises:
+            InferenceError: If inference or tracking failed.
+        """
+        frame_ts = time.time()
+        if self.clips is not None:
+            self.clips.buffers.append(camera_id, img, frame_ts)
+            for clip in self.clips.due(frame_ts):
+                self.submit(clip)
+
+        try:
+            # Run YOLO detection (single forward pass, batched with concurrent requests),
+            # unless the scene did not change. Tracking below still runs on every frame
+            # so the time on ground keeps counting.
+            detection = self.motion.reuse(camera_id, img) if self.motion is not None else None
+            inference_cost = None
+            if detection is None:
+                detection, inference_cost = self.scheduler.submit_timed(img)
+                if self.motion is not None:
+                    self.motion.remember(camera_id, img, detection)
+            fall_detected, confidence = detection.fall, detection.confidence
+            people = int(len(detection.boxes))
+
+            # Initialize tracking variables
+            fall_state_value = "monitoring"
+            time_on_ground = 0
+            bbox_data = None
+            tracks = []
+            persistent = None
+
+            if TRACKING_ENABLED:
+                tracker = tracker_registry.get(camera_id)
+                # Atomic against the shared tracker state (other workers may update this camera)
+                with tracker.transaction():
+                    # Always update missed detections counter (even if no fall detected)
+                    tracker.update_missed_detections()
+                    if fall_detected:
+                        tracks = self.track_falls(tracker, detection)
+                    else:
+                        persistent = tracker.most_urgent(tracker.get_persistent_states())
+                        if persistent:
+                            person_id, state = persistent
+                            persistent = {
+                                "fall": True,
+                                "confidence": 0.8,  # Confidence persistante
+                                "fall_state": state.current_state.value,
+                                "time_on_ground": state.time_on_ground(),
+                                "bbox": None,  # Pas de nouvelle bbox
+                                "track_id": person_id,
+                                "persistent": True  # Indique que c'est un état persistant
+                            }
+
+            if not fall_detected:
+                if persistent:
+                    # Keeps the incident open (and lets it escalate) while the person is hidden
+                    self.submit(AlertEvent(
+                        camera_id=camera_id,
+                        frame=img,
+                        confidence=persistent["confidence"],
+                        fall_state=persistent["fall_state"],
+                        time_on_ground=persistent["time_on_ground"],
+                        track_id=persistent["track_id"],
+                        created_at=frame_ts,
+                    ))
+                # Return the most urgent persistent state, if any
+                return {**(persistent or {"fall": False}), "people": people, "inference_cost": inference_cost}
+
+            if tracks:
+                # The most urgent person drives the alert and the top-level response
+                primary = max(
+                    tracks,
+                    key=lambda t: (STATE_SEVERITY[FallState(t["fall_state"])], t["time_on_ground"])
+                )
+                fall_state_value = primary["fall_state"]
+                time_on_ground = primary["time_on_ground"]
+                bbox_data = primary["bbox"]
+
+        except Exception as e:
+            raise InferenceError(str(e)) from e
+
+        # One sighting per person on the floor; the incident engine drops the duplicates
+        for track in tracks or [{"track_id": None, "fall_state": fall_state_value,
+                                 "time_on_ground": time_on_ground, "bbox": None}]:
+            bbox = track["bbox"]
+            self.submit(AlertEvent(
+                camera_id=camera_id,
+                frame=img,
+                confidence=confidence,
+                fall_state=track["fall_state"],
+                time_on_ground=track["time_on_ground"],
+                track_id=track["track_id"],
+                bbox=(bbox["x1"], bbox["y1"], bbox["x2"], bbox["y2"]) if bbox else None,
+                created_at=frame_ts,
+            ))
+
+        response_data = {
+            "fall": True,
+            "confidence": confidence,
+            "people": people,
+            "inference_cost": inference_cost,
+        }
+
+        if TRACKING_ENABLED:
+            response_data["fall_state"] = fall_state_value
+            response_data["time_on_ground"] = time_on_ground
+            response_data["bbox"] = bbox_data
+            response_data["tracks"] = tracks
+
+        return response_data
+
+    def track_falls(self, tracker, detection) -> list:
+        """
+        Associate every fall box of the detection to a person track of the camera.
+
+        Returns:
+            list: One {"track_id", "fall_state", "time_on_ground", "bbox"} per box.
+        """
+        fall_boxes = detection.fall_boxes()
+        return [
+            {
+                "track_id": person_id,
+                "fall_state": fall_state.value,
+                "time_on_ground": person_time,
+                "bbox": self.bbox_dict(bbox),
+            }
+            for (person_id, fall_state, person_time), bbox in zip(
+                tracker.update_frame(fall_boxes), fall_boxes.astype(int).tolist()
+            )
+        ]
+
+    @staticmethod
+    def bbox_dict(bbox) -> dict:
+        """Serialize an (x1, y1, x2, y2) box for the JSON response."""
+        return {
+            "x1": bbox[0],
+            "y1": bbox[1],
+            "x2": bbox[2],
+            "y2": bbox[3],
+            "width": bbox[2] - bbox[0],
+            "height": bbox[3] - bbox[1]
+        }
+
+    def submit(self, event: AlertEvent | PendingClip) -> None:
+        """
+        Hand an event to the background writer (or write it inline without one).
+
+        A clip refused by a full writer queue goes back to the recorder and is
+        retried on the next frame or tick; an alert event is dropped (and counted
+        by the writer), the next sighting carries fresher data anyway.
+        """
+        if self.writer is not None:
+            if not self.writer.submit(event) and isinstance(event, PendingClip):
+                logger.warning("Alert writer queue full, retrying clip of alert %s", event.alert_id)
+                self.clips.requeue(event)
+        else:
+            self.write_event(event)
+
+    def tick(self) -> None:
+        """
+        Periodic work of the AlertWriter thread: write the clips that became due
+        while no frame came in, the batched observation samples (forgetting the
+        incidents whose alert turned out deleted, so they reopen), then close the
+        incidents of people no longer seen (at most every `sweep_interval` seconds).
+        """
+        if self.clips is not None:
+            for clip in self.clips.due():
+                self.clips.write(clip)
+        if self.observations is not None:
+            self.observations.flush_due()
+            deleted = self.observations.pop_deleted_alerts()
+            if deleted:
+                self.incidents.discard_alerts(deleted)
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval
+            self.incidents.close_all_expired()
+
+    def write_event(self, event: AlertEvent | PendingClip) -> None:
+        """
+        Apply an AlertEvent to its incident or write a due clip (runs on the AlertWriter thread).
+        """
+        if isinstance(event, PendingClip):
+            self.clips.write(event)
+            return
+        action, alert_id = self.incidents.observe(Observation(
+            camera_id=event.camera_id,
+            track_id=event.track_id,
+            fall_state=event.fall_state,
+            time_on_ground=event.time_on_ground,
+            confidence=event.confidence,
+            payload=event,
+            timestamp=event.created_at,
+        ))
+        if alert_id is not None and self.observations is not None:
+            self.observations.add(
+                alert_id,
+                event.created_at,
+                event.fall_state,
+                event.time_on_ground,
+                confidence=event.confidence,
+                bbox=event.bbox,
+                track_id=event.track_id,
+            )
+
+
+class LiveAlertHandler(IncidentHandler):
+    """
+    Writes the FallAlert of live incidents (called by the IncidentEngine on transitions only).
+
+    Attributes:
+        clips (ClipRecorder | None): Schedules the clip of new alerts.
+    """
+    def __init__(self, clips: ClipRecorder | None = None) -> None:
+        """
+        Args:
+            clips (ClipRecorder | None): Schedules the clip of new alerts.
+        """
+        self.clips = clips
+
+    def open(self, observation: Observation) -> int:
+        """
+        Create the alert with its snapshot (a single INSERT) and schedule its clip.
+        """
+        event: AlertEvent = observation.payload
+        alert = FallAlert(
+            detected_by=event.camera_id,
+            description="Fall detected via YOLOv8",
+            yolo_confidence=event.confidence,
+            yolo_class="Fall-Detected",
+        )
+        if TRACKING_ENABLED:
+            alert.fall_state = event.fall_state
+            alert.time_on_ground = event.time_on_ground
+        alert.save_snapshot_from_frame(event.frame)
+        alert.save()
+        if self.clips is not None:
+            self.clips.schedule(alert.pk, event.camera_id, event.created_at)
+        return alert.pk
+
+    def escalate(self, incident: Incident, observation: Observation) -> None:
+        """
+        Record the new fall state with a fresh snapshot.
+
+        Raises:
+            IncidentLost: If the alert was deleted (the engine reopens the incident).
+        """
+        alert = FallAlert.objects.filter(pk=incident.alert_id).first()
+        if alert is None:
+            raise IncidentLost(incident.alert_id)
+        event: AlertEvent = observation.payload
+        alert.fall_state = incident.fall_state
+        alert.time_on_ground = incident.time_on_ground
+        alert.yolo_confidence = incident.confidence
+        alert.save_snapshot_from_frame(event.frame)
+        alert.save(update_fields=["fall_state", "time_on_ground", "yolo_confidence", "image_snapshot"])
+
+    def close(self, incident: Incident, final_state: str | None) -> None:
+        """
+        Record the final time on ground (and the recovery, if the person got up).
+        """
+        alert = FallAlert.objects.filter(pk=incident.alert_id).first()
+        if alert is None:
+            return   # Deleted: the engine drops the incident anyway, nothing to reopen
+        alert.time_on_ground = incident.time_on_ground
+        update_fields = ["time_on_ground"]
+        if final_state:
+            alert.fall_state = final_state
+            update_fields.append("fall_state")
+        alert.save(update_fields=update_fields)
+
+
+# Recent frames of every camera, for clips of the seconds before a fall
+clip_recorder = None
+if getattr(settings, "FRAME_BUFFER_SECONDS", 15.0) > 0:
+    clip_recorder = ClipRecorder(
+        buffers_from_settings(),
+        pre_seconds=getattr(settings, "CLIP_PRE_SECONDS", 5.0),
+        post_seconds=getattr(settings, "CLIP_POST_SECONDS", 5.0),
+    )
+
+# Per-frame samples of every incident, inserted in batches
+observation_recorder = ObservationRecorder(
+    batch_size=getattr(settings, "OBSERVATION_BATCH_SIZE", 200),
+    max_delay=getattr(settings, "OBSERVATION_FLUSH_SECS", 2.0),
+)
+
+# Static frames reuse the previous detection of their camera
+motion_gate = None
+if getattr(settings, "MOTION_GATE_THRESHOLD", 15.0) > 0:
+    motion_gate = MotionGate(
+        threshold=settings.MOTION_GATE_THRESHOLD,
+        min_changed=getattr(settings, "MOTION_GATE_MIN_CHANGED", 0.002),
+        max_skip_seconds=getattr(settings, "MOTION_GATE_MAX_SKIP_SECS", 2.0),
+    )
+
+# Whole-video analysis of test uploads, on a pool of worker processes started on first use
+video_analyzer = VideoAnalyzer(
+    fall_service,
+    stride=getattr(settings, "VIDEO_ANALYSIS_STRIDE", 5),
+    batch_size=getattr(settings, "VIDEO_ANALYSIS_BATCH_SIZE", 8),
+    workers=getattr(settings, "VIDEO_ANALYSIS_WORKERS", 2),
+)
+atexit.register(video_analyzer.close)
+
+# Shared pipeline used by the HTTP/WebSocket live endpoints and camera workers
+live_pipeline = LiveDetectionPipeline(
+    inference_scheduler,
+    clips=clip_recorder,
+    incident_ttl=getattr(settings, "INCIDENT_TTL_SECS", 30.0),
+    observations=observation_recorder,
+    motion=motion_gate,
+)
+
+# Alerts are written off the request path by a bounded background writer
+alert_writer = AlertWriter(
+    live_pipeline.write_event,
+    maxsize=getattr(settings, "ALERT_WRITER_QUEUE_SIZE", 64),
+    synchronous=getattr(settings, "ALERT_WRITER_SYNC", False),
+    tick=live_pipeline.tick,
+)
+live_pipeline.writer = alert_writer
+# atexit runs in reverse order: the writer is drained first, then the last samples are written
+atexit.register(observation_recorder.flush)
+atexit.register(alert_writer.close, timeout=5)
@@ -0,0 +1,195 @@
+"""
+Adaptive per-camera inference rate.
+
+Running the model on every frame of every camera wastes most of the CPU on
+empty rooms. RateController picks the detection rate of each camera from
+what the pipeline last reported for it:
+- "active": a fall is tracked (monitoring, alert or urgent, persistent
+  tracks included) → `active_fps`, so escalations are timed precisely;
+- "presence": someone was detected in the last `quiet_seconds` → `presence_fps`;
+- "idle": empty or quiet room → `idle_fps`.
+
+An optional global CPU budget (`cpu_budget`, in inference-seconds per
+second, e.g. 2.0 ≈ two cores busy) caps the total rate from the measured
+cost of a frame. Active cameras are served first; the other cameras share
+what is left, never below `min_fps` so a fall in a quiet room is still seen.
+
+Rates come from settings:
+    CAMERA_IDLE_FPS, CAMERA_PRESENCE_FPS, CAMERA_ACTIVE_FPS,
+    CAMERA_QUIET_SECONDS, INFERENCE_CPU_BUDGET (0 = no budget)
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from django.conf import settings
+
+IDLE, PRESENCE, ACTIVE = "idle", "presence", "active"
+
+
+@dataclass
+class _CameraRate:
+    """Rate state of one camera."""
+    tier: str = IDLE
+    last_activity: float = float("-inf")
+    next_due: float = 0.0
+    frames: int = 0
+
+
+class RateController:
+    """
+    Decides when each camera's next frame should be inferred.
+
+    Attributes:
+        fps (Dict[str, float]): Target rate of each tier.
+        quiet_seconds (float): A camera stays in "presence" this long after the last person seen.
+        cpu_budget (float | None): Inference seconds available per second, all cameras together.
+        min_fps (float): Lowest rate a camera is throttled to by the budget.
+    """
+    COST_SMOOTHING = 0.2   # Weight of the latest frame in the cost moving average
+    ERROR_BACKOFF = 1.0    # Minimum seconds before retrying a camera whose frame failed
+
+    def __init__(
+        self,
+        idle_fps: float = 0.5,
+        presence_fps: float = 2.0,
+        active_fps: float = 8.0,
+        quiet_seconds: float = 15.0,
+        cpu_budget: Optional[float] = None,
+        min_fps: float = 0.2,
+    ) -> None:
+        """
+        Args:
+            idle_fps (float): Rate of empty or quiet rooms.
+            presence_fps (float): Rate of rooms where someone was recently seen.
+            active_fps (float): Rate of rooms with a tracked fall.
+            quiet_seconds (float): Seconds without anyone seen before a room is idle.
+            cpu_budget (float | None): Inference seconds per second for all cameras; unlimited when None.
+            min_fps (float): Lowest rate the budget may impose on a camera.
+        """
+        self.fps = {IDLE: idle_fps, PRESENCE: presence_fps, ACTIVE: active_fps}
+        self.quiet_seconds = quiet_seconds
+        self.cpu_budget = cpu_budget
+        self.min_fps = min_fps
+
+        self._cameras: Dict[str, _CameraRate] = {}
+        self._cost: Optional[float] = None   # Seconds per inferred frame (moving average)
+        self._lock = threading.Lock()
+
+    def due(self, camera_id: str, now: Optional[float] = None) -> bool:
+        """True if the camera's next frame should be inferred now."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            camera = self._cameras.get(camera_id)
+            return camera is None or now >= camera.next_due
+
+    def update(self, camera_id: str, result: dict, cost: Optional[float] = None,
+               now: Optional[float] = None) -> str:
+        """
+        Record the pipeline result of an inferred frame and schedule the next one.
+
+        Args:
+            camera_id (str): Camera of the frame.
+            result (dict): Return value of LiveDetectionPipeline.process.
+            cost (float | None): Model seconds spent on the frame; None when the
+                model did not run (e.g. the motion gate reused a detection).
+            now (float | None): Monotonic time (defaults to time.monotonic()).
+
+        Returns:
+            str: The camera's new tier ("idle", "presence" or "active").
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if cost is not None:
+                self._cost = cost if self._cost is None else (
+                    self.COST_SMOOTHING * cost + (1 - self.COST_SMOOTHING) * self._cost
+                )
+
+            camera = self._cameras.setdefault(camera_id, _CameraRate())
+            camera.frames += 1
+            if result.get("fall"):
+                camera.tier = ACTIVE
+                camera.last_activity = now
+            elif result.get("people"):
+                camera.tier = PRESENCE
+                camera.last_activity = now
+            elif now - camera.last_activity < self.quiet_seconds:
+                camera.tier = PRESENCE
+            else:
+                camera.tier = IDLE
+
+            camera.next_due = now + 1.0 / self._rates()[camera_id]
+            return camera.tier
+
+    def failed(self, camera_id: str, now: Optional[float] = None) -> None:
+        """
+        Schedule the next frame of a camera whose frame could not be processed,
+        at its current rate but no sooner than ERROR_BACKOFF seconds.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            camera = self._cameras.setdefault(camera_id, _CameraRate())
+            camera.next_due = now + max(1.0 / self._rates()[camera_id], self.ERROR_BACKOFF)
+
+    def forget(self, camera_id: str) -> None:
+        """Drop the state of a camera (its next frame is due immediately)."""
+        with self._lock:
+            self._cameras.pop(camera_id, None)
+
+    def rates(self) -> Dict[str, float]:
+        """Effective rate of every known camera, budget applied."""
+        with self._lock:
+            return self._rates()
+
+    def metrics(self) -> dict:
+        """Tier and effective rate per camera, plus the budget usage."""
+        with self._lock:
+            rates = self._rates()
+            return {
+                "cameras": {
+                    cid: {"tier": camera.tier, "fps": round(rates[cid], 3), "frames": camera.frames}
+                    for cid, camera in self._cameras.items()
+                },
+                "total_fps": round(sum(rates.values()), 3),
+                "frame_cost_ms": round(self._cost * 1000, 2) if self._cost is not None else None,
+                "cpu_budget": self.cpu_budget,
+                "cpu_used": round(sum(rates.values()) * self._cost, 3) if self._cost is not None else None,
+            }
+
+    def _rates(self) -> Dict[str, float]:
+        """Target rate of each camera scaled to the CPU budget (lock held)."""
+        rates = {cid: self.fps[camera.tier] for cid, camera in self._cameras.items()}
+        if not self.cpu_budget or not self._cost:
+            return rates
+
+        capacity = self.cpu_budget / self._cost   # Frames per second the budget allows
+        active = [cid for cid, camera in self._cameras.items() if camera.tier == ACTIVE]
+        others = [cid for cid in rates if cid not in active]
+        active_total = sum(rates[cid] for cid in active)
+        others_total = sum(rates[cid] for cid in others)
+        if active_total + others_total <= capacity:
+            return rates
+
+        # Active cameras first; the others share the rest
+        reserved = self.min_fps * len(others)
+        active_scale = min(1.0, max(capacity - reserved, 0.0) / active_total) if active_total else 1.0
+        left = capacity - active_total * active_scale
+        others_scale = min(1.0, max(left, 0.0) / others_total) if others_total else 1.0
+        for cid in active:
+            rates[cid] = max(rates[cid] * active_scale, self.min_fps)
+        for cid in others:
+            rates[cid] = max(rates[cid] * others_scale, self.min_fps)
+        return rates
+
+
+def rate_controller_from_settings() -> RateController:
+    """Build a RateController from the CAMERA_*_FPS and INFERENCE_CPU_BUDGET settings."""
+    return RateController(
+        idle_fps=getattr(settings, "CAMERA_IDLE_FPS", 0.5),
+        presence_fps=getattr(settings, "CAMERA_PRESENCE_FPS", 2.0),
+        active_fps=getattr(settings, "CAMERA_ACTIVE_FPS", 8.0),
+        quiet_seconds=getattr(settings, "CAMERA_QUIET_SECONDS", 15.0),
+        cpu_budget=getattr(settings, "INFERENCE_CPU_BUDGET", 0.0) or None,
+    )
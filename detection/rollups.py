@@ -0,0 +1,133 @@
+"""
+Incremental maintenance of AlertRollup counters.
+
+Each FallAlert contributes to exactly one AlertRollup bucket
+(see FallAlert.rollup_contribution). The signal handlers in signals.py call
+`record_alert_change` with the contribution before and after a save or
+delete; only the difference is applied, with F() expressions so concurrent
+writers (alert writer thread, web workers) do not lose updates.
+
+`rebuild_alert_rollups` recomputes every bucket from FallAlert in one
+grouped query (used by the `rebuild_alert_rollups` management command).
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+
+from .models import AlertRollup, FallAlert
+
+
+def contribution_diff(old, new) -> dict:
+    """
+    Combine the old and new (key, values) contributions of an alert into per-bucket deltas.
+
+    Args:
+        old: Contribution before the change, or None for a new alert.
+        new: Contribution after the change, or None for a deleted alert.
+
+    Returns:
+        dict: {bucket key: {counter: delta}} without zero deltas.
+    """
+    deltas = defaultdict(lambda: defaultdict(float))
+    if old is not None:
+        key, values = old
+        for name, value in values.items():
+            deltas[key][name] -= value
+    if new is not None:
+        key, values = new
+        for name, value in values.items():
+            deltas[key][name] += value
+
+    return {
+        key: {name: delta for name, delta in counters.items() if delta}
+        for key, counters in deltas.items()
+        if any(counters.values())
+    }
+
+
+def apply_deltas(deltas: dict) -> None:
+    """
+    Add per-bucket deltas to AlertRollup, creating missing buckets.
+    """
+    with transaction.atomic():
+        for (date, hour, detected_by, fall_state), counters in deltas.items():
+            bucket = AlertRollup.objects.filter(
+                date=date, hour=hour, detected_by=detected_by, fall_state=fall_state
+            )
+            updates = {name: F(name) + delta for name, delta in counters.items()}
+            if bucket.update(**updates):
+                continue
+            try:
+                with transaction.atomic():
+                    AlertRollup.objects.create(
+                        date=date, hour=hour, detected_by=detected_by, fall_state=fall_state,
+                        **counters,
+                    )
+            except IntegrityError:
+                # Created concurrently by another writer
+                bucket.update(**updates)
+
+
+def record_alert_change(old, new) -> None:
+    """
+    Apply the change of an alert's contribution (None for creation/deletion) to the rollups.
+    """
+    deltas = contribution_diff(old, new)
+    if deltas:
+        apply_deltas(deltas)
+
+
+def rebuild_alert_rollups(alert_model=None, rollup_model=None) -> int:
+    """
+    Recompute every AlertRollup bucket from FallAlert.
+
+    Args:
+        alert_model: FallAlert model (the historical one when run from a migration).
+        rollup_model: AlertRollup model (likewise).
+
+    Returns:
+        int: Number of buckets written.
+    """
+    alert_model = alert_model or FallAlert
+    rollup_model = rollup_model or AlertRollup
+    responded = Q(acknowledged=True, acknowledged_at__isnull=False)
+    rows = (
+        alert_model.objects
+                 .annotate(day=TruncDate("timestamp"), hour_of_day=ExtractHour("timestamp"))
+                 .values("day", "hour_of_day", "detected_by", "fall_state")
+                 .annotate(
+                     n=Count("id"),
+                     acknowledged_n=Count("id", filter=Q(acknowledged=True)),
+                     response_n=Count("id", filter=responded),
+                     response_total=Sum(
+                         ExpressionWrapper(F("acknowledged_at") - F("timestamp"), output_field=DurationField()),
+                         filter=responded,
+                     ),
+                     accurate_n=Count("id", filter=Q(is_accurate=True)),
+                     inaccurate_n=Count("id", filter=Q(is_accurate=False)),
+                 )
+                 .order_by()
+    )
+
+    # fall_state NULL and '' share a bucket, as in FallAlert.rollup_contribution
+    buckets = {}
+    for row in rows:
+        key = (row["day"], row["hour_of_day"], row["detected_by"], row["fall_state"] or "")
+        bucket = buckets.setdefault(key, rollup_model(
+            date=key[0], hour=key[1], detected_by=key[2], fall_state=key[3],
+        ))
+        bucket.count += row["n"]
+        bucket.acknowledged_count += row["acknowledged_n"]
+        bucket.response_count += row["response_n"]
+        bucket.response_seconds += (row["response_total"] or timedelta()).total_seconds()
+        bucket.accurate_count += row["accurate_n"]
+        bucket.inaccurate_count += row["inaccurate_n"]
+
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        rollup_model.objects.bulk_create(buckets.values(), batch_size=500)
+    return len(buckets)
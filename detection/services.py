@@ -3,20 +3,105 @@ Services for the detection app.
 
 This module provides service classes for fall detection using YOLO models
 and for generating and attaching video clips to alerts. It includes:
-- FallDetectionService: Runs YOLO inference and determines if a fall is detected.
-- VideoClipService: Extracts short video clips from a camera stream and attaches them to FallAlert instances.
+- Detection: Compact, framework-free record of a single inference pass.
+- FallDetectionService: Runs YOLO inference (PyTorch or ONNX Runtime backend,
+  see backends.py) and determines if a fall is detected. With `lazy=True` the
+  weights (and torch/ultralytics) are only loaded on first use.
+- ModelRegistry: The process's lazily loaded services, with optional
+  background pre-warming and load/warm-up timings.
+- VideoClipService: Extracts short video clips from a camera stream and streams them into FallAlert.video_clip.
 """
 
-from ultralytics import YOLO
 import cv2
+import logging
 import os
+import threading
+import time
 import uuid
 import tempfile
-from django.core.files.base import ContentFile
 from .models import FallAlert
+from .encoding import save_clip, write_video
+from .backends import BACKENDS, get_variant, load_model
 import numpy as np
-from typing import Tuple, List
-from ultralytics.engine.results import Results
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, Tuple, List, Optional
+
+if TYPE_CHECKING:  # Importing ultralytics pulls in torch (seconds); only needed for type hints
+    from ultralytics.engine.results import Results
+
+logger = logging.getLogger(__name__)
+
+FALL_CLASS_NAME = "Fall-Detected"
+
+
+@dataclass(frozen=True)
+class Detection:
+    """
+    Result of a single YOLO forward pass, reduced to plain NumPy arrays.
+
+    Attributes:
+        fall (bool): True if at least one Fall-Detected box reaches the threshold.
+        confidence (float | None): Best Fall-Detected confidence above the threshold.
+        boxes (np.ndarray): All boxes as an (N, 4) float32 array in xyxy pixels.
+        class_ids (np.ndarray): Class id of each box, shape (N,).
+        scores (np.ndarray): Confidence of each box, shape (N,).
+        names (Dict[int, str]): Class id to class name mapping of the model.
+        conf_threshold (float): Threshold the fall decision was made with.
+    """
+    fall: bool
+    confidence: Optional[float]
+    boxes: np.ndarray
+    class_ids: np.ndarray
+    scores: np.ndarray
+    names: Dict[int, str] = field(default_factory=dict)
+    conf_threshold: float = 0.0
+
+    @classmethod
+    def empty(cls, names: Optional[Dict[int, str]] = None) -> "Detection":
+        """Return a detection record without any box."""
+        return cls(
+            fall=False,
+            confidence=None,
+            boxes=np.zeros((0, 4), dtype=np.float32),
+            class_ids=np.zeros((0,), dtype=np.int64),
+            scores=np.zeros((0,), dtype=np.float32),
+            names=dict(names or {}),
+        )
+
+    def fall_mask(self, conf_threshold: float = 0.0) -> np.ndarray:
+        """
+        Boolean mask of the Fall-Detected boxes with confidence >= conf_threshold.
+        """
+        fall_ids = [cls_id for cls_id, name in self.names.items() if name == FALL_CLASS_NAME]
+        return np.isin(self.class_ids, fall_ids) & (self.scores >= conf_threshold)
+
+    def fall_boxes(self) -> np.ndarray:
+        """
+        Return the Fall-Detected boxes reaching the decision threshold, as an (M, 4) array.
+        """
+        return self.boxes[self.fall_mask(self.conf_threshold)]
+
+    def draw(self, image: np.ndarray) -> np.ndarray:
+        """
+        Return a copy of the BGR image with every box and its class:confidence label.
+        """
+        annotated = image.copy()
+        for (x1, y1, x2, y2), cls_id, conf in zip(self.boxes.astype(int), self.class_ids, self.scores):
+            cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 0, 255), 2)
+            label = f"{self.names.get(int(cls_id), '')}:{conf:.2f}"
+            cv2.putText(annotated, label, (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+        return annotated
+
+    def best_fall_box(self) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Return the (x1, y1, x2, y2) box of the most confident Fall-Detected box
+        reaching the decision threshold, if any.
+        """
+        mask = self.fall_mask(self.conf_threshold)
+        if not mask.any():
+            return None
+        idx = np.flatnonzero(mask)[np.argmax(self.scores[mask])]
+        return tuple(int(v) for v in self.boxes[idx])
 
 
 class FallDetectionService:
@@ -26,34 +111,193 @@ class FallDetectionService:
     Attributes:
         model_path (str): Path to the YOLO model weights.
         conf_threshold (float): Minimum confidence to count as a fall.
+        backend (str): "ultralytics" (PyTorch) or "onnx" (ONNX Runtime).
+        variant (str | None): Name of the model variant (see backends.VARIANTS), if any.
+        load_seconds (float | None): Time taken to load the model, once loaded.
+        warmup_seconds (float | None): Time taken by the warm-up inference, once done.
     """
+    WARMUP_SHAPE = (480, 640, 3)   # Dummy frame used to warm up the model
+
     def __init__(
         self, 
         model_path: str = 'model_dl/best.pt',
-        conf_threshold: float = 0.7
+        conf_threshold: float = 0.7,
+        backend: str = "ultralytics",
+        variant: Optional[str] = None,
+        lazy: bool = False,
+        **backend_options,
     ) -> None:
         """
         Initialize the YOLO model and set the confidence threshold.
 
         Args:
-            model_path (str): Path to the YOLO model weights.
+            model_path (str): Path to the YOLO model weights (`.pt`, or `.onnx` for the ONNX backend).
             conf_threshold (float): Minimum confidence to count as a fall.
+            backend (str): "ultralytics" or "onnx"; `.pt` weights are exported to ONNX on first use.
+            variant (str | None): Model variant (e.g. "int8-416"); overrides `backend`,
+                the input size and the quantization.
+            lazy (bool): Load the model on first use instead of now.
+            **backend_options: Passed to backends.load_model (imgsz, providers, threads, quantize).
+
+        Raises:
+            ValueError: If the variant or backend is unknown.
         """
-        self.model = YOLO(model_path)
+        if variant:
+            model_variant = get_variant(variant)
+            backend = model_variant.backend
+            backend_options = {**backend_options, **model_variant.options()}
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+        self.model_path = model_path
+        self.backend = backend
+        self.variant = variant
+        self.backend_options = backend_options
         self.conf_threshold = conf_threshold
 
-    def run_model(self, image: np.ndarray) -> List[Results]:
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self._model = None
+        self._load_lock = threading.Lock()
+        if not lazy:
+            self.load()
+
+    @property
+    def model(self):
+        """The inference model, loaded on first access."""
+        return self._model if self._model is not None else self.load()
+
+    @model.setter
+    def model(self, value) -> None:
+        self._model = value
+
+    @property
+    def is_loaded(self) -> bool:
+        """True once the model is in memory."""
+        return self._model is not None
+
+    def load(self):
+        """
+        Load the model if needed (thread-safe) and return it.
+        """
+        with self._load_lock:
+            if self._model is None:
+                started = time.perf_counter()
+                self._model = load_model(self.model_path, self.backend, **self.backend_options)
+                self.load_seconds = time.perf_counter() - started
+                logger.info("Loaded %s (%s backend) in %.2f s", self.model_path, self.backend, self.load_seconds)
+            return self._model
+
+    def warm_up(self) -> float:
+        """
+        Load the model and run one dummy inference, so the first real frame
+        does not pay for lazy initialization (allocations, kernel selection).
+
+        Returns:
+            float: Seconds taken by the warm-up inference.
+        """
+        self.load()
+        started = time.perf_counter()
+        self.detect(np.zeros(self.WARMUP_SHAPE, dtype=np.uint8))
+        self.warmup_seconds = time.perf_counter() - started
+        logger.info("Warmed up %s in %.2f s", self.model_path, self.warmup_seconds)
+        return self.warmup_seconds
+
+    def load_metrics(self) -> dict:
+        """Backend, load state and timings."""
+        return {
+            "backend": self.backend,
+            "variant": self.variant,
+            "loaded": self.is_loaded,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+        }
+
+    def run_model(self, image: np.ndarray | List[np.ndarray]) -> List["Results"]:
         """
         Run raw YOLO inference on the BGR image and return the list of Results.
 
         Args:
-            image (np.ndarray): Input image in BGR format.
+            image (np.ndarray | List[np.ndarray]): Input image in BGR format,
+                or a list of images to run as a single batch.
 
         Returns:
             List[Results]: YOLO inference results.
         """
         return self.model(image)
 
+    def detect(self, image: np.ndarray) -> Detection:
+        """
+        Run YOLO once on the image and return a compact Detection record.
+
+        This is the single-pass entry point used by the views: boxes, class ids
+        and the fall decision all come from the same forward pass.
+
+        Args:
+            image (np.ndarray): Input image in BGR format.
+
+        Returns:
+            Detection: Fall flag, best confidence and all boxes of the frame.
+        """
+        return self.to_detection(self.run_model(image))
+
+    def to_detection(self, results: List["Results"]) -> Detection:
+        """
+        Convert raw YOLO results of one image into a Detection record.
+
+        Args:
+            results (List[Results]): Output of the model for a single image.
+
+        Returns:
+            Detection: Boxes of every result concatenated into NumPy arrays.
+        """
+        if not results:
+            return Detection.empty()
+
+        names = dict(results[0].names)
+        boxes, class_ids, scores = [], [], []
+        for r in results:
+            data = r.boxes.cpu().numpy()
+            boxes.append(np.asarray(data.xyxy, dtype=np.float32).reshape(-1, 4))
+            class_ids.append(np.asarray(data.cls, dtype=np.int64).reshape(-1))
+            scores.append(np.asarray(data.conf, dtype=np.float32).reshape(-1))
+
+        detection = Detection(
+            fall=False,
+            confidence=None,
+            boxes=np.concatenate(boxes),
+            class_ids=np.concatenate(class_ids),
+            scores=np.concatenate(scores),
+            names=names,
+            conf_threshold=self.conf_threshold,
+        )
+        mask = detection.fall_mask(self.conf_threshold)
+        if not mask.any():
+            return detection
+        return Detection(
+            fall=True,
+            confidence=float(detection.scores[mask].max()),
+            boxes=detection.boxes,
+            class_ids=detection.class_ids,
+            scores=detection.scores,
+            names=names,
+            conf_threshold=self.conf_threshold,
+        )
+
+    def detect_batch(self, images: List[np.ndarray]) -> List[Detection]:
+        """
+        Run YOLO once on a batch of images and return one Detection per image.
+
+        Args:
+            images (List[np.ndarray]): Input images in BGR format.
+
+        Returns:
+            List[Detection]: Detection records, in the same order as `images`.
+        """
+        if not images:
+            return []
+        results = self.run_model(list(images))
+        return [self.to_detection([r]) for r in results]
+
     def detect_falls(self, image: np.ndarray) -> Tuple[bool, float | None]:
         """
         Analyze an image and determine if a fall is detected.
@@ -65,15 +309,62 @@ class FallDetectionService:
             Tuple[bool, float | None]: (True, confidence) if a fall is detected with
             confidence >= threshold, otherwise (False, None).
         """
-        results = self.run_model(image)
-        for r in results:
-            for box in r.boxes:
-                cls_id   = int(box.cls)
-                cls_name = r.names.get(cls_id, "")
-                conf     = float(box.conf)
-                if cls_name == "Fall-Detected" and conf >= self.conf_threshold:
-                    return True, conf
-        return False, None
+        detection = self.detect(image)
+        return detection.fall, detection.confidence
+
+
+class ModelRegistry:
+    """
+    Named detection services of the process, loaded lazily.
+
+    Management commands and tests never touch the models, so they start
+    without importing torch/ultralytics or reading the weights; serving
+    processes can pre-warm them in the background at startup.
+    """
+    def __init__(self) -> None:
+        self._services: Dict[str, FallDetectionService] = {}
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, service: FallDetectionService) -> FallDetectionService:
+        """Register a (lazy) service under a name and return it."""
+        self._services[name] = service
+        return service
+
+    def get(self, name: str) -> FallDetectionService:
+        """Return a registered service (its model loads on first use)."""
+        return self._services[name]
+
+    def prewarm(self, names: Optional[Iterable[str]] = None,
+                background: bool = True) -> Optional[threading.Thread]:
+        """
+        Load and warm up services, by default all of them in a daemon thread.
+
+        Args:
+            names (Iterable[str] | None): Services to warm up (all when None).
+            background (bool): Return immediately and warm up in a thread.
+
+        Returns:
+            threading.Thread | None: The warm-up thread when running in background.
+        """
+        names = list(names or self._services)
+
+        def warm_up_all():
+            for name in names:
+                try:
+                    self._services[name].warm_up()
+                except Exception:
+                    logger.exception("Failed to warm up the '%s' model", name)
+
+        if not background:
+            warm_up_all()
+            return None
+        self._warmup_thread = threading.Thread(target=warm_up_all, name="model-warmup", daemon=True)
+        self._warmup_thread.start()
+        return self._warmup_thread
+
+    def metrics(self) -> dict:
+        """Load state and timings of every service."""
+        return {name: service.load_metrics() for name, service in self._services.items()}
 
 
 class VideoClipService:
@@ -81,7 +372,8 @@ class VideoClipService:
     Utility service for generating a short video clip around the detection timestamp.
 
     Assumes the camera provides an RTSP/UDP stream and that the approximate
-    fall instant is known.
+    fall instant is known. Seeking only works on recorded sources: live alerts
+    get their clip from the in-memory frame buffer (see framebuffer.ClipRecorder).
     """
     def __init__(self, source_url):
         """
@@ -92,117 +384,84 @@ class VideoClipService:
         """
         self.source_url = source_url  # ex: "rtsp://192.168.1.100:554/stream"
 
-    def extract_clip(self, start_time: float, duration: float = 10.0) -> (str, bytes):
+    def open_clip(self, start_time: float, duration: float = 10.0) -> Tuple[Iterator[np.ndarray], float]:
         """
-        Extract a video clip of `duration` seconds starting from `start_time` (UNIX timestamp).
+        Open the stream and return the frames of `duration` seconds around `start_time`.
 
         Args:
             start_time (float): Start time in UNIX timestamp.
             duration (float): Duration of the clip in seconds.
 
         Returns:
-            tuple: (filename, binary_data) for saving.
+            tuple: (frame iterator, fps). The iterator is empty if the stream cannot be opened.
         """
         cap = cv2.VideoCapture(self.source_url)
         fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
 
-        # Create a temporary file for the clip
-        temp_file = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
-        filename = os.path.basename(temp_file.name)
-        out = None
-
-        # Set the starting position in the video stream
-        cap.set(cv2.CAP_PROP_POS_MSEC, (start_time - duration/2) * 1000)
-
-        frames_to_write = int(duration * fps)
-        written = 0
+        def frames() -> Iterator[np.ndarray]:
+            try:
+                if not cap.isOpened():
+                    return
+                # Set the starting position in the video stream
+                cap.set(cv2.CAP_PROP_POS_MSEC, (start_time - duration/2) * 1000)
+                for _ in range(int(duration * fps)):
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    yield frame
+            finally:
+                cap.release()
+
+        return frames(), fps
 
-        while written < frames_to_write:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            if out is None:
-                height, width, _ = frame.shape
-                out = cv2.VideoWriter(temp_file.name, fourcc, fps, (width, height))
-            out.write(frame)
-            written += 1
+    def extract_clip(self, start_time: float, duration: float = 10.0) -> (str, bytes):
+        """
+        Extract a video clip of `duration` seconds starting from `start_time` (UNIX timestamp).
 
-        cap.release()
-        if out:
-            out.release()
+        Prefer `attach_clip_to_alert`, which streams the clip into the storage
+        backend instead of returning it in memory.
 
-        with open(temp_file.name, "rb") as f:
-            data = f.read()
+        Args:
+            start_time (float): Start time in UNIX timestamp.
+            duration (float): Duration of the clip in seconds.
 
+        Returns:
+            tuple: (filename, binary_data) for saving.
+        """
+        temp_file = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
+        temp_file.close()
+        filename = os.path.basename(temp_file.name)
         try:
-            os.unlink(temp_file.name)
-        except OSError:
-            pass
+            frames, fps = self.open_clip(start_time, duration)
+            write_video(temp_file.name, frames, fps)
+            with open(temp_file.name, "rb") as f:
+                data = f.read()
+        finally:
+            try:
+                os.unlink(temp_file.name)
+            except OSError:
+                pass
 
         return filename, data
 
-    def attach_clip_to_alert(self, alert: FallAlert, start_time: float, duration: float = 10.0):
+    def attach_clip_to_alert(self, alert: FallAlert, start_time: float, duration: float = 10.0) -> bool:
         """
         Attach a generated video clip to a FallAlert instance.
 
+        The clip is encoded straight into the storage backend of
+        `alert.video_clip` (see encoding.save_clip); it is never read back
+        into memory.
+
         Args:
             alert (FallAlert): The alert instance to attach the clip to.
             start_time (float): Start time in UNIX timestamp.
             duration (float): Duration of the clip in seconds.
 
-        Note:
-            The commented code below is an alternative implementation for extracting
-            and saving a video clip. It is kept for reference and may be useful for
-            debugging or future improvements.
-        """
-        # --- Alternative implementation (kept for reference) ---
-        """
-        cap = cv2.VideoCapture(self.source_url)
-        if not cap.isOpened():
-            raise RuntimeError("Impossible d'ouvrir le flux vidéo")
-
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        if fps <= 0:
-            fps = 25.0  # default value
-
-        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
-        temp_file = tempfile.NamedTemporaryFile(suffix=".mp4", delete=False)
-        filename = os.path.basename(temp_file.name)
-
-        # Read the first frame to get the size
-        ret, frame = cap.read()
-        if not ret:
-            cap.release()
-            temp_file.close()
-            raise RuntimeError("Impossible de lire une frame du flux")
-
-        height, width = frame.shape[:2]
-        out = cv2.VideoWriter(temp_file.name, fourcc, fps, (width, height))
-
-        # Write the first frame
-        out.write(frame)
-
-        # Calculate number of frames to write
-        frames_to_write = int(duration * fps) - 1  # one frame already written
-        for _ in range(frames_to_write):
-            ret, frame = cap.read()
-            if not ret:
-                break
-            out.write(frame)
-
-        cap.release()
-        out.release()
-
-        with open(temp_file.name, "rb") as f:
-            data = f.read()
-
-        try:
-            os.unlink(temp_file.name)
-        except OSError:
-            pass
-
-        alert.video_clip.save(filename, ContentFile(data), save=True)
+        Returns:
+            bool: True if a clip was stored.
         """
-        pass  # The actual implementation is provided in extract_clip()
-
+        frames, fps = self.open_clip(start_time, duration)
+        written = save_clip(alert.video_clip, frames, fps, filename=f"{uuid.uuid4().hex}.mp4")
+        if written:
+            alert.save(update_fields=["video_clip"])
+        return bool(written)
@@ -0,0 +1,112 @@
+"""
+Signal handlers of the detection app.
+
+Connected in DetectionConfig.ready().
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .events import AlertNotification, alert_events, alert_payload, notification_type
+from .models import ROLLUP_FIELDS, FallAlert
+from .pagination import cursor_for
+from .rollups import record_alert_change
+from .stats import invalidate_alert_sources, invalidate_dashboard_stats
+
+
+@receiver(pre_save, sender=FallAlert)
+def remember_rollup_contribution(sender, instance, update_fields=None, **kwargs):
+    """
+    Make sure an updated alert knows its previous rollup contribution.
+
+    Rows loaded normally already carry it (FallAlert.from_db); this covers
+    instances built by hand or loaded with deferred fields. A save of some
+    rollup fields only (`update_fields`) reads the row again: another writer may have
+    changed it since this instance was loaded (e.g. escalated its fall_state),
+    so the contribution is taken from the row, and the rollup fields that are
+    not saved are refreshed from it.
+    """
+    if instance._state.adding:
+        return
+    # A save that writes no rollup field cannot move the alert between buckets
+    partial = update_fields is not None and ROLLUP_FIELDS & set(update_fields) and not ROLLUP_FIELDS <= set(update_fields)
+    if not partial and hasattr(instance, "_rollup_snapshot"):
+        return
+    previous = FallAlert.objects.filter(pk=instance.pk).only(*ROLLUP_FIELDS).first()
+    instance._rollup_snapshot = previous.rollup_contribution() if previous else None
+    if partial and previous is not None:
+        for name in ROLLUP_FIELDS - set(update_fields):
+            setattr(instance, name, getattr(previous, name))
+
+
+@receiver(pre_save, sender=FallAlert)
+def remember_alert_state(sender, instance, **kwargs):
+    """
+    Keep (fall_state, acknowledged) before the save, to detect escalations.
+    """
+    snapshot = None if instance._state.adding else getattr(instance, "_rollup_snapshot", None)
+    if snapshot is None:
+        instance._previous_state = None
+        return
+    key, values = snapshot
+    instance._previous_state = (key[3], bool(values["acknowledged_count"]))
+
+
+@receiver(post_save, sender=FallAlert)
+def publish_alert_notification(sender, instance, created, **kwargs):
+    """
+    Push new alerts, escalations and acknowledgements to live screens once committed.
+    """
+    previous = None if created else getattr(instance, "_previous_state", None)
+    if not created and previous is None:
+        return  # Previous state unknown
+    kind = notification_type(previous, instance)
+    if kind is None:
+        return
+    notification = AlertNotification(type=kind, data=alert_payload(instance), id=cursor_for(instance))
+    transaction.on_commit(lambda: alert_events.publish(notification))
+
+
+@receiver(post_save, sender=FallAlert)
+def update_rollups_on_save(sender, instance, created, **kwargs):
+    """
+    Move the alert's contribution between AlertRollup buckets.
+    """
+    old = None if created else getattr(instance, "_rollup_snapshot", None)
+    new = instance.rollup_contribution()
+    record_alert_change(old, new)
+    instance._rollup_snapshot = new
+
+
+@receiver(post_delete, sender=FallAlert)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    """
+    Remove a deleted alert from its AlertRollup bucket.
+    """
+    record_alert_change(getattr(instance, "_rollup_snapshot", None) or instance.rollup_contribution(), None)
+
+
+@receiver(post_save, sender=FallAlert)
+@receiver(post_delete, sender=FallAlert)
+def fall_alert_changed(sender, instance, **kwargs):
+    """
+    Drop the cached dashboard statistics when an alert is created, updated or deleted.
+    """
+    invalidate_dashboard_stats()
+
+
+@receiver(post_save, sender=FallAlert)
+def alert_source_saved(sender, instance, **kwargs):
+    """
+    Drop the cached source list when an alert comes from a source not listed yet.
+    """
+    invalidate_alert_sources(instance.detected_by)
+
+
+@receiver(post_delete, sender=FallAlert)
+def alert_source_deleted(sender, instance, **kwargs):
+    """
+    Drop the cached source list when an alert is deleted (its source may be gone).
+    """
+    invalidate_alert_sources()
@@ -0,0 +1,184 @@
+"""
+Aggregated dashboard statistics.
+
+Every figure shown on the dashboard is read from the AlertRollup buckets
+(one row per date/hour/source/state, maintained incrementally by
+rollups.py) with a handful of grouped queries, so the cost depends on the
+number of days covered rather than on the number of alerts. The result is
+also cached; detection/signals.py drops the cache whenever an alert is
+created, updated (acknowledged, marked, new fall state) or deleted, so the
+dashboard's auto-refresh usually costs a single cache read.
+
+Cache lifetime comes from settings.DASHBOARD_STATS_TIMEOUT (seconds).
+"""
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import AlertRollup, FallAlert
+
+CACHE_KEY = "dashboard_stats"
+TEST_SOURCE = "test_upload"   # Manual test uploads are excluded from response/accuracy rates
+
+
+def _format_duration(seconds: float | None) -> str | None:
+    """Format a response time as '<m>m <s>s'."""
+    if seconds is None:
+        return None
+    return f"{int(seconds // 60)}m {int(seconds % 60)}s"
+
+
+def compute_dashboard_stats(now: datetime | None = None) -> dict:
+    """
+    Compute the dashboard statistics from the alert rollups (five queries).
+
+    Args:
+        now (datetime | None): Reference time (defaults to timezone.now()).
+
+    Returns:
+        dict: Statistics used by the dashboard template (without recent alerts).
+    """
+    today = timezone.localtime(now or timezone.now()).date()
+    yesterday = today - timedelta(days=1)
+
+    real = ~Q(detected_by=TEST_SOURCE)
+    urgent = Q(fall_state="urgent")
+    totals = AlertRollup.objects.aggregate(
+        total_alerts=Sum("count"),
+        today_alerts=Sum("count", filter=Q(date=today)),
+        yesterday_alerts=Sum("count", filter=Q(date=yesterday)),
+        acknowledged_alerts=Sum("acknowledged_count"),
+        urgent_alerts=Sum("count", filter=urgent),
+        urgent_acknowledged=Sum("acknowledged_count", filter=urgent),
+        total_real_alerts=Sum("count", filter=real),
+        acknowledged_real_alerts=Sum("acknowledged_count", filter=real),
+        accurate_alerts=Sum("accurate_count", filter=real),
+        inaccurate_alerts=Sum("inaccurate_count", filter=real),
+        recent_week_alerts=Sum("count", filter=Q(date__gte=today - timedelta(days=7))),
+        response_count=Sum("response_count"),
+        response_seconds=Sum("response_seconds"),
+    )
+    totals = {name: value or 0 for name, value in totals.items()}
+    total_alerts = totals["total_alerts"]
+
+    # Weekly activity (last 7 days, oldest to newest)
+    daily_counts = dict(
+        AlertRollup.objects
+                   .filter(date__gte=today - timedelta(days=6))
+                   .values_list("date")
+                   .annotate(total=Sum("count"))
+                   .order_by()
+    )
+    weekly_activity = []
+    for i in range(6, -1, -1):
+        date = today - timedelta(days=i)
+        weekly_activity.append({
+            "day": date.strftime("%a %m/%d"),
+            "count": daily_counts.get(date, 0),
+            "date": date,
+        })
+    max_daily_count = max(stat["count"] for stat in weekly_activity)
+    for stat in weekly_activity:
+        stat["width"] = (stat["count"] / max_daily_count * 100) if max_daily_count > 0 else 0
+
+    # Peak hour
+    peak = (
+        AlertRollup.objects
+                   .values_list("hour")
+                   .annotate(total=Sum("count"))
+                   .filter(total__gt=0)
+                   .order_by("-total", "hour")
+                   .first()
+    )
+    peak_hour = f"{peak[0]:02d}:00" if peak else None
+
+    # Detection sources
+    detection_sources = list(
+        AlertRollup.objects
+                   .values("detected_by")
+                   .annotate(count=Sum("count"))
+                   .filter(count__gt=0)
+                   .order_by("-count")
+    )
+    for source in detection_sources:
+        source["percentage"] = (source["count"] / total_alerts * 100) if total_alerts > 0 else 0
+
+    last_alert_time = FallAlert.objects.order_by("-timestamp").values_list("timestamp", flat=True).first()
+
+    total_real = totals["total_real_alerts"]
+    total_marked = totals["accurate_alerts"] + totals["inaccurate_alerts"]
+    response_count = totals["response_count"]
+    return {
+        "total_alerts": total_alerts,
+        "today_alerts": totals["today_alerts"],
+        "today_vs_yesterday": totals["today_alerts"] - totals["yesterday_alerts"],
+        "pending_alerts": total_alerts - totals["acknowledged_alerts"],
+        "urgent_alerts": totals["urgent_alerts"] - totals["urgent_acknowledged"],
+        "response_rate": (totals["acknowledged_real_alerts"] / total_real * 100) if total_real > 0 else 0,
+        "model_accuracy": (totals["accurate_alerts"] / total_marked * 100) if total_marked > 0 else None,
+        "total_marked_accuracy": total_marked,
+        "weekly_activity": weekly_activity,
+        "max_daily_alerts": max_daily_count,
+        "detection_sources": detection_sources,
+        "avg_daily_alerts": totals["recent_week_alerts"] / 7.0,
+        "peak_hour": peak_hour,
+        "avg_response_time": (
+            _format_duration(totals["response_seconds"] / response_count) if response_count else None
+        ),
+        "last_alert_time": last_alert_time,
+    }
+
+
+def _cache_key() -> str:
+    """Cache key of today's snapshot (the day boundaries change at midnight)."""
+    return f"{CACHE_KEY}:{timezone.localdate().isoformat()}"
+
+
+def get_dashboard_stats() -> dict:
+    """
+    Return the cached dashboard statistics, computing them on a miss.
+    """
+    key = _cache_key()
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_dashboard_stats()
+        cache.set(key, stats, timeout=getattr(settings, "DASHBOARD_STATS_TIMEOUT", 300))
+    return stats
+
+
+def invalidate_dashboard_stats() -> None:
+    """Drop the cached statistics (called when alerts change)."""
+    cache.delete(_cache_key())
+
+
+SOURCES_CACHE_KEY = "alert_sources"
+
+
+def get_alert_sources() -> list:
+    """
+    Return the distinct alert sources (detected_by values), cached.
+
+    Dropped by signals.py when an alert with a new source is created or an alert is deleted.
+    """
+    sources = cache.get(SOURCES_CACHE_KEY)
+    if sources is None:
+        sources = list(
+            FallAlert.objects.order_by("detected_by").values_list("detected_by", flat=True).distinct()
+        )
+        cache.set(SOURCES_CACHE_KEY, sources, timeout=None)
+    return sources
+
+
+def invalidate_alert_sources(source: str | None = None) -> None:
+    """
+    Drop the cached source list (only if `source` is given and not in it yet).
+    """
+    if source is not None:
+        sources = cache.get(SOURCES_CACHE_KEY)
+        if sources is None or source in sources:
+            return
+    cache.delete(SOURCES_CACHE_KEY)
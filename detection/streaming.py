@@ -0,0 +1,210 @@
+"""
+WebSocket streaming channel for live fall detection.
+
+The live camera page can push binary JPEG frames over a single WebSocket
+instead of one HTTP POST per frame (CSRF, session lookup and the whole
+middleware stack on every frame). The server answers each processed frame
+with the detection and FallTracker state (fall_state, time_on_ground, bbox).
+
+Backpressure: only the most recent frame is kept while inference is
+running. Frames arriving in the meantime replace the pending one and are
+counted as dropped, so the client always sees results for fresh frames
+instead of a growing backlog.
+
+The consumer is a plain ASGI application mounted by backend/asgi.py; it
+does not need any extra dependency. It requires an authenticated session
+(checked once when the socket opens) and, since browsers send the session
+cookie with cross-site WebSocket handshakes too, an Origin matching the
+requested host or CSRF_TRUSTED_ORIGINS (the same rule as Django's CSRF check).
+"""
+
+import asyncio
+import json
+from http.cookies import SimpleCookie
+from types import SimpleNamespace
+from typing import Optional
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.http import is_same_domain
+
+from .ingest import decode_image_buffer, FrameDecodeError
+
+
+class LatestFrameSlot:
+    """
+    Single-slot mailbox holding only the most recent frame.
+
+    Putting a frame while another one is pending replaces it (the stale
+    frame is dropped). `get` waits until a frame is available or the slot
+    is closed, in which case it returns None.
+    """
+    def __init__(self) -> None:
+        self._frame: Optional[bytes] = None
+        self._event = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame: bytes) -> None:
+        """Store a frame, dropping the pending one if any."""
+        self.received += 1
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self._event.set()
+
+    def close(self) -> None:
+        """Wake up the consumer and make `get` return None."""
+        self._closed = True
+        self._event.set()
+
+    async def get(self) -> Optional[bytes]:
+        """Wait for the next frame; None once the slot is closed."""
+        while self._frame is None:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        frame, self._frame = self._frame, None
+        return frame
+
+
+class DetectionStreamConsumer:
+    """
+    ASGI WebSocket application streaming detection results for pushed frames.
+
+    Protocol:
+        client → server: binary messages, each one an encoded image (JPEG).
+        server → client: text messages with the JSON detection state, plus
+                         `frames_received` / `frames_dropped` counters.
+    """
+    CLOSE_UNAUTHORIZED = 4401
+    CLOSE_FORBIDDEN_ORIGIN = 4403
+
+    def __init__(self, pipeline=None) -> None:
+        """
+        Args:
+            pipeline: Object with a `process(img) -> dict` method. Defaults to
+                the shared LiveDetectionPipeline.
+        """
+        self._pipeline = pipeline
+
+    @property
+    def pipeline(self):
+        """Live pipeline, imported lazily so the model loads with the first socket."""
+        if self._pipeline is None:
+            from .pipeline import live_pipeline
+            self._pipeline = live_pipeline
+        return self._pipeline
+
+    async def __call__(self, scope, receive, send) -> None:
+        """
+        Handle one WebSocket connection.
+        """
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+
+        if not self.origin_allowed(scope):
+            await send({"type": "websocket.close", "code": self.CLOSE_FORBIDDEN_ORIGIN})
+            return
+        if not await self.authenticate(scope):
+            await send({"type": "websocket.close", "code": self.CLOSE_UNAUTHORIZED})
+            return
+        await send({"type": "websocket.accept"})
+
+        slot = LatestFrameSlot()
+        reader = asyncio.create_task(self._read_frames(receive, slot))
+        try:
+            while True:
+                frame = await slot.get()
+                if frame is None:
+                    break
+                payload = await self._process(frame)
+                payload["frames_received"] = slot.received
+                payload["frames_dropped"] = slot.dropped
+                await send({"type": "websocket.send", "text": json.dumps(payload)})
+        finally:
+            reader.cancel()
+
+    async def _read_frames(self, receive, slot: LatestFrameSlot) -> None:
+        """Receive messages until disconnect, keeping only the latest frame."""
+        try:
+            while True:
+                message = await receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message["type"] == "websocket.receive" and message.get("bytes"):
+                    slot.put(message["bytes"])
+        finally:
+            slot.close()
+
+    async def _process(self, frame: bytes) -> dict:
+        """Decode and run the live pipeline on a worker thread."""
+        from .pipeline import InferenceError
+
+        def run() -> dict:
+            try:
+                img = decode_image_buffer(frame)
+            except FrameDecodeError as e:
+                return {"error": str(e)}
+            try:
+                return self.pipeline.process(img)
+            except InferenceError as e:
+                return {"error": f"YOLO inference error: {str(e)}"}
+
+        return await sync_to_async(run, thread_sensitive=False)()
+
+    def origin_allowed(self, scope) -> bool:
+        """
+        Return True if the handshake comes from a page of this site.
+
+        The Origin must be the requested host or match CSRF_TRUSTED_ORIGINS
+        (``https://*.example.com`` wildcards included). Handshakes without an
+        Origin are not sent by browsers, so they cannot carry a hijacked session.
+        """
+        headers = dict(scope.get("headers") or [])
+        origin = headers.get(b"origin")
+        if origin is None:
+            return True
+        origin = origin.decode("latin-1")
+        if origin == "null":
+            return False
+        parts = urlsplit(origin)
+        if parts.netloc and parts.netloc == headers.get(b"host", b"").decode("latin-1"):
+            return True
+        for trusted in getattr(settings, "CSRF_TRUSTED_ORIGINS", []):
+            trusted = urlsplit(trusted)
+            if trusted.scheme == parts.scheme and is_same_domain(parts.netloc, trusted.netloc.lstrip("*")):
+                return True
+        return False
+
+    async def authenticate(self, scope) -> bool:
+        """
+        Return True if the connection carries a session of an authenticated user.
+        """
+        headers = dict(scope.get("headers") or [])
+        cookie_header = headers.get(b"cookie", b"").decode("latin-1")
+        cookies = SimpleCookie()
+        cookies.load(cookie_header)
+        morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+        if morsel is None:
+            return False
+
+        def load_user():
+            from importlib import import_module
+            from django.contrib.auth import get_user
+            engine = import_module(settings.SESSION_ENGINE)
+            session = engine.SessionStore(morsel.value)
+            return get_user(SimpleNamespace(session=session))
+
+        user = await sync_to_async(load_user)()
+        return user.is_authenticated
+
+
+# WebSocket routes mounted by backend/asgi.py
+websocket_urlpatterns = {
+    "/detection/ws/stream/": DetectionStreamConsumer(),
+}
@@ -0,0 +1,16 @@
+"""
+Celery tasks of the detection app (JOB_BACKEND = "celery").
+
+The task only runs the Job row it is given; job functions, status and
+progress are handled by jobs.run_job exactly as with the thread backend.
+"""
+
+from celery import shared_task
+
+from .jobs import run_job
+
+
+@shared_task(name="detection.run_job", ignore_result=True)
+def run_job_task(job_id: str) -> None:
+    """Run a queued background job."""
+    run_job(job_id)
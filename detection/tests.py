@@ -1,3 +1,1952 @@
-from django.test import TestCase
+import asyncio
+import base64
+import datetime
+import errno
+import io
+import json
+import os
+import shutil
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import cv2
+import numpy as np
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .alert_writer import AlertEvent, AlertWriter
+from . import backends
+from .batching import BatchingScheduler
+from .cameras import CameraReader, CameraWorkerPool
+from .encoding import encode_jpeg, save_clip
+from .stats import compute_dashboard_stats, get_dashboard_stats
+from .incidents import IncidentEngine, IncidentHandler, IncidentLost, Observation
+from .motion import MotionGate
+from .ratecontrol import ACTIVE, IDLE, PRESENCE, RateController
+from .framebuffer import ClipRecorder, FrameBufferRegistry, FrameRingBuffer
+from .jobs import JobQueue, SynchronousJobBackend, ThreadPoolJobBackend, job_registry, run_job
+from .inference_server import InferenceClient, InferenceServer, InferenceServerError
+from .models import AlertRollup, FallAlert, FallObservation, Job
+from .observations import ObservationRecorder
+from .services import Detection, FallDetectionService, ModelRegistry
+from .video_analysis import VideoAnalyzer, iter_video_frames
+from .streaming import DetectionStreamConsumer
+from .tracking import (
+    CacheStateBackend,
+    FallTracker,
+    InMemoryStateBackend,
+    TrackerRegistry,
+    associate,
+    iou_matrix,
+)
+
+NAMES = {0: "Fall-Detected", 1: "Walking"}
+
+
+class FakeBoxes:
+    """Minimal stand-in for ultralytics Boxes backed by NumPy arrays."""
+
+    def __init__(self, xyxy, cls, conf):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.cls = np.asarray(cls, dtype=np.float32)
+        self.conf = np.asarray(conf, dtype=np.float32)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self
+
+
+class FakeResult:
+    def __init__(self, boxes):
+        self.names = NAMES
+        self.boxes = boxes
+
+
+class CountingModel:
+    """Callable fake YOLO model that records how many times it was invoked."""
+
+    def __init__(self, xyxy=(), cls=(), conf=()):
+        self.calls = 0
+        self.batch_sizes = []
+        self.boxes = FakeBoxes(xyxy, cls, conf)
+
+    def __call__(self, source, **kwargs):
+        self.calls += 1
+        images = source if isinstance(source, list) else [source]
+        self.batch_sizes.append(len(images))
+        return [FakeResult(self.boxes) for _ in images]
+
+
+def make_service(model, conf_threshold=0.7):
+    with mock.patch("detection.services.load_model", return_value=model):
+        return FallDetectionService(conf_threshold=conf_threshold)
+
+
+def blank_frame(width=64, height=48):
+    return np.zeros((height, width, 3), dtype=np.uint8)
+
+
+class FallDetectionServiceTests(TestCase):
+    def test_detect_runs_model_once(self):
+        model = CountingModel(
+            xyxy=[[10, 10, 40, 30], [0, 0, 5, 5]], cls=[0, 1], conf=[0.9, 0.95]
+        )
+        service = make_service(model)
+
+        detection = service.detect(blank_frame())
+
+        self.assertEqual(model.calls, 1)
+        self.assertIsInstance(detection, Detection)
+        self.assertTrue(detection.fall)
+        self.assertAlmostEqual(detection.confidence, 0.9, places=5)
+        self.assertEqual(detection.boxes.shape, (2, 4))
+        self.assertEqual(detection.class_ids.tolist(), [0, 1])
+        self.assertEqual(detection.best_fall_box(), (10, 10, 40, 30))
+
+    def test_detect_below_threshold_is_not_a_fall(self):
+        model = CountingModel(xyxy=[[10, 10, 40, 30]], cls=[0], conf=[0.5])
+        detection = make_service(model).detect(blank_frame())
+
+        self.assertFalse(detection.fall)
+        self.assertIsNone(detection.confidence)
+        self.assertEqual(len(detection.boxes), 1)
+        self.assertIsNone(detection.best_fall_box())
+
+    def test_detect_falls_keeps_legacy_tuple(self):
+        model = CountingModel(xyxy=[[10, 10, 40, 30]], cls=[0], conf=[0.8])
+        service = make_service(model)
+
+        self.assertEqual(service.detect_falls(blank_frame())[0], True)
+        self.assertEqual(model.calls, 1)
+
+
+class BatchingSchedulerTests(TestCase):
+    def test_concurrent_frames_share_one_model_call(self):
+        model = CountingModel(xyxy=[[10, 10, 40, 30]], cls=[0], conf=[0.9])
+        scheduler = BatchingScheduler(make_service(model), window_ms=200, max_batch_size=4)
+        self.addCleanup(scheduler.close)
+
+        futures = [scheduler.submit_async(blank_frame()) for _ in range(4)]
+        detections = [f.result(timeout=5) for f in futures]
+
+        self.assertEqual(model.batch_sizes, [4])
+        self.assertTrue(all(d.fall for d in detections))
+        metrics = scheduler.metrics()
+        self.assertEqual(metrics["batches"], 1)
+        self.assertEqual(metrics["frames"], 4)
+        self.assertEqual(metrics["batch_size_histogram"], {4: 1})
+
+    def test_inference_cost_counts_only_inferred_frames(self):
+        from .pipeline import LiveDetectionPipeline
+        scheduler = BatchingScheduler(make_service(CountingModel()), window_ms=300)
+        self.addCleanup(scheduler.close)
+        pipeline = LiveDetectionPipeline(scheduler, motion=MotionGate())
+
+        inferred = pipeline.process(blank_frame(), camera_id="room_1")
+        reused = pipeline.process(blank_frame(), camera_id="room_1")
+
+        self.assertLess(inferred["inference_cost"], 0.3)  # Model time, not the collection window
+        self.assertIsNone(reused["inference_cost"])
+
+    def test_each_frame_gets_the_cost_of_its_own_batch(self):
+        class SlowSecondBatch(CountingModel):
+            def __call__(self, source, **kwargs):
+                if self.calls:
+                    time.sleep(0.2)
+                return super().__call__(source, **kwargs)
+
+        scheduler = BatchingScheduler(make_service(SlowSecondBatch()), window_ms=50, max_batch_size=2)
+        self.addCleanup(scheduler.close)
+
+        first = [scheduler.submit_async(blank_frame()) for _ in range(2)]
+        [f.result(timeout=5) for f in first]
+        _, slow_cost = scheduler.submit_timed(blank_frame(), timeout=5)
+
+        self.assertEqual(first[0].cost, first[1].cost)
+        self.assertLess(first[0].cost, 0.1)   # Not the later, slower batch
+        self.assertGreaterEqual(slow_cost, 0.2)
+
+    def test_errors_are_returned_to_every_caller(self):
+        model = mock.Mock(side_effect=RuntimeError("boom"))
+        scheduler = BatchingScheduler(make_service(model), window_ms=1)
+        self.addCleanup(scheduler.close)
+
+        with self.assertRaises(RuntimeError):
+            scheduler.submit(blank_frame(), timeout=5)
+        self.assertEqual(scheduler.metrics()["avg_batch_latency_ms"], 0.0)  # Failed batches are not timed
+
+    def test_missing_results_fail_every_caller(self):
+        service = make_service(CountingModel(xyxy=[[10, 10, 40, 30]], cls=[0], conf=[0.9]))
+        scheduler = BatchingScheduler(service, window_ms=200, max_batch_size=2)
+        self.addCleanup(scheduler.close)
+
+        with mock.patch.object(service, "detect_batch", side_effect=lambda images: [None]):
+            futures = [scheduler.submit_async(blank_frame()) for _ in range(2)]
+            for future in futures:
+                with self.assertRaises(RuntimeError):
+                    future.result(timeout=5)
+
+
+class TempMediaRootMixin:
+    """Gives a test class its own MEDIA_ROOT, removed once the class is done."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        media_override.enable()
+        cls.addClassCleanup(media_override.disable)
+        super().setUpClass()
+
+
+class RunYoloViewTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        from . import views
+        from .tracking import tracker_registry
+        cache.clear()
+        tracker_registry.get("live_camera").person_states.clear()
+        views.live_pipeline.incidents.clear("live_camera")
+        if views.live_pipeline.motion is not None:
+            views.live_pipeline.motion.reset()
+        # Write the samples of each test inside its own transaction
+        self.addCleanup(views.observation_recorder.flush)
+        self.model = CountingModel(xyxy=[[10, 10, 40, 30]], cls=[0], conf=[0.9])
+        for patcher in (
+            mock.patch.object(views.inference_scheduler.service, "_model", self.model),
+            # Persist inline: the test database is not visible from the writer thread
+            mock.patch.object(views.alert_writer, "synchronous", True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post_frame(self):
+        _, buf = cv2.imencode(".jpg", blank_frame())
+        payload = {"image": base64.b64encode(buf.tobytes()).decode()}
+        return self.client.post(
+            reverse("detection:run_yolo"),
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+
+    def test_raw_jpeg_body_is_accepted(self):
+        _, buf = cv2.imencode(".jpg", blank_frame())
+        response = self.client.post(
+            reverse("detection:run_yolo"), data=buf.tobytes(), content_type="image/jpeg"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["fall"])
+
+    def test_multipart_image_part_is_accepted(self):
+        _, buf = cv2.imencode(".jpg", blank_frame())
+        upload = SimpleUploadedFile("frame.jpg", buf.tobytes(), content_type="image/jpeg")
+        response = self.client.post(reverse("detection:run_yolo"), data={"image": upload})
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_undecodable_body_is_rejected(self):
+        response = self.client.post(
+            reverse("detection:run_yolo"), data=b"not a jpeg", content_type="image/jpeg"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.model.calls, 0)
+
+    def test_every_person_on_the_floor_gets_a_track(self):
+        from .tracking import tracker_registry
+        self.model.boxes = FakeBoxes(
+            [[10, 10, 40, 30], [100, 100, 160, 130]], [0, 0], [0.9, 0.8]
+        )
+        camera = tracker_registry.get("live_camera")
+
+        data = self.post_frame().json()
+
+        self.assertEqual(len(data["tracks"]), 2)
+        self.assertEqual(len({t["track_id"] for t in data["tracks"]}), 2)
+        self.assertEqual(len(camera.person_states), 2)
+
+    def test_repeated_sightings_write_one_alert(self):
+        for _ in range(3):
+            self.assertEqual(self.post_frame().status_code, 200)
+
+        self.assertEqual(FallAlert.objects.filter(detected_by="live_camera").count(), 1)
+
+    def test_every_sighting_is_recorded_as_an_observation(self):
+        from .views import observation_recorder
+        for _ in range(3):
+            self.post_frame()
+        observation_recorder.flush()
+
+        alert = FallAlert.objects.get(detected_by="live_camera")
+        samples = list(alert.observations.all())
+        self.assertEqual(len(samples), 3)
+        self.assertEqual(samples[0].bbox, (10, 10, 40, 30))
+
+        self.client.force_login(get_user_model().objects.create(username="nurse"))
+        response = self.client.get(reverse("detection:alert_observations", args=[alert.pk]))
+        self.assertEqual(response.status_code, 200)
+        series = response.json()["observations"]
+        self.assertEqual(len(series), 3)
+        self.assertEqual(series[0]["bbox"], [10, 10, 40, 30])
+
+    def test_static_frames_skip_inference_but_keep_escalating(self):
+        from .tracking import tracker_registry
+        from .views import live_pipeline
+        if live_pipeline.motion is None:
+            self.skipTest("Motion gate disabled")
+
+        self.assertEqual(self.post_frame().json()["fall_state"], "monitoring")
+        # The person has now been lying still for 40 s
+        tracker = tracker_registry.get("live_camera")
+        with tracker.transaction():
+            for state in tracker.person_states.values():
+                state.first_detected -= 40
+        response = self.post_frame().json()
+
+        self.assertEqual(self.model.calls, 1)
+        self.assertTrue(response["fall"])
+        self.assertEqual(response["fall_state"], "urgent")
+
+    def test_live_frame_costs_one_forward_pass(self):
+        response = self.post_frame()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["fall"])
+        self.assertEqual(self.model.calls, 1)
+        self.assertEqual(FallAlert.objects.filter(detected_by="live_camera").count(), 1)
+
+
+class SlowPipeline:
+    """Pipeline stand-in that takes a while per frame, to exercise backpressure."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.frames = 0
+
+    def process(self, img):
+        import time
+        time.sleep(self.delay)
+        self.frames += 1
+        return {"fall": False}
+
+
+class DetectionStreamConsumerTests(SimpleTestCase):
+    def run_session(self, consumer, messages, gap=0.05, headers=()):
+        sent = []
+
+        async def session():
+            inbox = asyncio.Queue()
+
+            async def receive():
+                return await inbox.get()
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "websocket", "headers": list(headers)}
+            task = asyncio.create_task(consumer(scope, receive, send))
+            for message in messages:
+                await inbox.put(message)
+                await asyncio.sleep(gap)
+            await asyncio.wait_for(task, timeout=5)
+
+        asyncio.run(session())
+        return sent
+
+    def test_unauthenticated_socket_is_closed(self):
+        sent = self.run_session(DetectionStreamConsumer(SlowPipeline()), [{"type": "websocket.connect"}])
+
+        self.assertEqual(sent, [{"type": "websocket.close", "code": 4401}])
+
+    def test_cross_site_origin_is_refused_before_authentication(self):
+        headers = [(b"host", b"ward.example.com"), (b"origin", b"https://evil.example.net")]
+        with mock.patch.object(DetectionStreamConsumer, "authenticate", return_value=True) as auth:
+            sent = self.run_session(
+                DetectionStreamConsumer(SlowPipeline()), [{"type": "websocket.connect"}], headers=headers
+            )
+
+        self.assertEqual(sent, [{"type": "websocket.close", "code": 4403}])
+        auth.assert_not_called()
+
+    @override_settings(CSRF_TRUSTED_ORIGINS=["https://*.example.org"])
+    def test_same_host_and_trusted_origins_are_allowed(self):
+        consumer = DetectionStreamConsumer(SlowPipeline())
+        for host, origin in (
+            (b"ward.example.com", b"https://ward.example.com"),
+            (b"ward.example.com", b"https://nurses.example.org"),
+        ):
+            with self.subTest(origin=origin):
+                scope = {"headers": [(b"host", host), (b"origin", origin)]}
+                self.assertTrue(consumer.origin_allowed(scope))
+        self.assertFalse(consumer.origin_allowed({"headers": [(b"host", b"a"), (b"origin", b"null")]}))
+
+    def test_stale_frames_are_dropped_not_queued(self):
+        pipeline = SlowPipeline(delay=0.3)
+        consumer = DetectionStreamConsumer(pipeline)
+        _, buf = cv2.imencode(".jpg", blank_frame())
+        frame = {"type": "websocket.receive", "bytes": buf.tobytes()}
+
+        with mock.patch.object(DetectionStreamConsumer, "authenticate", return_value=True):
+            sent = self.run_session(
+                consumer,
+                [{"type": "websocket.connect"}, frame, frame, frame, {"type": "websocket.disconnect"}],
+            )
+
+        self.assertEqual(sent[0], {"type": "websocket.accept"})
+        results = [json.loads(m["text"]) for m in sent[1:]]
+        self.assertEqual(pipeline.frames, 2)
+        self.assertEqual(results[-1]["frames_received"], 3)
+        self.assertEqual(results[-1]["frames_dropped"], 1)
+
+
+def write_video(path, frames=30, fps=30.0, size=(64, 48)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, size)
+    for i in range(frames):
+        frame = np.full((size[1], size[0], 3), i * 8 % 255, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class CameraWorkerPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def test_video_files_stand_in_for_rtsp_cameras(self):
+        seen = []
+        readers = {
+            cid: CameraReader(cid, write_video(f"{self.tmpdir}/{cid}.avi"))
+            for cid in ("room_1", "room_2")
+        }
+        pool = CameraWorkerPool(readers, lambda img, cid: seen.append(cid) or {"fall": False})
+
+        pool.run(duration=10)
+
+        self.assertEqual(set(seen), {"room_1", "room_2"})
+        for metrics in pool.metrics().values():
+            self.assertEqual(metrics["frames_read"], 30)
+            self.assertGreater(metrics["frames_processed"], 0)
+
+    def test_slow_inference_skips_frames_instead_of_queueing(self):
+        import time
+        reader = CameraReader("room_1", write_video(f"{self.tmpdir}/room_1.avi", frames=60), realtime=True)
+
+        def slow(img, cid):
+            time.sleep(0.2)
+            return {"fall": False}
+
+        pool = CameraWorkerPool({"room_1": reader}, slow, workers=1)
+        pool.run(duration=10)
+
+        metrics = pool.metrics()["room_1"]
+        self.assertEqual(metrics["frames_read"], 60)
+        self.assertGreater(metrics["frames_skipped"], 0)
+        self.assertLess(metrics["frames_processed"], 60)
+        self.assertEqual(metrics["frames_processed"] + metrics["frames_skipped"], 60)
+
+    def test_rate_controller_paces_quiet_cameras(self):
+        reader = CameraReader("room_1", write_video(f"{self.tmpdir}/room_1.avi", frames=30), realtime=True)
+        rate = RateController(idle_fps=2.0)
+        pool = CameraWorkerPool({"room_1": reader}, lambda img, cid: {"fall": False, "people": 0},
+                                rate=rate)
+        pool.run(duration=10)
+
+        metrics = pool.metrics()["room_1"]
+        self.assertLessEqual(metrics["frames_processed"], 4)  # ~1 s of video at 2 fps
+        self.assertEqual(metrics["tier"], IDLE)
+
+    def test_failing_camera_backs_off(self):
+        reader = CameraReader("room_1", write_video(f"{self.tmpdir}/room_1.avi", frames=15), realtime=True)
+
+        def failing(img, cid):
+            raise RuntimeError("model unavailable")
+
+        pool = CameraWorkerPool({"room_1": reader}, failing, rate=RateController(idle_fps=30.0))
+        with self.assertLogs("detection.cameras", "ERROR"):
+            pool.run(duration=10)
+
+        self.assertLessEqual(pool.metrics()["room_1"]["errors"], 2)  # 0.5 s of video at 30 fps, one retry per second
+
+
+class RateControllerTests(SimpleTestCase):
+    def test_tier_follows_activity(self):
+        rate = RateController(idle_fps=0.5, presence_fps=2.0, active_fps=8.0, quiet_seconds=15)
+
+        self.assertTrue(rate.due("room_1", now=0))
+        self.assertEqual(rate.update("room_1", {"fall": False, "people": 0}, now=0), IDLE)
+        self.assertFalse(rate.due("room_1", now=1.9))
+        self.assertTrue(rate.due("room_1", now=2.0))
+
+        self.assertEqual(rate.update("room_1", {"fall": False, "people": 1}, now=2), PRESENCE)
+        self.assertEqual(rate.update("room_1", {"fall": False, "people": 0}, now=10), PRESENCE)
+        self.assertEqual(rate.update("room_1", {"fall": True, "fall_state": "alert"}, now=11), ACTIVE)
+        self.assertTrue(rate.due("room_1", now=11.125))
+        self.assertEqual(rate.update("room_1", {"fall": False, "people": 0}, now=30), IDLE)
+
+    def test_cpu_budget_serves_active_cameras_first(self):
+        rate = RateController(idle_fps=0.5, presence_fps=2.0, active_fps=8.0, cpu_budget=1.0)
+        rate.update("room_1", {"fall": True}, cost=0.1, now=0)   # 10 frames/s fit the budget
+        rate.update("room_2", {"people": 1}, now=0)
+        rate.update("room_3", {"people": 1}, now=0)
+
+        rates = rate.rates()
+        self.assertEqual(rates["room_1"], 8.0)
+        self.assertAlmostEqual(rates["room_2"], 1.0)
+        self.assertAlmostEqual(rates["room_3"], 1.0)
+        self.assertAlmostEqual(rate.metrics()["cpu_used"], 1.0)
+
+
+class AssociationTests(SimpleTestCase):
+    def test_iou_matrix(self):
+        a = np.array([[0, 0, 10, 10]])
+        b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+
+        np.testing.assert_allclose(iou_matrix(a, b), [[1.0, 1 / 3, 0.0]])
+
+    def test_detections_follow_their_tracks_in_any_order(self):
+        tracks = np.array([[0, 0, 100, 50], [300, 300, 400, 350]])
+        dets = np.array([[305, 302, 404, 352], [2, 1, 101, 52], [600, 10, 640, 40]])
+
+        self.assertEqual(associate(tracks, dets).tolist(), [1, 0, -1])
+
+    def test_centroid_fallback_when_boxes_no_longer_overlap(self):
+        tracks = np.array([[0, 0, 20, 20]])
+        dets = np.array([[30, 0, 50, 20]])
+
+        self.assertEqual(associate(tracks, dets, max_distance=40).tolist(), [0])
+        self.assertEqual(associate(tracks, dets, max_distance=20).tolist(), [-1])
+
+    def test_tracker_keeps_one_track_per_person(self):
+        tracker = FallTracker()
+        first = tracker.update_frame(np.array([[0, 0, 100, 50], [300, 300, 400, 350]]))
+        second = tracker.update_frame(np.array([[301, 300, 401, 350], [1, 0, 101, 50]]))
+
+        self.assertEqual(len(tracker.person_states), 2)
+        self.assertEqual([pid for pid, _, _ in second], [first[1][0], first[0][0]])
+
+    def test_batched_update_keeps_cameras_apart(self):
+        registry = TrackerRegistry()
+        box = np.array([[0, 0, 100, 50]])
+        registry.update_many({"room_1": box, "room_2": box})
+        updates = registry.update_many({"room_1": box, "room_2": np.zeros((0, 4))})
+
+        self.assertEqual(len(updates["room_1"]), 1)
+        self.assertEqual(updates["room_2"], [])
+        self.assertEqual(len(registry.get("room_1").person_states), 1)
+        self.assertEqual(len(registry.get("room_2").person_states), 1)
+
+
+class CacheStateBackendTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def worker_tracker(self):
+        """A tracker as a separate worker process would build it."""
+        return FallTracker(backend=CacheStateBackend(prefix="test_tracker"), key="room_1")
+
+    def test_workers_share_tracks_and_timers(self):
+        worker_a, worker_b = self.worker_tracker(), self.worker_tracker()
+        box = np.array([[0, 0, 100, 50]])
+
+        with worker_a.transaction():
+            (first_id, _, _), = worker_a.update_frame(box)
+        with worker_b.transaction():
+            (second_id, _, _), = worker_b.update_frame(box + 2)
+
+        self.assertEqual(first_id, second_id)
+        with worker_a.transaction():
+            state = worker_a.person_states[first_id]
+        self.assertEqual(state.last_bbox, (2, 2, 102, 52))
+
+    def test_concurrent_updates_are_serialized(self):
+        import threading
+        box = np.array([[0, 0, 100, 50]])
+        with self.worker_tracker().transaction() as tracker:
+            tracker.update_frame(box)
+
+        def hammer():
+            tracker = self.worker_tracker()
+            for _ in range(20):
+                with tracker.transaction():
+                    pid = next(iter(tracker.person_states))
+                    tracker.person_states[pid].missed_detections += 1
+
+        threads = [threading.Thread(target=hammer) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        with self.worker_tracker().transaction() as tracker:
+            state = next(iter(tracker.person_states.values()))
+        self.assertEqual(state.missed_detections, 80)
+
+    def test_live_holder_keeps_its_lock_past_the_timeout(self):
+        holder = CacheStateBackend(prefix="test_tracker", lock_timeout=0.3)
+        waiter = CacheStateBackend(prefix="test_tracker", lock_timeout=0.3, wait_timeout=5.0)
+        acquired, released = threading.Event(), []
+
+        def hold():
+            with holder.locked("room_1"):
+                acquired.set()
+                time.sleep(1.0)   # Over three lock lifetimes
+                released.append(time.monotonic())
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        acquired.wait(5)
+        with waiter.locked("room_1"):
+            taken = time.monotonic()
+        thread.join()
+
+        self.assertGreaterEqual(taken, released[0])
+
+    def test_waiting_for_a_held_lock_times_out(self):
+        holder = CacheStateBackend(prefix="test_tracker", lock_timeout=5.0)
+        waiter = CacheStateBackend(prefix="test_tracker", wait_timeout=0.05)
+        with holder.locked("room_1"):
+            with self.assertRaises(TimeoutError):
+                with waiter.locked("room_1"):
+                    pass
+        with waiter.locked("room_1"):   # Released by the holder
+            pass
+
+
+class AlertWriterTests(SimpleTestCase):
+    def event(self):
+        return AlertEvent("room_1", blank_frame(), 0.9, "monitoring", 0.0)
+
+    def test_events_are_written_off_the_caller_thread(self):
+        import threading
+        threads = []
+        writer = AlertWriter(lambda event: threads.append(threading.current_thread().name))
+        self.addCleanup(writer.close)
+
+        self.assertTrue(writer.submit(self.event()))
+        writer.flush()
+
+        self.assertEqual(threads, ["alert-writer"])
+        self.assertEqual(writer.metrics()["written"], 1)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        import threading
+        release = threading.Event()
+        writer = AlertWriter(lambda event: release.wait(5), maxsize=2)
+        self.addCleanup(writer.close)
+
+        accepted = [writer.submit(self.event()) for _ in range(6)]
+        release.set()
+        writer.flush()
+
+        metrics = writer.metrics()
+        self.assertIn(False, accepted)
+        self.assertEqual(metrics["dropped"], accepted.count(False))
+        self.assertEqual(metrics["written"] + metrics["dropped"], 6)
+        self.assertLessEqual(metrics["max_queue_depth"], 2)
+
+
+class EncodingTests(TempMediaRootMixin, TestCase):
+    def test_encode_jpeg_downscales_wide_frames(self):
+        data = encode_jpeg(blank_frame(640, 480), quality=70, max_width=320)
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(image.shape[:2], (240, 320))
+
+    def test_save_clip_writes_into_the_file_field(self):
+        alert = FallAlert.objects.create(detected_by="room_1")
+        frames = (blank_frame() for _ in range(10))
+
+        written = save_clip(alert.video_clip, frames, fps=10.0, filename="clip.mp4")
+
+        self.assertEqual(written, 10)
+        self.assertTrue(alert.video_clip.name.endswith(".mp4"))
+        self.assertGreater(alert.video_clip.size, 0)
+
+    def test_save_clip_without_frames_stores_nothing(self):
+        alert = FallAlert.objects.create(detected_by="room_1")
+        self.assertEqual(save_clip(alert.video_clip, iter(()), fps=10.0), 0)
+        self.assertFalse(alert.video_clip)
+
+
+class FrameRingBufferTests(SimpleTestCase):
+    def test_old_frames_are_evicted(self):
+        buffer = FrameRingBuffer(max_seconds=2.0)
+        for ts in range(10):
+            buffer.append(blank_frame(), timestamp=100.0 + ts)
+
+        self.assertEqual([ts for ts, _ in buffer.window(0, 1e9)], [107.0, 108.0, 109.0])
+        self.assertEqual(buffer.metrics()["frames_evicted"], 7)
+
+    def test_memory_never_exceeds_the_cap(self):
+        frame_bytes = len(encode_jpeg(blank_frame(), quality=70))
+        buffer = FrameRingBuffer(max_seconds=60.0, max_bytes=frame_bytes * 4)
+        for ts in range(20):
+            buffer.append(blank_frame(), timestamp=float(ts))
+
+        self.assertLessEqual(buffer.nbytes, frame_bytes * 4)
+        self.assertEqual(len(buffer), 4)
+
+    def test_append_does_not_encode(self):
+        buffer = FrameRingBuffer(max_seconds=60.0)
+        with mock.patch("detection.framebuffer.encode_jpeg", wraps=encode_jpeg) as encode:
+            for ts in range(5):
+                buffer.append(blank_frame(), timestamp=float(ts))
+            self.assertEqual(encode.call_count, 0)
+            self.assertEqual(buffer.staged, 5)
+
+            self.assertEqual(len(buffer.window(0, 1e9)), 5)  # Reads encode what is still staged
+        self.assertEqual(encode.call_count, 5)
+        self.assertEqual(buffer.staged, 0)
+
+    def test_staged_frames_are_bounded(self):
+        buffer = FrameRingBuffer(max_seconds=60.0, max_staged=3)
+        for ts in range(5):
+            buffer.append(blank_frame(), timestamp=float(ts))
+
+        self.assertEqual([ts for ts, _ in buffer.window(0, 1e9)], [2.0, 3.0, 4.0])
+        self.assertEqual(buffer.metrics()["frames_dropped"], 2)
+
+    def test_registry_encodes_on_its_own_thread(self):
+        buffers = FrameBufferRegistry(max_seconds=60.0)
+        buffers.append("room_1", blank_frame(), timestamp=1.0)
+
+        deadline = time.monotonic() + 5.0
+        while buffers.get("room_1").staged and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(buffers.get("room_1").staged, 0)
+        self.assertEqual(buffers.metrics()["cameras"]["room_1"]["frames"], 1)
+
+
+class ClipRecorderTests(TempMediaRootMixin, TestCase):
+    def test_clip_covers_the_seconds_around_the_fall(self):
+        recorder = ClipRecorder(FrameBufferRegistry(max_seconds=30.0), pre_seconds=2.0, post_seconds=1.0)
+        alert = FallAlert.objects.create(detected_by="room_1")
+        for i in range(50):  # 10 fps from t=100 to t=104.9
+            recorder.buffers.append("room_1", blank_frame(), timestamp=100.0 + i / 10)
+
+        recorder.schedule(alert.pk, "room_1", timestamp=103.0)
+        self.assertEqual(recorder.due(now=103.5), [])
+        clips = recorder.due(now=104.5)
+
+        self.assertEqual(len(clips), 1)
+        self.assertTrue(recorder.write(clips[0]))
+        alert.refresh_from_db()
+        self.assertTrue(alert.video_clip.name.endswith(".mp4"))
+        cap = cv2.VideoCapture(alert.video_clip.path)
+        self.assertEqual(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 31)  # t=101.0 .. 104.0
+        cap.release()
+
+    def test_buffers_shorter_than_the_clip_and_writer_margin_are_refused(self):
+        with self.assertRaises(ValueError):
+            ClipRecorder(FrameBufferRegistry(max_seconds=10.0), pre_seconds=5.0, post_seconds=5.0)
+
+    @override_settings(FRAME_BUFFER_SECONDS=10.0, CLIP_PRE_SECONDS=5.0, CLIP_POST_SECONDS=5.0)
+    def test_buffer_length_from_settings_covers_the_clip(self):
+        from .framebuffer import CLIP_WRITE_MARGIN, buffers_from_settings
+        buffers = buffers_from_settings()
+
+        self.assertEqual(buffers.buffer_kwargs["max_seconds"], 10.0 + CLIP_WRITE_MARGIN)
+        ClipRecorder(buffers, pre_seconds=5.0, post_seconds=5.0)
+
+    def test_writer_tick_writes_due_clips_without_new_frames(self):
+        from .pipeline import LiveDetectionPipeline
+        recorder = ClipRecorder(FrameBufferRegistry(max_seconds=30.0), pre_seconds=1.0, post_seconds=0.5)
+        pipeline = LiveDetectionPipeline(scheduler=None, clips=recorder)
+        alert = FallAlert.objects.create(detected_by="room_1")
+        now = time.time()
+        for i in range(20):  # The camera stopped sending frames 0.1 s ago
+            recorder.buffers.append("room_1", blank_frame(), timestamp=now - 2.0 + i / 10)
+        recorder.schedule(alert.pk, "room_1", timestamp=now - 1.0)
+
+        pipeline.tick()
+
+        alert.refresh_from_db()
+        self.assertTrue(alert.video_clip.name.endswith(".mp4"))
+        self.assertEqual(recorder.metrics()["pending"], 0)
+
+    def test_clip_refused_by_a_full_writer_is_retried(self):
+        from .pipeline import LiveDetectionPipeline
+        recorder = ClipRecorder(FrameBufferRegistry(max_seconds=30.0), pre_seconds=1.0, post_seconds=0.5)
+        writer = mock.Mock()
+        writer.submit.return_value = False
+        pipeline = LiveDetectionPipeline(scheduler=None, writer=writer, clips=recorder)
+        alert = FallAlert.objects.create(detected_by="room_1")
+        now = time.time()
+        for i in range(20):
+            recorder.buffers.append("room_1", blank_frame(), timestamp=now - 2.0 + i / 10)
+        recorder.schedule(alert.pk, "room_1", timestamp=now - 1.0)
+
+        for clip in recorder.due():
+            pipeline.submit(clip)
+        self.assertEqual(recorder.metrics()["pending"], 1)
+        self.assertEqual(recorder.metrics()["requeued"], 1)
+
+        pipeline.tick()
+
+        alert.refresh_from_db()
+        self.assertTrue(alert.video_clip.name.endswith(".mp4"))
+        self.assertEqual(recorder.metrics()["pending"], 0)
+
+    def test_writer_tick_closes_incidents_of_people_no_longer_seen(self):
+        from .pipeline import LiveDetectionPipeline
+        pipeline = LiveDetectionPipeline(scheduler=None, incident_ttl=30.0)
+        handler = RecordingHandler()
+        pipeline.incidents = IncidentEngine(handler, ttl=30.0, backend=InMemoryStateBackend())
+        pipeline.incidents.observe(Observation("room_1", "person_1", "alert", timestamp=time.time() - 60))
+
+        pipeline.tick()
+
+        self.assertEqual(handler.calls, [("open", "alert"), ("close", None)])
+        self.assertEqual(pipeline.incidents.open_incidents("room_1"), {})
+
+    def event(self, state, **fields):
+        return AlertEvent("room_1", blank_frame(), 0.9, state, 1.0, track_id="person_1", **fields)
+
+    def test_incident_of_a_deleted_alert_reopens_on_escalation(self):
+        from .pipeline import LiveDetectionPipeline
+        pipeline = LiveDetectionPipeline(scheduler=None)
+        pipeline.incidents.backend = InMemoryStateBackend()
+        pipeline.write_event(self.event("monitoring"))
+        FallAlert.objects.all().delete()
+
+        pipeline.write_event(self.event("alert"))
+
+        alert = FallAlert.objects.get()
+        self.assertEqual(alert.fall_state, "alert")
+        self.assertEqual(pipeline.incidents.open_incidents("room_1")["person_1"].alert_id, alert.pk)
+
+    def test_incident_of_a_deleted_alert_reopens_after_its_samples_failed(self):
+        from .pipeline import LiveDetectionPipeline
+        pipeline = LiveDetectionPipeline(scheduler=None, observations=ObservationRecorder(max_delay=0))
+        pipeline.incidents.backend = InMemoryStateBackend()
+        pipeline.write_event(self.event("monitoring"))
+        FallAlert.objects.all().delete()
+        pipeline.write_event(self.event("monitoring"))   # Deduplicated into the deleted alert
+
+        with mock.patch.object(FallObservation.objects, "bulk_create",
+                               side_effect=[IntegrityError("FOREIGN KEY constraint failed"), []]):
+            pipeline.tick()
+        pipeline.write_event(self.event("monitoring"))
+
+        self.assertEqual(FallAlert.objects.count(), 1)
+        self.assertEqual(
+            pipeline.incidents.open_incidents("room_1")["person_1"].alert_id, FallAlert.objects.get().pk
+        )
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+
+    def create_alert(self, hours_ago=0, **fields):
+        alert = FallAlert.objects.create(**fields)
+        timestamp = self.now - datetime.timedelta(hours=hours_ago)
+        FallAlert.objects.filter(pk=alert.pk).update(timestamp=timestamp)
+        return alert
+
+    def test_statistics_are_aggregated_in_the_database(self):
+        from .rollups import rebuild_alert_rollups
+        self.create_alert(detected_by="room_1", fall_state="urgent")
+        self.create_alert(detected_by="room_1", acknowledged=True,
+                          acknowledged_at=self.now + datetime.timedelta(seconds=90), is_accurate=True)
+        self.create_alert(hours_ago=30, detected_by="room_2", is_accurate=False)
+        self.create_alert(detected_by="test_upload")
+        rebuild_alert_rollups()  # Timestamps were moved with update(), which sends no signal
+
+        with self.assertNumQueries(5):
+            stats = compute_dashboard_stats(self.now)
+
+        self.assertEqual(stats["total_alerts"], 4)
+        self.assertEqual(stats["pending_alerts"], 3)
+        self.assertEqual(stats["urgent_alerts"], 1)
+        self.assertAlmostEqual(stats["response_rate"], 100 / 3)
+        self.assertEqual(stats["model_accuracy"], 50)
+        self.assertEqual(stats["avg_response_time"], "1m 30s")
+        self.assertEqual(sum(day["count"] for day in stats["weekly_activity"]), 4)
+        self.assertEqual(stats["detection_sources"][0], {
+            "detected_by": "room_1", "count": 2, "percentage": 50.0,
+        })
+
+    def test_cached_until_an_alert_changes(self):
+        alert = self.create_alert(detected_by="room_1")
+        self.assertEqual(get_dashboard_stats()["pending_alerts"], 1)
+
+        with self.assertNumQueries(0):
+            get_dashboard_stats()
+
+        alert.mark_acknowledged(get_user_model().objects.create(username="nurse"))
+        self.assertEqual(get_dashboard_stats()["pending_alerts"], 0)
+
+
+class AlertRollupTests(TestCase):
+    def rollups(self):
+        return {
+            (r.detected_by, r.fall_state): (r.count, r.acknowledged_count, r.accurate_count)
+            for r in AlertRollup.objects.all()
+        }
+
+    def test_rollups_follow_alert_changes(self):
+        user = get_user_model().objects.create(username="nurse")
+        alert = FallAlert.objects.create(detected_by="room_1", fall_state="monitoring")
+        FallAlert.objects.create(detected_by="room_2")
+        self.assertEqual(self.rollups(), {
+            ("room_1", "monitoring"): (1, 0, 0), ("room_2", ""): (1, 0, 0),
+        })
+
+        alert.fall_state = "urgent"
+        alert.save()
+        alert = FallAlert.objects.get(pk=alert.pk)
+        alert.mark_acknowledged(user)
+        alert.mark_accuracy(user, True)
+
+        self.assertEqual(self.rollups(), {
+            ("room_1", "monitoring"): (0, 0, 0),
+            ("room_1", "urgent"): (1, 1, 1),
+            ("room_2", ""): (1, 0, 0),
+        })
+        bucket = AlertRollup.objects.get(fall_state="urgent")
+        self.assertEqual(bucket.response_count, 1)
+        self.assertGreaterEqual(bucket.response_seconds, 0)
+
+        alert.delete()
+        self.assertEqual(self.rollups()[("room_1", "urgent")], (0, 0, 0))
+
+    def test_acknowledging_a_stale_instance_keeps_the_escalation(self):
+        user = get_user_model().objects.create(username="nurse")
+        alert = FallAlert.objects.create(detected_by="room_1", fall_state="monitoring")
+        stale = FallAlert.objects.get(pk=alert.pk)
+        escalated = FallAlert.objects.get(pk=alert.pk)   # The alert writer, meanwhile
+        escalated.fall_state = "urgent"
+        escalated.save(update_fields=["fall_state"])
+
+        stale.mark_acknowledged(user)
+
+        alert.refresh_from_db()
+        self.assertEqual((alert.fall_state, alert.acknowledged), ("urgent", True))
+        self.assertEqual(self.rollups(), {
+            ("room_1", "monitoring"): (0, 0, 0),
+            ("room_1", "urgent"): (1, 1, 0),
+        })
+
+    def test_unchanged_save_does_not_touch_rollups(self):
+        alert = FallAlert.objects.create(detected_by="room_1")
+        alert = FallAlert.objects.get(pk=alert.pk)
+        with self.assertNumQueries(1):
+            alert.save(update_fields=["description"])
+
+    def test_rebuild_matches_incremental_rollups(self):
+        from django.core.management import call_command
+        user = get_user_model().objects.create(username="nurse")
+        for i in range(5):
+            alert = FallAlert.objects.create(detected_by=f"room_{i % 2}", fall_state="alert")
+            if i % 2:
+                alert.mark_acknowledged(user)
+        incremental = self.rollups()
+
+        call_command("rebuild_alert_rollups", stdout=io.StringIO())
+
+        self.assertEqual(self.rollups(), incremental)
+
+
+class AlertRollupBackfillTests(TransactionTestCase):
+    migrate_from = [("detection", "0004_fallalert_fall_state_fallalert_time_on_ground")]
+    migrate_to = [("detection", "0005_alertrollup")]
+
+    def tearDown(self):
+        from django.core.management import call_command
+        call_command("migrate", verbosity=0)   # Back to the latest schema for the next tests
+
+    def test_existing_alerts_are_rolled_up_by_the_migration(self):
+        from django.db import connection
+        from django.db.migrations.executor import MigrationExecutor
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        old_alert = executor.loader.project_state(self.migrate_from).apps.get_model("detection", "FallAlert")
+        old_alert.objects.create(detected_by="room_1", fall_state="urgent", acknowledged=True)
+        old_alert.objects.create(detected_by="room_1", fall_state="urgent")
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+
+        rollup = executor.loader.project_state(self.migrate_to).apps.get_model("detection", "AlertRollup")
+        bucket = rollup.objects.get(detected_by="room_1", fall_state="urgent")
+        self.assertEqual((bucket.count, bucket.acknowledged_count), (2, 1))
+
+
+class FallAlertIndexTests(TestCase):
+    """EXPLAIN the hot FallAlert queries against a large synthetic table."""
+    ROWS = 20000
+
+    @classmethod
+    def setUpTestData(cls):
+        from django.db import connection
+        rng = np.random.default_rng(0)
+        start = timezone.now() - datetime.timedelta(days=365)
+        sources = [f"room_{i}" for i in range(40)] + ["live_camera", "test_upload"]
+        alerts = [
+            FallAlert(
+                timestamp=start + datetime.timedelta(minutes=int(minute)),
+                detected_by=sources[int(source)],
+                acknowledged=bool(minute < 500000),
+                is_accurate=True if i % 50 == 0 else None,
+                fall_state="alert",
+            )
+            for i, (minute, source) in enumerate(zip(
+                np.sort(rng.integers(0, 525600, cls.ROWS)), rng.integers(0, len(sources), cls.ROWS)
+            ))
+        ]
+        # Keep the synthetic timestamps (auto_now_add would overwrite them)
+        with mock.patch.object(FallAlert._meta.get_field("timestamp"), "auto_now_add", False):
+            FallAlert.objects.bulk_create(alerts, batch_size=2000)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, msg=f"{index_name} not used:\n{plan}")
+
+    def test_throttle_lookup_uses_source_index(self):
+        qs = FallAlert.objects.filter(detected_by="live_camera").order_by("-timestamp")[:1]
+        self.assertUsesIndex(qs, "fallalert_source_ts_idx")
+
+    def test_alert_list_date_filter_uses_timestamp_index(self):
+        day = timezone.now() - datetime.timedelta(days=10)
+        qs = FallAlert.objects.exclude(detected_by="test_upload").filter(
+            timestamp__gte=day, timestamp__lt=day + datetime.timedelta(days=1)
+        )
+        self.assertUsesIndex(qs, "fallalert_ts_idx")
+
+    def test_pending_alerts_use_partial_index(self):
+        qs = FallAlert.objects.filter(acknowledged=False).order_by("-timestamp")[:20]
+        self.assertUsesIndex(qs, "fallalert_pending_ts_idx")
+
+    def test_accuracy_review_uses_partial_index(self):
+        qs = FallAlert.objects.filter(is_accurate=False)
+        self.assertUsesIndex(qs, "fallalert_marked_idx")
+
+    def test_source_filter_uses_source_index(self):
+        qs = FallAlert.objects.filter(detected_by__in=["room_1", "room_2"])[:20]
+        self.assertUsesIndex(qs, "fallalert_source_ts_idx")
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(get_user_model().objects.create(username="nurse"))
+        start = timezone.now() - datetime.timedelta(hours=1)
+        alerts = [
+            # Pairs of alerts share a timestamp: the id breaks the tie
+            FallAlert(timestamp=start + datetime.timedelta(minutes=i // 2), detected_by=f"room_{i % 3}")
+            for i in range(45)
+        ]
+        with mock.patch.object(FallAlert._meta.get_field("timestamp"), "auto_now_add", False):
+            FallAlert.objects.bulk_create(alerts)
+        self.newest_first = list(FallAlert.objects.order_by("-timestamp", "-pk").values_list("pk", flat=True))
+
+    def test_cursor_pages_walk_every_alert_once(self):
+        seen, query = [], "cursor="
+        with self.assertNumQueries(4):  # session, user, page, source list (then cached)
+            response = self.client.get(f"{reverse('detection:alerts')}?{query}")
+        while True:
+            seen += [alert.pk for alert in response.context["alerts"]]
+            query = response.context["next_cursor_query"]
+            if not query:
+                break
+            response = self.client.get(f"{reverse('detection:alerts')}?{query}")
+
+        self.assertEqual(seen, self.newest_first)
+
+    def test_before_cursor_returns_the_previous_page(self):
+        first = self.client.get(reverse("detection:alerts"), {"cursor": ""}).context
+        second = self.client.get(f"{reverse('detection:alerts')}?{first['next_cursor_query']}").context
+        back = self.client.get(f"{reverse('detection:alerts')}?{second['previous_cursor_query']}").context
+
+        self.assertEqual([a.pk for a in back["alerts"]], [a.pk for a in first["alerts"]])
+        self.assertIsNone(back["previous_cursor_query"])
+
+    def test_feed_returns_alerts_newer_than_the_cursor(self):
+        url = reverse("detection:alerts_feed")
+        latest = self.client.get(url, {"limit": 5}).json()
+        self.assertEqual([a["id"] for a in latest["alerts"]], self.newest_first[:5][::-1])
+
+        self.assertEqual(self.client.get(url, {"since": latest["cursor"]}).json()["alerts"], [])
+        new = FallAlert.objects.create(detected_by="room_9")
+        data = self.client.get(url, {"since": latest["cursor"]}).json()
+
+        self.assertEqual([a["id"] for a in data["alerts"]], [new.pk])
+        self.assertFalse(data["has_more"])
+
+    def test_feed_resends_alerts_committed_behind_the_cursor(self):
+        url = reverse("detection:alerts_feed")
+        cursor = self.client.get(url, {"limit": 1}).json()["cursor"]
+        newest = FallAlert.objects.get(pk=self.newest_first[0])
+        # Stamped before the newest alert, committed only after the poll above
+        late = FallAlert.objects.create(detected_by="room_9")
+        FallAlert.objects.filter(pk=late.pk).update(timestamp=newest.timestamp - datetime.timedelta(seconds=2))
+
+        data = self.client.get(url, {"since": cursor}).json()
+
+        self.assertEqual([a["id"] for a in data["alerts"]], [late.pk])
+        self.assertEqual(data["cursor"], cursor)
+
+    def test_feed_rejects_a_malformed_cursor(self):
+        response = self.client.get(reverse("detection:alerts_feed"), {"since": "garbage"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_source_list_is_cached_until_a_new_source_appears(self):
+        from .stats import get_alert_sources
+        self.assertEqual(get_alert_sources(), ["room_0", "room_1", "room_2"])
+        with self.assertNumQueries(0):
+            get_alert_sources()
+
+        FallAlert.objects.create(detected_by="room_1")
+        with self.assertNumQueries(0):
+            get_alert_sources()
+
+        FallAlert.objects.create(detected_by="hall")
+        self.assertIn("hall", get_alert_sources())
+
+
+class AlertEventTests(TestCase):
+    def setUp(self):
+        from .events import alert_events
+        self.subscription = alert_events.subscribe()
+        self.addCleanup(self.subscription.close)
+
+    def received(self):
+        events = []
+        while (event := self.subscription.get(timeout=0)) is not None:
+            events.append((event.type, event.data["fall_state"]))
+        return events
+
+    def test_new_escalated_and_acknowledged_alerts_are_published(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            alert = FallAlert.objects.create(detected_by="room_1", fall_state="monitoring")
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.time_on_ground = 3.0
+            alert.save()                       # No state change: nothing published
+            alert.fall_state = "urgent"
+            alert.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            alert.mark_acknowledged(get_user_model().objects.create(username="nurse"))
+
+        self.assertEqual(self.received(), [
+            ("alert.created", "monitoring"),
+            ("alert.escalated", "urgent"),
+            ("alert.acknowledged", "urgent"),
+        ])
+
+    def test_nothing_is_published_for_a_rolled_back_alert(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            FallAlert.objects.create(detected_by="room_1")
+        self.assertEqual(self.received(), [])
+
+    def test_async_subscriber_is_woken_from_another_thread(self):
+        import threading
+        from .events import AlertNotification, EventBroker
+        broker = EventBroker()
+        subscription = broker.subscribe()
+
+        async def wait_for_event():
+            await subscription.aget(timeout=0.01)   # Binds the loop
+            threading.Timer(0.05, broker.publish, [AlertNotification("alert.created", {})]).start()
+            return await subscription.aget(timeout=5)
+
+        event = asyncio.run(wait_for_event())
+        self.assertEqual(event.type, "alert.created")
+
+    async def open_stream(self, **headers):
+        user = await get_user_model().objects.acreate(username="nurse")
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get(reverse("detection:alert_events"), headers=headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        chunks = aiter(response.streaming_content)
+        self.assertEqual(await anext(chunks), b"retry: 3000\n\n")
+        return chunks
+
+    async def test_stream_replays_alerts_missed_since_last_event_id(self):
+        from .pagination import cursor_for
+        seen = await FallAlert.objects.acreate(detected_by="room_1")
+        missed = await FallAlert.objects.acreate(detected_by="room_2")
+
+        chunks = await self.open_stream(last_event_id=cursor_for(seen))
+        replayed = (await anext(chunks)).decode()
+        await chunks.aclose()
+
+        self.assertIn("event: alert.created", replayed)
+        self.assertIn(f'"id": {missed.pk}', replayed)
+
+    @override_settings(ALERT_EVENTS_POLL_SECS=0.05)
+    async def test_stream_polls_alerts_saved_by_other_processes(self):
+        chunks = await self.open_stream()
+        # bulk_create sends no signal: as if another process had saved the alert
+        await FallAlert.objects.abulk_create([FallAlert(detected_by="camera_worker")])
+        other = await FallAlert.objects.aget(detected_by="camera_worker")
+
+        polled = (await asyncio.wait_for(anext(chunks), timeout=5)).decode()
+        await chunks.aclose()
+
+        self.assertIn(f'"id": {other.pk}', polled)
+
+    def test_stream_is_refused_under_wsgi(self):
+        from .events import alert_events
+        self.client.force_login(get_user_model().objects.create(username="nurse"))
+        subscribers = alert_events.metrics()["subscribers"]
+
+        response = self.client.get(reverse("detection:alert_events"))
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(alert_events.metrics()["subscribers"], subscribers)
+
+    def test_unread_stream_holds_no_subscription(self):
+        from django.test import AsyncRequestFactory
+        from .events import alert_events
+        from .views import AlertEventStreamView
+        request = AsyncRequestFactory().get(reverse("detection:alert_events"))
+        request.user = get_user_model().objects.create(username="nurse")
+        subscribers = alert_events.metrics()["subscribers"]
+
+        response = AlertEventStreamView.as_view()(request)
+        response.close()
+
+        self.assertEqual(alert_events.metrics()["subscribers"], subscribers)
+
+    def test_relayed_events_reach_the_subscribers_of_every_process(self):
+        from .events import AlertNotification, EventBroker
+
+        class LoopbackRelay:
+            """Stands in for Redis pub/sub shared by two processes."""
+            def __init__(self):
+                self.listeners = []
+
+            def listen(self, deliver):
+                self.listeners.append(deliver)
+
+            def publish(self, event):
+                for deliver in self.listeners:
+                    deliver(AlertNotification(**json.loads(json.dumps(vars(event)))))
+
+        relay = LoopbackRelay()
+        web, camera_worker = EventBroker(relay=relay), EventBroker(relay=relay)
+        subscription = web.subscribe()
+
+        camera_worker.publish(AlertNotification("alert.created", {"id": 1}, id="c1"))
+
+        event = subscription.get(timeout=1)
+        self.assertEqual((event.type, event.data, event.id), ("alert.created", {"id": 1}, "c1"))
+
+
+class RecordingHandler(IncidentHandler):
+    def __init__(self):
+        self.calls = []
+
+    def open(self, observation):
+        self.calls.append(("open", observation.fall_state))
+        return len(self.calls)
+
+    def escalate(self, incident, observation):
+        self.calls.append(("escalate", incident.fall_state))
+
+    def close(self, incident, final_state):
+        self.calls.append(("close", final_state))
+
+
+class IncidentEngineTests(SimpleTestCase):
+    def setUp(self):
+        self.handler = RecordingHandler()
+        self.engine = IncidentEngine(self.handler, ttl=30.0, backend=InMemoryStateBackend())
+
+    def see(self, state, at, track="person_1"):
+        return self.engine.observe(Observation("room_1", track, state, timestamp=at))[0]
+
+    def test_only_transitions_reach_the_handler(self):
+        actions = [
+            self.see("monitoring", 0), self.see("monitoring", 1), self.see("alert", 2),
+            self.see("monitoring", 3), self.see("urgent", 4), self.see("urgent", 5),
+            self.see("recovered", 6),
+        ]
+
+        self.assertEqual(actions, [
+            "opened", "deduplicated", "escalated", "deduplicated", "escalated", "deduplicated", "closed",
+        ])
+        self.assertEqual(self.handler.calls, [
+            ("open", "monitoring"), ("escalate", "alert"), ("escalate", "urgent"), ("close", "recovered"),
+        ])
+
+    def test_incidents_are_kept_per_track_and_expire(self):
+        self.see("monitoring", 0, track="person_1")
+        self.see("monitoring", 1, track="person_2")
+        self.see("monitoring", 20, track="person_2")
+
+        self.assertEqual(self.see("monitoring", 40, track="person_1"), "opened")  # Expired at 30s
+        self.assertEqual(self.handler.calls.count(("close", None)), 1)
+        self.assertEqual(set(self.engine.open_incidents("room_1")), {"person_1", "person_2"})
+
+    def test_lost_alert_is_reopened_on_escalation(self):
+        self.see("monitoring", 0)
+        self.handler.escalate = mock.Mock(side_effect=IncidentLost(1))
+
+        self.assertEqual(self.see("alert", 1), "opened")
+        self.assertEqual(self.handler.calls, [("open", "monitoring"), ("open", "alert")])
+        self.assertEqual(self.engine.open_incidents("room_1")["person_1"].alert_id, 2)
+
+    def test_sweep_closes_incidents_of_cameras_without_sightings(self):
+        self.see("monitoring", 0)
+        self.engine.observe(Observation("room_2", "person_1", "monitoring", timestamp=20))
+
+        closed = self.engine.close_all_expired(now=40)
+
+        self.assertEqual([incident.alert_id for incident in closed], [1])
+        self.assertEqual(self.handler.calls.count(("close", None)), 1)
+        self.assertEqual(self.engine.open_incidents("room_1"), {})
+        self.assertEqual(set(self.engine.open_incidents("room_2")), {"person_1"})
+
+
+class OnnxBackendProcessingTests(SimpleTestCase):
+    """NumPy pre/post-processing of the ONNX backend against the Ultralytics implementation."""
+
+    def test_letterbox_matches_ultralytics(self):
+        from ultralytics.data.augment import LetterBox
+        image = np.random.default_rng(0).integers(0, 255, (300, 517, 3), dtype=np.uint8)
+
+        for auto in (False, True):
+            padded, _ = backends.letterbox(image, (640, 640), auto=auto)
+            expected = LetterBox((640, 640), auto=auto, stride=32)(image=image)
+            np.testing.assert_array_equal(padded, expected)
+
+    def test_postprocess_matches_ultralytics_nms(self):
+        import torch
+        try:
+            from ultralytics.utils.nms import non_max_suppression
+        except ImportError:  # ultralytics < 8.3.160
+            from ultralytics.utils.ops import non_max_suppression
+        from ultralytics.utils.ops import scale_boxes
+
+        rng = np.random.default_rng(0)
+        anchors = 200
+        centers = rng.uniform(50, 590, (2, anchors))
+        sizes = rng.uniform(10, 200, (2, anchors))
+        output = np.concatenate([centers, sizes, rng.uniform(0, 1, (3, anchors))]).astype(np.float32)[None]
+        _, lb = backends.letterbox(np.zeros((360, 640, 3), dtype=np.uint8), (640, 640))
+
+        xyxy, cls, conf = backends.postprocess(output, [lb])[0]
+        expected = non_max_suppression(torch.from_numpy(output), 0.25, 0.7)[0].numpy()
+        expected[:, :4] = scale_boxes((640, 640), expected[:, :4], (360, 640))
+
+        self.assertGreater(len(expected), 10)
+        np.testing.assert_allclose(xyxy, expected[:, :4], atol=1e-3)
+        np.testing.assert_array_equal(cls, expected[:, 5].astype(np.int64))
+        np.testing.assert_allclose(conf, expected[:, 4], atol=1e-6)
+
+
+@skipUnless(backends.onnxruntime_available(), "onnxruntime is not installed")
+@skipUnless(os.path.exists("model_dl/best.pt"), "model weights are not available")
+class OnnxBackendParityTests(SimpleTestCase):
+    """The ONNX export takes the same decisions as the PyTorch weights."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.mkdtemp()
+        weights = shutil.copy("model_dl/best.pt", cls.tmpdir)
+        cls.torch_service = FallDetectionService(weights, conf_threshold=0.7)
+        cls.onnx_service = FallDetectionService(weights, conf_threshold=0.7, backend="onnx")
+        rng = np.random.default_rng(0)
+        cls.frames = [cv2.imread(f"docs/screenshots/{name}") for name in (
+            "Test_view_Fall_Detected.png", "Test_View_No_fall_detected.png",
+        )] + [rng.integers(0, 255, (480, 640, 3), dtype=np.uint8)]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_network_outputs_match(self):
+        import torch
+        batch, _ = backends.preprocess(self.frames[-1:], (640, 640))
+        net = self.torch_service.model.model.float().eval()
+        with torch.no_grad():
+            expected = net(torch.from_numpy(batch))
+        expected = expected[0] if isinstance(expected, (list, tuple)) else expected
+        session = self.onnx_service.model
+        output = session.session.run(None, {session.input_name: batch})[0]
+
+        np.testing.assert_allclose(output, expected.numpy(), rtol=1e-3, atol=1e-2)
+
+    def test_same_fall_decisions(self):
+        from .benchmarks import compare_detections
+        reference = [self.torch_service.detect(frame) for frame in self.frames]
+        candidate = [self.onnx_service.detect(frame) for frame in self.frames]
+
+        parity = compare_detections(reference, candidate)
+        self.assertEqual(parity["same_decision"], len(self.frames))
+        self.assertEqual(parity["same_box_count"], len(self.frames))
+        self.assertLess(parity["max_box_diff_px"], 1.0)
+
+
+class ModelVariantTests(SimpleTestCase):
+    def test_variant_selects_backend_size_and_quantization(self):
+        with mock.patch("detection.services.load_model") as load_model:
+            service = FallDetectionService("weights.pt", variant="int8-416", threads=2)
+
+        load_model.assert_called_once_with("weights.pt", "onnx", imgsz=416, quantize="int8", threads=2)
+        self.assertEqual(service.backend, "onnx")
+        with self.assertRaises(ValueError):
+            FallDetectionService("weights.pt", variant="fp16-1280")
+
+    def test_onnx_export_is_made_at_640_and_moved_into_place(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        with open(f"{root}/best.pt", "wb") as f:
+            f.write(b"weights")
+        exports = []
+
+        class FakeYOLO:
+            def __init__(self, weights):
+                self.weights = weights
+
+            def export(self, **kwargs):
+                exports.append(kwargs)
+                assert not os.path.exists(f"{root}/best.onnx")  # Written elsewhere, then moved
+                path = os.path.splitext(self.weights)[0] + ".onnx"
+                with open(path, "wb") as f:
+                    f.write(b"onnx")
+                return path
+
+        with mock.patch("ultralytics.YOLO", FakeYOLO):
+            path = backends.onnx_path_for(f"{root}/best.pt")
+
+        self.assertEqual(path, f"{root}/best.onnx")
+        self.assertEqual(exports[0]["imgsz"], 640)
+        self.assertEqual(sorted(os.listdir(root)), ["best.onnx", "best.pt"])
+
+    def test_labeled_folder_evaluation(self):
+        from .benchmarks import evaluate_detector, load_labeled_frames
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        for label in ("fall", "no_fall"):
+            os.makedirs(f"{root}/{label}")
+            for i in range(2):
+                cv2.imwrite(f"{root}/{label}/{i}.png", blank_frame())
+        write_video(f"{root}/fall/clip.avi", frames=10)
+
+        frames, labels = load_labeled_frames(root, video_stride=5)
+        self.assertEqual(labels, [True] * 4 + [False] * 2)
+
+        # Detects a fall on every frame but the first fall image
+        decisions = iter([False, True, True, True, True, False])
+        report = evaluate_detector(
+            lambda frame: mock.Mock(fall=next(decisions)), frames, labels
+        )
+        self.assertEqual((report["tp"], report["fp"], report["fn"], report["tn"]), (3, 1, 1, 1))
+        self.assertEqual(report["precision"], 0.75)
+        self.assertEqual(report["recall"], 0.75)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def make_model(self):
+        return CountingModel(xyxy=[[10, 10, 40, 30]], cls=[0], conf=[0.9])
+
+    def test_lazy_service_loads_on_first_detection(self):
+        with mock.patch("detection.services.load_model", return_value=self.make_model()) as load_model:
+            service = FallDetectionService("weights.pt", lazy=True)
+            self.assertFalse(service.is_loaded)
+            load_model.assert_not_called()
+
+            self.assertTrue(service.detect(blank_frame()).fall)
+            service.detect(blank_frame())
+
+        load_model.assert_called_once_with("weights.pt", "ultralytics")
+        self.assertIsNotNone(service.load_seconds)
+
+    def test_prewarm_loads_and_times_every_service(self):
+        registry = ModelRegistry()
+        with mock.patch("detection.services.load_model", return_value=self.make_model()):
+            service = registry.register("fall", FallDetectionService(lazy=True))
+            self.assertFalse(registry.metrics()["fall"]["loaded"])
+            registry.prewarm().join(timeout=5)
+
+        metrics = registry.metrics()["fall"]
+        self.assertTrue(metrics["loaded"])
+        self.assertIsNotNone(metrics["load_seconds"])
+        self.assertIsNotNone(metrics["warmup_seconds"])
+        self.assertEqual(service.model.calls, 1)   # The warm-up inference
+
+    def test_importing_the_app_does_not_load_the_model(self):
+        code = (
+            "import sys, django; django.setup(); import detection.views, detection.pipeline as p; "
+            "print(p.fall_service.is_loaded, 'torch' in sys.modules, 'ultralytics' in sys.modules)"
+        )
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "backend.settings"}
+        out = subprocess.run(
+            [sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True
+        ).stdout
+        self.assertEqual(out.split()[-3:], ["False", "False", "False"])
+
+
+class InferenceServerTests(SimpleTestCase):
+    def setUp(self):
+        self.model = CountingModel(xyxy=[[10, 10, 40, 30], [0, 0, 5, 5]], cls=[0, 1], conf=[0.9, 0.95])
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.server = InferenceServer(make_service(self.model), f"{root}/inference.sock", window_ms=50)
+        self.server.bind()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.client = InferenceClient(self.server.path, timeout=5)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(self.client.close)
+
+    def test_remote_detection_matches_the_local_service(self):
+        local = make_service(CountingModel(xyxy=[[10, 10, 40, 30], [0, 0, 5, 5]], cls=[0, 1], conf=[0.9, 0.95]))
+        expected = local.detect(blank_frame())
+
+        detections = self.client.detect_batch([blank_frame(), blank_frame(), blank_frame()])
+
+        self.assertEqual(self.model.batch_sizes, [3])   # One model call for the whole request
+        for detection in detections:
+            self.assertTrue(detection.fall)
+            self.assertEqual(detection.confidence, expected.confidence)
+            np.testing.assert_array_equal(detection.boxes, expected.boxes)
+            np.testing.assert_array_equal(detection.class_ids, expected.class_ids)
+            self.assertEqual(detection.names, expected.names)
+
+    def test_frames_larger_than_the_buffer_get_a_new_one(self):
+        self.client.detect(blank_frame())
+        first = self.client._local.connection.shm.name
+
+        self.assertTrue(self.client.detect(blank_frame(1600, 1200)).fall)
+
+        self.assertNotEqual(self.client._local.connection.shm.name, first)
+        self.assertEqual(self.server.metrics()["frames_inferred"], 2)
+
+    def test_server_errors_are_raised_and_the_connection_survives(self):
+        with self.assertRaises(InferenceServerError):
+            self.client.detect(np.zeros((48, 64), dtype=np.uint8))   # Not a BGR frame
+        self.assertTrue(self.client.detect(blank_frame()).fall)
+
+    def test_timeouts_are_not_retried(self):
+        started = []
+
+        def slow(source, **kwargs):
+            started.append(source)
+            time.sleep(0.5)
+            return self.model(source, **kwargs)
+
+        client = InferenceClient(self.server.path, timeout=0.2)
+        self.addCleanup(client.close)
+        with mock.patch.object(self.server.scheduler.service, "_model", slow):
+            with self.assertRaises(TimeoutError):
+                client.detect(blank_frame())
+            time.sleep(0.6)
+
+        self.assertEqual(len(started), 1)
+
+    def test_connection_and_buffer_are_released_when_the_thread_ends(self):
+        names = []
+
+        def request():
+            self.client.detect(blank_frame())
+            names.append(self.client._local.connection.shm.name)
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+
+        self.assertEqual(self.client._connections, [])
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=names[0])
+
+    def test_socket_is_private_and_a_live_server_is_not_replaced(self):
+        self.assertEqual(stat.S_IMODE(os.stat(self.server.path).st_mode), 0o600)
+
+        second = InferenceServer(make_service(CountingModel()), self.server.path)
+        with self.assertRaises(OSError) as raised:
+            second.bind()
+
+        self.assertEqual(raised.exception.errno, errno.EADDRINUSE)
+        self.assertTrue(self.client.detect(blank_frame()).fall)
+
+    def test_stale_socket_is_replaced(self):
+        path = f"{os.path.dirname(self.server.path)}/stale.sock"
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()   # Left behind, nobody listening
+        server = InferenceServer(make_service(CountingModel()), path)
+
+        server.bind()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+
+        client = InferenceClient(path, timeout=5)
+        self.addCleanup(client.close)
+        self.assertEqual(client.ping()["frames"], 0)
+
+
+class VideoAnalysisTests(TempMediaRootMixin, TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+        # 40 s of footage at 2 fps
+        self.video = write_video(f"{self.tmpdir}/fall.avi", frames=80, fps=2.0)
+
+    def test_frames_are_sampled_with_their_video_timestamps(self):
+        frames = list(iter_video_frames(self.video, stride=3))
+
+        self.assertEqual([f.index for f in frames][:4], [0, 3, 6, 9])
+        self.assertEqual([f.timestamp for f in frames][:4], [0.0, 1.5, 3.0, 4.5])
+
+    def test_timeline_follows_video_time_not_wall_clock(self):
+        model = CountingModel(xyxy=[[10, 10, 40, 30]], cls=[0], conf=[0.9])
+        analyzer = VideoAnalyzer(make_service(model), stride=2, batch_size=4, workers=0)
+
+        analysis = analyzer.analyze(self.video)
+
+        self.assertEqual(analysis.frames, 40)
+        self.assertEqual(model.batch_sizes, [4] * 10)
+        self.assertEqual(len(analysis.timeline), 40)
+        self.assertEqual(analysis.timeline[5].state, "monitoring")
+        self.assertEqual(analysis.timeline[20].state, "alert")
+        self.assertEqual(analysis.timeline[35].state, "urgent")
+        self.assertEqual(analysis.max_state, "urgent")
+        self.assertEqual(analysis.confidence, np.float32(0.9))
+
+    def test_uploaded_video_is_analyzed_as_a_whole_by_a_job(self):
+        from . import pipeline, views
+        model = CountingModel(xyxy=[[10, 10, 40, 30]], cls=[0], conf=[0.9])
+        analyzer = VideoAnalyzer(make_service(model), stride=4, workers=0)
+        self.client.force_login(get_user_model().objects.create(username="nurse"))
+
+        with open(self.video, "rb") as f, \
+                mock.patch.object(pipeline, "video_analyzer", analyzer), \
+                mock.patch.object(views.job_queue, "backend", SynchronousJobBackend()), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("detection:test_detection"),
+                {"upload_file": SimpleUploadedFile("fall.avi", f.read(), content_type="video/x-msvideo")},
+            )
+
+        job = Job.objects.get(kind="analyze_upload")
+        self.assertRedirects(response, f"{reverse('detection:test_detection')}?job={job.pk}")
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertFalse(os.path.exists(f"{self.media_root}/{job.params['upload']}"))
+        alert = FallAlert.objects.get(detected_by="test_upload")
+        self.assertEqual(alert.fall_state, "urgent")
+        self.assertEqual(job.result["alert_id"], alert.pk)
+
+        page = self.client.get(response.url)
+        self.assertEqual(len(page.context["analysis"]["timeline"]), 40)
+        self.assertTrue(page.context["fall_detected"])
+
+    def test_cancelled_queued_analysis_deletes_its_upload(self):
+        from django.core.files.storage import default_storage
+        from django.core.files.base import ContentFile
+        upload = default_storage.save("job_uploads/fall.avi", ContentFile(b"video"))
+        queue = JobQueue(RecordingJobBackend())
+        job = queue.enqueue("analyze_upload", {"upload": upload, "name": "fall.avi"})
+
+        queue.cancel(job)
+
+        self.assertEqual(job.status, Job.CANCELLED)
+        self.assertFalse(default_storage.exists(upload))
+
+    @skipUnless(os.path.exists("model_dl/best.pt"), "model weights are not available")
+    def test_worker_pool_matches_in_process_inference(self):
+        service = FallDetectionService("model_dl/best.pt", lazy=True)
+        pooled = VideoAnalyzer(service, stride=8, batch_size=2, workers=1)
+        self.addCleanup(pooled.close)
+
+        remote = pooled.analyze(self.video)
+        local = VideoAnalyzer(service, stride=8, batch_size=2, workers=0).analyze(self.video)
+
+        self.assertEqual(remote.frames, local.frames)
+        self.assertEqual([s.state for s in remote.timeline], [s.state for s in local.timeline])
+        self.assertEqual([s.people for s in remote.timeline], [s.people for s in local.timeline])
+
+
+@job_registry.register("test_steps")
+def steps_job(ctx, steps=3, fail=False, cancel_at=None):
+    for step in range(steps):
+        if step == cancel_at:
+            Job.objects.filter(pk=ctx.job.pk).update(cancel_requested=True)
+        ctx.progress(step / steps, f"step {step}", force=True)
+    if fail:
+        raise RuntimeError("boom")
+    return {"steps": steps}
+
+
+class RecordingJobBackend:
+    """Job backend that only records the submitted jobs."""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, job_id):
+        self.submitted.append(job_id)
+
+    def metrics(self):
+        return {"backend": "recording"}
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.backend = RecordingJobBackend()
+        self.queue = JobQueue(self.backend)
+
+    def enqueue(self, **params):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.queue.enqueue("test_steps", params)
+
+    def test_job_runs_once_submitted_and_stores_its_result(self):
+        job = self.enqueue(steps=2)
+        self.assertEqual(self.backend.submitted, [job.pk])
+        self.assertEqual(job.status, Job.QUEUED)
+
+        job = run_job(job.pk)
+
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.progress, 1.0)
+        self.assertEqual(job.result, {"steps": 2})
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failures_are_recorded(self):
+        job = run_job(self.enqueue(fail=True).pk)
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn("boom", job.error)
+
+    def test_cancelled_queued_job_never_starts(self):
+        job = self.queue.cancel(self.enqueue())
+
+        self.assertEqual(job.status, Job.CANCELLED)
+        self.assertIsNone(run_job(job.pk))
+
+    def test_running_job_stops_at_its_next_progress_report(self):
+        job = run_job(self.enqueue(steps=5, cancel_at=2).pk)
+
+        self.assertEqual(job.status, Job.CANCELLED)
+        self.assertEqual(job.message, "Cancelled")
+        self.assertAlmostEqual(job.progress, 0.4)
+
+    def test_status_and_cancel_endpoints(self):
+        from . import views
+        self.client.force_login(get_user_model().objects.create(username="nurse"))
+        with mock.patch.object(views, "job_queue", self.queue):
+            job = self.enqueue()
+            status = self.client.get(reverse("detection:job_status", args=[job.pk])).json()
+            cancelled = self.client.post(reverse("detection:job_cancel", args=[job.pk])).json()
+
+        self.assertEqual(status["status"], "queued")
+        self.assertEqual(cancelled["status"], "cancelled")
+
+    def test_clip_requests_are_queued(self):
+        from . import views
+        self.client.force_login(get_user_model().objects.create(username="nurse"))
+        with mock.patch.object(views, "job_queue", self.queue), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("detection:create_alert"),
+                data=json.dumps({"type": "manual", "make_clip": True}),
+                content_type="application/json",
+            )
+
+        job = Job.objects.get(pk=response.json()["clip_job"])
+        self.assertEqual(job.kind, "attach_clip")
+        self.assertEqual(job.params["alert_id"], response.json()["alert_id"])
+        self.assertEqual(self.backend.submitted, [job.pk])
+
+
+class ThreadPoolJobBackendTests(TransactionTestCase):
+    def test_jobs_of_stopped_processes_are_failed(self):
+        stopped = subprocess.Popen([sys.executable, "-c", ""])
+        stopped.wait()
+        host = socket.gethostname()
+        lost = [Job.objects.create(kind="test_steps", status=status, worker=f"{host}:{stopped.pid}")
+                for status in (Job.QUEUED, Job.RUNNING)]
+        alive = Job.objects.create(kind="test_steps", status=Job.RUNNING, worker=ThreadPoolJobBackend.worker_id())
+        remote = Job.objects.create(kind="test_steps", status=Job.RUNNING, worker=f"other-{host}:{stopped.pid}")
+
+        with self.assertLogs("detection.jobs", "WARNING"):
+            self.assertEqual(JobQueue(ThreadPoolJobBackend()).recover(), 2)
+
+        statuses = dict(Job.objects.values_list("pk", "status"))
+        self.assertEqual([statuses[job.pk] for job in lost], [Job.FAILED, Job.FAILED])
+        self.assertEqual(statuses[alive.pk], Job.RUNNING)
+        self.assertEqual(statuses[remote.pk], Job.RUNNING)
+
+    @skipUnless(os.path.exists("/proc/self/stat"), "process start times are read from /proc")
+    def test_jobs_of_a_reused_pid_are_failed(self):
+        host, pid, start = ThreadPoolJobBackend.worker_id().split(":")
+        self.assertTrue(start)
+        # An earlier process that had this process's pid
+        reused = Job.objects.create(kind="test_steps", status=Job.RUNNING, worker=f"{host}:{pid}:{int(start) - 1}")
+        alive = Job.objects.create(kind="test_steps", status=Job.RUNNING, worker=ThreadPoolJobBackend.worker_id())
+
+        with self.assertLogs("detection.jobs", "WARNING"):
+            self.assertEqual(JobQueue(ThreadPoolJobBackend()).recover(), 1)
+
+        statuses = dict(Job.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[reused.pk], Job.FAILED)
+        self.assertEqual(statuses[alive.pk], Job.RUNNING)
+
+    def test_jobs_run_on_the_worker_threads(self):
+        backend = ThreadPoolJobBackend(workers=2)
+        self.addCleanup(backend.close)
+        queue = JobQueue(backend)
+
+        jobs = [queue.enqueue("test_steps", {"steps": 2}) for _ in range(3)]
+
+        deadline = time.monotonic() + 10
+        while Job.objects.exclude(status=Job.SUCCEEDED).exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(
+            list(Job.objects.filter(pk__in=[j.pk for j in jobs]).values_list("status", flat=True)),
+            [Job.SUCCEEDED] * 3,
+        )
+
+
+class MotionGateTests(SimpleTestCase):
+    def setUp(self):
+        self.gate = MotionGate(max_skip_seconds=2.0)
+        self.detection = Detection.empty(NAMES)
+
+    def test_static_frame_reuses_the_detection(self):
+        self.assertIsNone(self.gate.reuse("room_1", blank_frame()))
+        self.gate.remember("room_1", blank_frame(), self.detection)
+
+        self.assertIs(self.gate.reuse("room_1", blank_frame()), self.detection)
+        self.assertIsNone(self.gate.reuse("room_2", blank_frame()))
+        self.assertEqual(self.gate.metrics()["skipped"], 1)
+
+    def test_changed_frame_runs_the_model(self):
+        self.gate.remember("room_1", blank_frame(), self.detection)
+        frame = blank_frame()
+        frame[:, : frame.shape[1] // 4] = 255
+
+        self.assertIsNone(self.gate.reuse("room_1", frame))
+
+    def test_small_person_falling_runs_the_model(self):
+        room = np.random.default_rng(0).integers(90, 110, (480, 640, 3), dtype=np.uint8)
+        standing, lying = room.copy(), room.copy()
+        standing[300:410, 500:540] = 30     # 40x110 person, 1.4% of the frame
+        lying[370:410, 430:540] = 30
+        self.gate.remember("room_1", standing, self.detection)
+
+        self.assertIsNone(self.gate.reuse("room_1", lying))
+
+    def test_sensor_noise_and_lighting_drift_are_static(self):
+        rng = np.random.default_rng(0)
+        room = rng.integers(60, 190, (480, 640, 3)).astype(np.int16)
+        self.gate.remember("room_1", room.astype(np.uint8), self.detection)
+        noisy = np.clip(room + 4 + rng.normal(0, 4, room.shape), 0, 255).astype(np.uint8)
+
+        self.assertIs(self.gate.reuse("room_1", noisy), self.detection)
+
+    def test_model_runs_again_after_max_skip_seconds(self):
+        self.gate.remember("room_1", blank_frame(), self.detection, now=100.0)
+        reused = [self.gate.reuse("room_1", blank_frame(), now=100.0 + t) for t in (0.5, 1.0, 1.9, 2.0)]
+
+        self.assertEqual(reused[:3], [self.detection] * 3)
+        self.assertIsNone(reused[3])
+        self.assertEqual(self.gate.metrics()["skip_rate"], 0.75)
+
+
+class ObservationRecorderTests(TestCase):
+    def setUp(self):
+        self.alert = FallAlert.objects.create(detected_by="live_camera", fall_state="monitoring")
+
+    def add(self, recorder, n, start=1_700_000_000.0):
+        for i in range(n):
+            recorder.add(self.alert.pk, start + i, "monitoring", float(i), confidence=0.9,
+                         bbox=(1, 2, 3, 4), track_id="p1")
+
+    def test_samples_are_inserted_one_batch_at_a_time(self):
+        recorder = ObservationRecorder(batch_size=3, max_delay=60)
+
+        with self.assertNumQueries(1):
+            self.add(recorder, 5)
+        self.assertEqual(FallObservation.objects.count(), 3)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(recorder.flush(), 2)
+
+        self.assertEqual(FallObservation.objects.count(), 5)
+        self.assertEqual(recorder.metrics()["batches"], 2)
+
+    def test_flush_due_waits_for_max_delay(self):
+        recorder = ObservationRecorder(batch_size=100, max_delay=60)
+        self.add(recorder, 2)
+
+        self.assertEqual(recorder.flush_due(), 0)
+        recorder.max_delay = 0
+        self.assertEqual(recorder.flush_due(), 2)
+
+
+class ObservationRecorderDeletedAlertTests(TransactionTestCase):
+    def test_samples_of_deleted_alerts_do_not_lose_the_batch(self):
+        kept, deleted = (FallAlert.objects.create(detected_by="live_camera") for _ in range(2))
+        recorder = ObservationRecorder(batch_size=100, max_delay=60)
+        for i, alert in enumerate([kept, deleted, kept]):
+            recorder.add(alert.pk, 1_700_000_000.0 + i, "monitoring", 0.0)
+        deleted.delete()
+
+        self.assertEqual(recorder.flush(), 2)
+
+        self.assertEqual(FallObservation.objects.filter(alert=kept).count(), 2)
+        self.assertEqual(recorder.metrics()["dropped"], 1)
+        self.assertEqual(recorder.metrics()["errors"], 0)
+
+
+class CreateAlertViewTests(TestCase):
+    def setUp(self):
+        from .views import CreateAlertView
+        CreateAlertView.incidents.clear("live_camera")
+        self.client.force_login(get_user_model().objects.create(username="nurse"))
+
+    def post_alert(self):
+        return self.client.post(
+            reverse("detection:create_alert"),
+            data=json.dumps({"type": "live_camera", "yolo_confidence": 0.9}),
+            content_type="application/json",
+        )
+
+    def test_open_incident_is_reused_without_writing(self):
+        created = self.post_alert()
+        self.assertEqual(created.status_code, 201)
+
+        with self.assertNumQueries(2):  # session, user
+            updated = self.post_alert()
+
+        self.assertEqual(updated.json(), {"status": "updated", "alert_id": created.json()["alert_id"]})
+        self.assertEqual(FallAlert.objects.count(), 1)
+
+    def test_deleted_alert_opens_a_new_incident(self):
+        from . import views
+        FallAlert.objects.filter(pk=self.post_alert().json()["alert_id"]).delete()
+
+        with mock.patch.object(views, "job_queue", JobQueue(mock.Mock())):
+            response = self.client.post(
+                reverse("detection:create_alert"),
+                data=json.dumps({"type": "live_camera", "make_clip": True}),
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 201)
+        alert = FallAlert.objects.get()
+        self.assertEqual(response.json()["alert_id"], alert.pk)
+        self.assertEqual(Job.objects.get(pk=response.json()["clip_job"]).params["alert_id"], alert.pk)
@@ -1,15 +1,33 @@
 """
 Temporal fall tracking system to determine urgency level.
 Enhanced version with persistence and tolerance to detection interruptions.
+
+Each camera has its own FallTracker (see TrackerRegistry). Within a camera,
+every Fall-Detected box of a frame is associated to an existing track by IoU,
+falling back to centroid distance, with the association computed on NumPy
+box arrays. The live pipeline updates one camera per frame
+(FallTracker.update_frame); TrackerRegistry.update_many batches the
+association across cameras for callers holding a frame of each at once.
+
+Tracker state lives in a pluggable backend: in process memory (default), or
+in Django's cache framework so several gunicorn/uvicorn workers share the
+same timers (settings.FALL_TRACKER_BACKEND = "cache").
 """
 
+import logging
+import math
+import threading
 import time
+import uuid
+from contextlib import ExitStack, contextmanager
 import cv2
 import numpy as np
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+logger = logging.getLogger(__name__)
+
 # Description and intervention level for each state
 STATE_DESCRIPTION_MAP = {
     "monitoring": {
@@ -41,20 +59,29 @@ class FallState(Enum):
     URGENT = "urgent"             # >30s: urgent alert
     RECOVERED = "recovered"       # person got up
 
+# Ordering used to pick the most urgent track of a camera
+STATE_SEVERITY = {
+    FallState.RECOVERED: 0,
+    FallState.MONITORING: 1,
+    FallState.ALERT: 2,
+    FallState.URGENT: 3,
+}
+
 @dataclass
 class PersonState:
     """State of a tracked person."""
     first_detected: float
     last_seen: float
     last_position: Optional[Tuple[int, int]] = None
+    last_bbox: Optional[Tuple[int, int, int, int]] = None
     movement_detected: bool = False
     current_state: FallState = FallState.MONITORING
     missed_detections: int = 0  # Counter for missed detections
     max_missed: int = 10        # Tolerance before abandoning
     
-    def time_on_ground(self) -> float:
-        """Returns time spent on ground in seconds."""
-        return time.time() - self.first_detected
+    def time_on_ground(self, now: Optional[float] = None) -> float:
+        """Returns time spent on ground in seconds (at `now`, defaults to time.time())."""
+        return (time.time() if now is None else now) - self.first_detected
     
     def update_movement(self, current_position: Tuple[int, int], threshold: int = 30) -> bool:
         """
@@ -71,9 +98,9 @@ class PersonState:
             self.last_position = current_position
             return False
             
-        distance = np.sqrt(
-            (current_position[0] - self.last_position[0])**2 + 
-            (current_position[1] - self.last_position[1])**2
+        distance = math.hypot(
+            current_position[0] - self.last_position[0],
+            current_position[1] - self.last_position[1]
         )
         
         moved = distance > threshold
@@ -83,9 +110,9 @@ class PersonState:
             
         return moved
     
-    def get_urgency_level(self) -> FallState:
+    def get_urgency_level(self, now: Optional[float] = None) -> FallState:
         """Determines urgency level based on time and movement."""
-        time_elapsed = self.time_on_ground()
+        time_elapsed = self.time_on_ground(now)
         
         # Once urgent, stays urgent even with intermittent detection
         if self.current_state == FallState.URGENT and time_elapsed > 25:
@@ -105,38 +132,342 @@ class PersonState:
         """Marks a missed detection."""
         self.missed_detections += 1
     
-    def mark_found(self):
+    def mark_found(self, now: Optional[float] = None):
         """Resets missed detection counter."""
         self.missed_detections = 0
-        self.last_seen = time.time()
+        self.last_seen = time.time() if now is None else now
     
     def should_keep_alive(self) -> bool:
         """Determines if we should keep this tracking despite missed detections."""
         return self.missed_detections < self.max_missed
 
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU between two sets of xyxy boxes.
+
+    Args:
+        a: Boxes of shape (..., T, 4)
+        b: Boxes of shape (..., D, 4)
+
+    Returns:
+        IoU matrix of shape (..., T, D)
+    """
+    a = a[..., :, None, :]
+    b = b[..., None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.divide(inter, union, out=np.zeros_like(inter, dtype=np.float64), where=union > 0)
+
+
+def centroid_distance_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise distance between box centers, shape (..., T, D).
+    """
+    ca = (a[..., :2] + a[..., 2:]) / 2.0
+    cb = (b[..., :2] + b[..., 2:]) / 2.0
+    return np.linalg.norm(ca[..., :, None, :] - cb[..., None, :, :], axis=-1)
+
+
+def associate(
+    track_boxes: np.ndarray,
+    det_boxes: np.ndarray,
+    iou_threshold: float = 0.3,
+    max_distance: float = 80.0,
+    track_valid: Optional[np.ndarray] = None,
+    det_valid: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Associate detections to tracks by IoU, falling back to centroid distance.
+
+    Works on a single camera ((T, 4) and (D, 4) arrays) or on a batch of cameras
+    padded to the same size ((C, T, 4) and (C, D, 4) with validity masks).
+    A pair can match if IoU >= iou_threshold (preferred) or, failing that, if the
+    centers are closer than max_distance pixels. Matches are resolved by rounds
+    of mutual best scores, each round fully vectorized.
+
+    Args:
+        track_boxes: Last boxes of the existing tracks, (..., T, 4)
+        det_boxes: Boxes detected in the current frame, (..., D, 4)
+        iou_threshold: Minimum IoU for an overlap match
+        max_distance: Maximum center distance (pixels) for a fallback match
+        track_valid: Optional (..., T) mask of real (non padding) tracks
+        det_valid: Optional (..., D) mask of real (non padding) detections
+
+    Returns:
+        Array of shape (..., D) with the matched track index of each detection, or -1.
+    """
+    track_boxes = np.asarray(track_boxes, dtype=np.float64)
+    det_boxes = np.asarray(det_boxes, dtype=np.float64)
+    n_tracks, n_dets = track_boxes.shape[-2], det_boxes.shape[-2]
+    matches = np.full(det_boxes.shape[:-1], -1, dtype=np.int64)
+    if n_tracks == 0 or n_dets == 0:
+        return matches
+
+    iou = iou_matrix(track_boxes, det_boxes)
+    dist = centroid_distance_matrix(track_boxes, det_boxes)
+    scores = np.where(
+        iou >= iou_threshold,
+        1.0 + iou,
+        np.where(dist < max_distance, 1.0 - dist / max_distance, 0.0),
+    )
+    if track_valid is not None:
+        scores = np.where(track_valid[..., :, None], scores, 0.0)
+    if det_valid is not None:
+        scores = np.where(det_valid[..., None, :], scores, 0.0)
+
+    det_index = np.arange(n_dets)
+    track_index = np.arange(n_tracks)
+    for _ in range(min(n_tracks, n_dets)):
+        best_track = scores.argmax(axis=-2)                      # (..., D)
+        best_det = scores.argmax(axis=-1)                        # (..., T)
+        best_score = np.take_along_axis(scores, best_track[..., None, :], axis=-2)[..., 0, :]
+        mutual = np.take_along_axis(best_det, best_track, axis=-1) == det_index
+        new = mutual & (best_score > 0)
+        if not new.any():
+            break
+        matches = np.where(new, best_track, matches)
+        track_taken = ((best_track[..., None, :] == track_index[:, None]) & new[..., None, :]).any(axis=-1)
+        scores = np.where(track_taken[..., :, None] | new[..., None, :], 0.0, scores)
+    return matches
+
+
+class InMemoryStateBackend:
+    """
+    Keeps tracker states in process memory.
+
+    States are live objects (no copy), so this is the fastest backend, but each
+    worker process has its own timers.
+    """
+
+    def __init__(self):
+        self._states: Dict[str, Dict[str, PersonState]] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def locked(self, key: str) -> Iterator[None]:
+        """Serializes updates of one tracker between threads."""
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.RLock())
+        with lock:
+            yield
+
+    def load(self, key: str) -> Dict[str, PersonState]:
+        """Returns the (live) states of a tracker."""
+        return self._states.setdefault(key, {})
+
+    def save(self, key: str, states: Dict[str, PersonState]) -> None:
+        """Stores the states of a tracker."""
+        self._states[key] = states
+
+
+class CacheStateBackend:
+    """
+    Keeps tracker states in Django's cache so every worker process shares them.
+
+    Use a cache shared between processes (Redis, Memcached, database or file
+    based cache). Updates are serialized with a lock key, then the states are
+    read and written back as one pickled value.
+
+    The lock is the cache's own lock when it has one (django-redis: acquired,
+    extended and released atomically by Redis), otherwise a key created with
+    the atomic `cache.add`. Either way the lock expires `lock_timeout` seconds
+    after its holder died, and is extended by a background thread while the
+    holder is alive, so it is never taken over from a live worker. Since a held
+    key cannot expire, releasing the plain key by get-then-delete only ever
+    deletes the holder's own lock.
+    """
+
+    def __init__(self, alias: str = "default", prefix: str = "fall_tracker",
+                 lock_timeout: float = 5.0, state_timeout: Optional[float] = 3600.0,
+                 wait_timeout: float = 10.0):
+        """
+        Args:
+            alias: Django cache alias
+            prefix: Prefix of the cache keys
+            lock_timeout: Lifetime of a lock after its last extension, so a crashed
+                worker cannot block others
+            state_timeout: Lifetime of idle tracker states in the cache
+            wait_timeout: Maximum wait for a lock held by another worker
+        """
+        self.alias = alias
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self.state_timeout = state_timeout
+        self.wait_timeout = wait_timeout
+
+        self._held: Dict[str, Callable[[], bool]] = {}   # Lock key -> extends it
+        self._held_guard = threading.Lock()
+        self._keeper: Optional[threading.Thread] = None
+
+    @property
+    def cache(self):
+        from django.core.cache import caches
+        return caches[self.alias]
+
+    @contextmanager
+    def locked(self, key: str) -> Iterator[None]:
+        """
+        Acquires the shared lock of a tracker, waiting for its current holder.
+
+        Raises:
+            TimeoutError: If the lock is still held by another worker after `wait_timeout`.
+        """
+        lock_key = f"{self.prefix}:{key}:lock"
+        cache = self.cache
+        if hasattr(cache, "lock"):
+            extend, release = self._acquire_native(cache, lock_key)
+        else:
+            extend, release = self._acquire_key(cache, lock_key)
+        self._keep_alive(lock_key, extend)
+        try:
+            yield
+        finally:
+            with self._held_guard:
+                self._held.pop(lock_key, None)
+            release()
+
+    def _acquire_native(self, cache, lock_key: str) -> Tuple[Callable[[], bool], Callable[[], None]]:
+        """Acquires the cache backend's own lock (atomic extend and release)."""
+        lock = cache.lock(lock_key, timeout=self.lock_timeout, sleep=0.001,
+                          blocking_timeout=self.wait_timeout)
+        if not lock.acquire():
+            raise TimeoutError(f"Tracker lock {lock_key} still held after {self.wait_timeout}s")
+
+        def extend() -> bool:
+            lock.reacquire()   # Raises if the lock is not ours anymore
+            return True
+
+        def release() -> None:
+            try:
+                lock.release()
+            except Exception:
+                logger.warning("Tracker lock %s expired before its release", lock_key)
+
+        return extend, release
+
+    def _acquire_key(self, cache, lock_key: str) -> Tuple[Callable[[], bool], Callable[[], None]]:
+        """Acquires a lock key created with the atomic `cache.add`."""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        while not cache.add(lock_key, token, timeout=self.lock_timeout):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Tracker lock {lock_key} still held after {self.wait_timeout}s")
+            time.sleep(0.001)
+
+        def extend() -> bool:
+            return cache.get(lock_key) == token and cache.touch(lock_key, timeout=self.lock_timeout)
+
+        def release() -> None:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+            else:
+                logger.warning("Tracker lock %s expired before its release", lock_key)
+
+        return extend, release
+
+    def _keep_alive(self, lock_key: str, extend: Callable[[], bool]) -> None:
+        """Registers a held lock with the thread extending every held lock."""
+        with self._held_guard:
+            self._held[lock_key] = extend
+            if self._keeper is None:
+                self._keeper = threading.Thread(target=self._extend_held, name="tracker-lock", daemon=True)
+                self._keeper.start()
+
+    def _extend_held(self) -> None:
+        """Keeper thread: extends the held locks well before they expire."""
+        while True:
+            time.sleep(self.lock_timeout / 3)
+            with self._held_guard:
+                held = list(self._held.items())
+            for lock_key, extend in held:
+                try:
+                    extended = extend()
+                except Exception:
+                    extended = False
+                if not extended and self._held.get(lock_key) is extend:
+                    logger.warning("Could not extend tracker lock %s", lock_key)
+
+    def load(self, key: str) -> Dict[str, PersonState]:
+        """Reads the states of a tracker from the cache."""
+        return self.cache.get(f"{self.prefix}:{key}:states") or {}
+
+    def save(self, key: str, states: Dict[str, PersonState]) -> None:
+        """Writes the states of a tracker to the cache."""
+        self.cache.set(f"{self.prefix}:{key}:states", states, timeout=self.state_timeout)
+
+
+def backend_from_settings():
+    """
+    Builds the state backend selected by settings.FALL_TRACKER_BACKEND ("memory" or "cache").
+    """
+    try:
+        from django.conf import settings
+        name = getattr(settings, "FALL_TRACKER_BACKEND", "memory")
+        alias = getattr(settings, "FALL_TRACKER_CACHE_ALIAS", "default")
+    except Exception:  # Django not configured (standalone use)
+        name, alias = "memory", "default"
+    if name == "cache":
+        return CacheStateBackend(alias=alias)
+    if name != "memory":
+        raise ValueError(f"Unknown FALL_TRACKER_BACKEND '{name}'")
+    return InMemoryStateBackend()
+
+
 class FallTracker:
     """Fall tracking manager with temporal states."""
     
-    def __init__(self, timeout: float = 120.0):  # 2 minutes
+    def __init__(self, timeout: float = 120.0,  # 2 minutes
+                 iou_threshold: float = 0.3, max_distance: float = 80.0,
+                 backend=None, key: str = "default"):
         """
         Args:
             timeout: Time after which a person is no longer tracked
+            iou_threshold: Minimum IoU to associate a box to an existing track
+            max_distance: Maximum center distance (pixels) for a fallback association
+            backend: State backend (InMemoryStateBackend by default)
+            key: Key of this tracker in the backend (camera id)
         """
-        self.person_states: Dict[str, PersonState] = {}
+        self.backend = backend or InMemoryStateBackend()
+        self.key = key
+        self.person_states: Dict[str, PersonState] = self.backend.load(key)
         self.timeout = timeout
+        self.iou_threshold = iou_threshold
+        self.max_distance = max_distance
+
+    @contextmanager
+    def transaction(self) -> Iterator["FallTracker"]:
+        """
+        Runs a group of updates atomically against the state backend.
+
+        Loads the latest shared states, lets the caller update them, then
+        writes them back, all while holding the tracker lock.
+        """
+        with self.backend.locked(self.key):
+            self.person_states = self.backend.load(self.key)
+            try:
+                yield self
+            finally:
+                self.backend.save(self.key, self.person_states)
         
-    def update_detection(self, person_id: str, bbox: Tuple[int, int, int, int]) -> Tuple[FallState, float]:
+    def update_detection(self, person_id: str, bbox: Tuple[int, int, int, int],
+                         now: Optional[float] = None) -> Tuple[FallState, float]:
         """
         Updates the state of a person detected on the ground.
         
         Args:
             person_id: Unique person identifier
             bbox: Bounding box (x1, y1, x2, y2)
+            now: Time of the detection (defaults to time.time(); video timestamps for offline analysis)
             
         Returns:
             Tuple (current_state, time_on_ground)
         """
-        current_time = time.time()
+        current_time = time.time() if now is None else now
         
         # Center position of bounding box
         center_x = (bbox[0] + bbox[2]) // 2
@@ -153,22 +484,74 @@ class FallTracker:
         else:
             # Update existing detection
             state = self.person_states[person_id]
-            state.mark_found()  # Reset missed counter
+            state.mark_found(current_time)  # Reset missed counter
             state.update_movement(current_position)
         
         # Calculate urgency level
         state = self.person_states[person_id]
-        urgency = state.get_urgency_level()
+        state.last_bbox = tuple(bbox)
+        urgency = state.get_urgency_level(current_time)
         state.current_state = urgency
         
-        return urgency, state.time_on_ground()
+        return urgency, state.time_on_ground(current_time)
+
+    def track_boxes(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Returns the ids and last boxes (as a (T, 4) array) of the tracks that have a box.
+        """
+        ids = [pid for pid, state in self.person_states.items() if state.last_bbox is not None]
+        boxes = np.array(
+            [self.person_states[pid].last_bbox for pid in ids], dtype=np.float64
+        ).reshape(-1, 4)
+        return ids, boxes
+
+    def update_frame(self, boxes: np.ndarray, now: Optional[float] = None) -> List[Tuple[str, FallState, float]]:
+        """
+        Associates every fall box of a frame to a track and updates the tracks.
+
+        Args:
+            boxes: Fall-Detected boxes of the frame, (N, 4) xyxy array
+            now: Time of the frame (defaults to time.time())
+
+        Returns:
+            List of (person_id, current_state, time_on_ground), one per box
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        ids, track_boxes = self.track_boxes()
+        matches = associate(track_boxes, boxes, self.iou_threshold, self.max_distance)
+        return self.apply_matches(ids, boxes, matches, now)
+
+    def apply_matches(self, ids: List[str], boxes: np.ndarray, matches: np.ndarray,
+                      now: Optional[float] = None) -> List[Tuple[str, FallState, float]]:
+        """
+        Updates tracks from an association result; unmatched boxes open new tracks.
+        """
+        updates = []
+        # Plain Python ints: scalar NumPy arithmetic is slow in the per-track updates
+        for bbox, match in zip(boxes.astype(int).tolist(), matches.tolist()):
+            person_id = ids[match] if match >= 0 else f"person_{uuid.uuid4().hex[:8]}"
+            state, time_on_ground = self.update_detection(person_id, tuple(bbox), now)
+            updates.append((person_id, state, time_on_ground))
+        return updates
+
+    def most_urgent(self, states: Dict[str, PersonState],
+                    now: Optional[float] = None) -> Optional[Tuple[str, PersonState]]:
+        """
+        Returns the (person_id, state) with the highest urgency, longest on the ground first.
+        """
+        if not states:
+            return None
+        return max(
+            states.items(),
+            key=lambda item: (STATE_SEVERITY.get(item[1].current_state, 0), item[1].time_on_ground(now))
+        )
     
-    def update_missed_detections(self):
+    def update_missed_detections(self, now: Optional[float] = None):
         """
         Updates counters for people not detected in this frame.
         Call every frame even when YOLO detects nothing.
         """
-        current_time = time.time()
+        current_time = time.time() if now is None else now
         to_remove = []
         
         for person_id, state in self.person_states.items():
@@ -183,12 +566,12 @@ class FallTracker:
         for person_id in to_remove:
             del self.person_states[person_id]
     
-    def get_persistent_states(self) -> Dict[str, PersonState]:
+    def get_persistent_states(self, now: Optional[float] = None) -> Dict[str, PersonState]:
         """
         Returns persistent states even without recent detection.
         To maintain display even when YOLO misses some frames.
         """
-        current_time = time.time()
+        current_time = time.time() if now is None else now
         active_states = {}
         
         for person_id, state in self.person_states.items():
@@ -239,9 +622,9 @@ class FallTracker:
         }
         return color_map.get(state_obj.current_state, (128, 128, 128))
     
-    def cleanup_old_tracks(self):
+    def cleanup_old_tracks(self, now: Optional[float] = None):
         """Removes old tracks."""
-        current_time = time.time()
+        current_time = time.time() if now is None else now
         to_remove = []
         
         for person_id, state in self.person_states.items():
@@ -263,5 +646,87 @@ class FallTracker:
             for state in self.person_states.values()
         )
 
-# Global tracker instance
-fall_tracker = FallTracker()
\ No newline at end of file
+class TrackerRegistry:
+    """FallTracker instances keyed by camera id."""
+
+    def __init__(self, backend=None, **tracker_kwargs):
+        """
+        Args:
+            backend: State backend shared by all trackers (in memory by default)
+            **tracker_kwargs: Arguments passed to each new FallTracker
+        """
+        self.backend = backend or InMemoryStateBackend()
+        self.tracker_kwargs = tracker_kwargs
+        self._trackers: Dict[str, FallTracker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, camera_id: str) -> FallTracker:
+        """Returns the tracker of a camera, creating it on first use."""
+        tracker = self._trackers.get(camera_id)
+        if tracker is None:
+            with self._lock:
+                tracker = self._trackers.get(camera_id)
+                if tracker is None:
+                    tracker = FallTracker(backend=self.backend, key=camera_id, **self.tracker_kwargs)
+                    self._trackers[camera_id] = tracker
+        return tracker
+
+    def cameras(self) -> List[str]:
+        """Returns the ids of the cameras with a tracker."""
+        return list(self._trackers)
+
+    def update_many(self, boxes_by_camera: Dict[str, np.ndarray]) -> Dict[str, List[Tuple[str, FallState, float]]]:
+        """
+        Updates the trackers of several cameras at once.
+
+        The association of all cameras is computed in a single batched call on
+        padded (cameras, tracks, 4) / (cameras, detections, 4) arrays. The live
+        pipeline does not use it: its frames arrive one camera at a time and
+        go through FallTracker.update_frame.
+
+        Args:
+            boxes_by_camera: Fall boxes of the current frame of each camera
+
+        Returns:
+            Per-camera list of (person_id, current_state, time_on_ground)
+        """
+        camera_ids = list(boxes_by_camera)
+        if not camera_ids:
+            return {}
+        trackers = [self.get(cid) for cid in camera_ids]
+        with ExitStack() as stack:
+            # Always lock in the same order so concurrent batches cannot deadlock
+            for tracker in sorted(trackers, key=lambda t: t.key):
+                stack.enter_context(tracker.transaction())
+            return self._update_many(camera_ids, trackers, boxes_by_camera)
+
+    def _update_many(self, camera_ids, trackers, boxes_by_camera):
+        """Batched association and update; trackers are already locked."""
+        tracks = [tracker.track_boxes() for tracker in trackers]
+        dets = [np.asarray(boxes_by_camera[cid], dtype=np.float64).reshape(-1, 4) for cid in camera_ids]
+
+        n_tracks = max(len(ids) for ids, _ in tracks)
+        n_dets = max(len(d) for d in dets)
+        track_arr = np.zeros((len(camera_ids), n_tracks, 4))
+        det_arr = np.zeros((len(camera_ids), n_dets, 4))
+        track_valid = np.zeros((len(camera_ids), n_tracks), dtype=bool)
+        det_valid = np.zeros((len(camera_ids), n_dets), dtype=bool)
+        for i, ((ids, boxes), det) in enumerate(zip(tracks, dets)):
+            track_arr[i, :len(ids)] = boxes
+            track_valid[i, :len(ids)] = True
+            det_arr[i, :len(det)] = det
+            det_valid[i, :len(det)] = True
+
+        tracker_0 = trackers[0]
+        matches = associate(
+            track_arr, det_arr, tracker_0.iou_threshold, tracker_0.max_distance,
+            track_valid=track_valid, det_valid=det_valid,
+        )
+        return {
+            cid: tracker.apply_matches(ids, det, matches[i, :len(det)])
+            for i, (cid, tracker, (ids, _), det) in enumerate(zip(camera_ids, trackers, tracks, dets))
+        }
+
+
+# Trackers of every camera
+tracker_registry = TrackerRegistry(backend=backend_from_settings())
@@ -2,7 +2,7 @@
 URL configuration for the detection app.
 
 Defines URL patterns for dashboard, alert management, test detection,
-and API endpoints for alert creation and YOLO inference.
+and API endpoints for the alerts feed, event stream and alert observations, alert creation, YOLO inference and inference metrics.
 """
 
 from django.urls import path
@@ -17,6 +17,12 @@ urlpatterns = [
     # List all alerts with filtering, sorting, and pagination
     path("alerts/", views.AlertListView.as_view(), name="alerts"),
 
+    # JSON feed of alerts newer than a cursor (polled by nurse-station clients)
+    path("alerts/feed/", views.AlertFeedView.as_view(), name="alerts_feed"),
+
+    # Server-sent events stream of new/escalated/acknowledged alerts (live screens)
+    path("alerts/events/", views.AlertEventStreamView.as_view(), name="alert_events"),
+
     # Mark an alert as acknowledged (and optionally mark accuracy)
     path(
         "alerts/<int:pk>/acknowledge/",
@@ -24,12 +30,26 @@ urlpatterns = [
         name="acknowledge_alert",
     ),
 
+    # JSON time series of the live sightings of an alert's incident
+    path(
+        "alerts/<int:pk>/observations/",
+        views.AlertObservationsView.as_view(),
+        name="alert_observations",
+    ),
+
     # Test detection page for uploading and running fall detection on files
     path("test/", views.TestDetectionView.as_view(), name="test_detection"),
 
+    # Background jobs (uploaded video analysis, clip extraction): status polling and cancellation
+    path("jobs/<uuid:pk>/", views.JobStatusView.as_view(), name="job_status"),
+    path("jobs/<uuid:pk>/cancel/", views.JobCancelView.as_view(), name="job_cancel"),
+
     # API endpoint to create or update a FallAlert (used by frontend/camera)
     path("create-alert/", views.CreateAlertView.as_view(), name="create_alert"),
 
     # API endpoint to run YOLO inference on an image (returns fall result)
     path("run-yolo/", views.RunYoloView.as_view(), name="run_yolo"),
+
+    # API endpoint exposing inference metrics (batching queue depth, batch sizes)
+    path("metrics/", views.InferenceMetricsView.as_view(), name="metrics"),
 ]
\ No newline at end of file
@@ -0,0 +1,316 @@
+"""
+Offline fall analysis of a whole video file (test uploads).
+
+The video is decoded as a stream: only every `stride`-th frame is decoded
+(the others are grabbed and dropped), the sampled frames are grouped in
+batches and inferred by a pool of worker processes, each holding its own
+copy of the model. At most `2 × workers` batches are in flight, so a
+10-minute clip uses the memory of a few batches, not of the whole file.
+
+Results come back in order and go through a FallTracker driven by the video
+timestamps (not the wall clock), so a person lying still for 30 s of footage
+reaches "urgent" exactly as they would live. The analysis reports a
+per-second timeline of the most severe state and the frame with the most
+confident Fall-Detected box.
+
+Settings:
+    VIDEO_ANALYSIS_STRIDE, VIDEO_ANALYSIS_BATCH_SIZE,
+    VIDEO_ANALYSIS_WORKERS (0 = infer in the calling process)
+"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+from .tracking import STATE_SEVERITY, FallState, FallTracker
+
+if TYPE_CHECKING:  # services imports the Django models; workers import this module before django.setup()
+    from .services import Detection, FallDetectionService
+
+
+@dataclass
+class VideoFrame:
+    """A sampled frame of a video."""
+    index: int          # Frame number in the video
+    timestamp: float    # Seconds from the start of the video
+    image: np.ndarray
+
+
+@dataclass
+class TimelineSecond:
+    """What was seen during one second of video."""
+    second: int
+    frames: int = 0
+    people: int = 0                        # Most boxes in one frame
+    state: Optional[str] = None            # Most severe tracked fall state
+    confidence: Optional[float] = None     # Best Fall-Detected confidence
+
+
+@dataclass
+class VideoAnalysis:
+    """
+    Result of a video analysis.
+
+    Attributes:
+        fps (float): Frame rate of the video.
+        duration (float): Length of the video, in seconds.
+        frames (int): Frames inferred (one every `stride`).
+        timeline (List[TimelineSecond]): One entry per second of video.
+        peak_frame (np.ndarray | None): Frame with the best Fall-Detected confidence
+            (the first frame when nothing fell).
+        peak_detection (Detection | None): Detection of that frame.
+        peak_timestamp (float): Position of that frame, in seconds.
+        elapsed (float): Processing time, in seconds.
+    """
+    fps: float
+    duration: float = 0.0
+    frames: int = 0
+    timeline: List[TimelineSecond] = field(default_factory=list)
+    peak_frame: Optional[np.ndarray] = None
+    peak_detection: Optional["Detection"] = None
+    peak_timestamp: float = 0.0
+    elapsed: float = 0.0
+
+    @property
+    def fall(self) -> bool:
+        """True if a fall was tracked at any time."""
+        return self.max_state is not None
+
+    @property
+    def max_state(self) -> Optional[str]:
+        """Most severe state of the video, if any."""
+        states = [FallState(s.state) for s in self.timeline if s.state]
+        return max(states, key=STATE_SEVERITY.get).value if states else None
+
+    @property
+    def confidence(self) -> Optional[float]:
+        """Best Fall-Detected confidence of the video."""
+        return self.peak_detection.confidence if self.peak_detection is not None else None
+
+    def fall_seconds(self) -> int:
+        """Seconds of video with a tracked fall."""
+        return sum(1 for s in self.timeline if s.state)
+
+
+def iter_video_frames(path: str, stride: int = 1) -> Iterator[VideoFrame]:
+    """
+    Decode every `stride`-th frame of a video, one at a time.
+
+    Args:
+        path (str): Video file.
+        stride (int): Keep one frame out of this many (skipped frames are not decoded).
+
+    Yields:
+        VideoFrame: Sampled frames with their timestamp.
+
+    Raises:
+        ValueError: If the file cannot be opened as a video.
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Impossible d'ouvrir la vidéo {os.path.basename(path)}.")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    try:
+        index = 0
+        while True:
+            if index % stride:
+                if not cap.grab():
+                    return
+            else:
+                ret, image = cap.read()
+                if not ret:
+                    return
+                timestamp = index / fps if fps > 0 else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                yield VideoFrame(index, timestamp, image)
+            index += 1
+    finally:
+        cap.release()
+
+
+# --- Worker processes: one model per process, loaded once ---
+
+_worker_service = None
+
+
+def _init_worker(config: dict, threads: int) -> None:
+    """Load the model of a pool worker (spawned process)."""
+    global _worker_service
+    import django
+    django.setup()
+    from .services import FallDetectionService
+
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)   # Workers share the cores instead of each taking all of them
+        except ImportError:
+            pass
+    _worker_service = FallDetectionService(**config)
+
+
+def _detect_batch(images: List[np.ndarray]) -> List["Detection"]:
+    """Run one batch in a pool worker."""
+    return _worker_service.detect_batch(images)
+
+
+class VideoAnalyzer:
+    """
+    Runs the fall detection model over whole videos.
+
+    Attributes:
+        service (FallDetectionService): Model configuration (and the in-process
+            model when `workers` is 0).
+        stride (int): Infer one frame out of this many.
+        batch_size (int): Frames per model call.
+        workers (int): Worker processes (0 = infer in the calling process).
+    """
+    def __init__(self, service: "FallDetectionService", stride: int = 5,
+                 batch_size: int = 8, workers: int = 2) -> None:
+        """
+        Args:
+            service (FallDetectionService): Service whose model configuration the workers load.
+                Services without one (e.g. an InferenceClient) are always used in-process.
+            stride (int): Infer one frame out of this many.
+            batch_size (int): Frames per model call.
+            workers (int): Worker processes (0 = infer in the calling process).
+        """
+        self.service = service
+        self.stride = max(1, int(stride))
+        self.batch_size = max(1, int(batch_size))
+        self.workers = workers if hasattr(service, "backend_options") else 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def analyze(self, path: str, stride: Optional[int] = None,
+                progress: Optional[Callable[[float], None]] = None) -> VideoAnalysis:
+        """
+        Analyze a video file.
+
+        Args:
+            path (str): Video file.
+            stride (int | None): Overrides the analyzer's stride.
+            progress (Callable | None): Called with the fraction of the video done after
+                each batch; an exception it raises stops the analysis.
+
+        Returns:
+            VideoAnalysis: Timeline and peak frame of the video.
+
+        Raises:
+            ValueError: If the file cannot be read as a video.
+        """
+        started = time.perf_counter()
+        stride = max(1, int(stride or self.stride))
+        cap = cv2.VideoCapture(path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0.0
+        cap.release()
+
+        analysis = VideoAnalysis(fps=fps)
+        tracker = FallTracker(key=f"video:{os.path.basename(path)}")
+        timeline: Dict[int, TimelineSecond] = {}
+        for frames, detections in self._detections(iter_video_frames(path, stride)):
+            for frame, detection in zip(frames, detections):
+                self._track(analysis, tracker, timeline, frame, detection)
+            if progress is not None and frame_count > 0:
+                progress(min(1.0, (frames[-1].index + 1) / frame_count))
+        if not analysis.frames:
+            raise ValueError("Impossible de lire les frames de la vidéo.")
+
+        # One entry per second of the clip, including seconds without a sampled frame
+        if fps > 0 and frame_count > 0:
+            analysis.duration = max(analysis.duration, frame_count / fps)
+        last = max(max(timeline), int(np.ceil(analysis.duration)) - 1)
+        analysis.timeline = [timeline.get(s) or TimelineSecond(s) for s in range(last + 1)]
+        analysis.elapsed = time.perf_counter() - started
+        return analysis
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def _track(self, analysis: VideoAnalysis, tracker: FallTracker, timeline: Dict[int, TimelineSecond],
+               frame: VideoFrame, detection: "Detection") -> None:
+        """Feed one inferred frame to the tracker and the timeline."""
+        now = frame.timestamp
+        tracker.update_frame(detection.fall_boxes(), now=now)
+        tracker.update_missed_detections(now=now)
+        urgent = tracker.most_urgent(tracker.get_persistent_states(now=now), now=now)
+
+        entry = timeline.setdefault(int(now), TimelineSecond(int(now)))
+        entry.frames += 1
+        entry.people = max(entry.people, len(detection.boxes))
+        if urgent is not None:
+            state = urgent[1].current_state
+            if entry.state is None or STATE_SEVERITY[state] > STATE_SEVERITY[FallState(entry.state)]:
+                entry.state = state.value
+        if detection.confidence is not None:
+            entry.confidence = max(entry.confidence or 0.0, detection.confidence)
+
+        analysis.frames += 1
+        analysis.duration = now
+        best = analysis.peak_detection.confidence if analysis.peak_detection is not None else None
+        if analysis.peak_frame is None or (
+            detection.confidence is not None and (best is None or detection.confidence > best)
+        ):
+            analysis.peak_frame = frame.image
+            analysis.peak_detection = detection
+            analysis.peak_timestamp = now
+
+    def _detections(self, frames: Iterator[VideoFrame]):
+        """Yield (frames, detections) batches in video order, a bounded number in flight."""
+        if not self.workers:
+            for batch in _batches(frames, self.batch_size):
+                yield batch, self.service.detect_batch([f.image for f in batch])
+            return
+
+        pool = self._ensure_pool()
+        in_flight: "deque[tuple[List[VideoFrame], Future]]" = deque()
+        try:
+            for batch in _batches(frames, self.batch_size):
+                in_flight.append((batch, pool.submit(_detect_batch, [f.image for f in batch])))
+                if len(in_flight) >= 2 * self.workers:
+                    done, future = in_flight.popleft()
+                    yield done, future.result()
+            while in_flight:
+                done, future = in_flight.popleft()
+                yield done, future.result()
+        finally:
+            # Analysis stopped early (error or cancellation): drop the queued batches
+            for _, future in in_flight:
+                future.cancel()
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        """Start the worker processes on first use (spawned: the server process has threads)."""
+        if self._pool is None:
+            config = {
+                "model_path": self.service.model_path,
+                "conf_threshold": self.service.conf_threshold,
+                "backend": self.service.backend,
+                **self.service.backend_options,
+            }
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=get_context("spawn"),
+                initializer=_init_worker, initargs=(config, threads),
+            )
+        return self._pool
+
+
+def _batches(frames: Iterator[VideoFrame], size: int) -> Iterator[List[VideoFrame]]:
+    """Group an iterator of frames in lists of `size`."""
+    batch: List[VideoFrame] = []
+    for frame in frames:
+        batch.append(frame)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
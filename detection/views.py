@@ -5,47 +5,59 @@ This module contains class-based views for:
 - Dashboard statistics and analytics
 - Listing and filtering fall alerts
 - Acknowledging and marking alert accuracy
-- Test detection via file upload
+- Test detection via file upload (videos analysed by a background job)
+- Background job status polling and cancellation
 - API endpoints for alert creation and YOLO inference (with throttling and snapshot/clip support)
+- Live pipeline metrics (batching and alert writer queues)
 """
 
 import os
 import time
 import json
+import asyncio
 import base64
 import cv2
 import numpy as np
 import datetime
 import uuid
+from collections import deque
 from datetime import timedelta
 
+from asgiref.sync import sync_to_async
+
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.generic import ListView, FormView, TemplateView, RedirectView, View
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponseBadRequest
+from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.cache import cache
-from django.db.models import Count, Avg, Q
 
-from .models import FallAlert
+from .models import FallAlert, FallObservation, Job
 from .forms import TestDetectionForm
-from .services import FallDetectionService
-from .services import VideoClipService
-
-# Instantiate the fall detection service globally to avoid reloading the model on every request
-fall_service = FallDetectionService(conf_threshold=0.70)
-
-# Import tracking system
-try:
-    from .tracking import fall_tracker, FallState
-    TRACKING_ENABLED = True
-except ImportError:
-    TRACKING_ENABLED = False
-    print("⚠️ Tracking system not available")
+from .stats import get_alert_sources, get_dashboard_stats
+from .pagination import InvalidCursor, cursor_for, encode_cursor, keyset_page, newer_than, overlap_before
+from .events import AlertNotification, alert_events, alert_payload
+from .incidents import IncidentEngine, IncidentHandler, Observation
+from .ingest import decode_request_frame, FrameDecodeError
+from .jobs import job_payload, job_queue
+from .pipeline import (
+    model_registry,
+    inference_scheduler,
+    live_pipeline,
+    alert_writer,
+    clip_recorder,
+    observation_recorder,
+    motion_gate,
+    InferenceError,
+    TRACKING_ENABLED,
+)
 
 class DashboardView(LoginRequiredMixin, TemplateView):
     """
@@ -58,167 +70,84 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         Gather statistics and analytics for the dashboard context.
         """
         context = super().get_context_data(**kwargs)
-        
-        # Get current time references
-        now = timezone.now()
-        today = now.date()
-        yesterday = today - timedelta(days=1)
-        week_ago = today - timedelta(days=7)
-        
-        # Basic stats
-        total_alerts = FallAlert.objects.count()
-        today_alerts = FallAlert.objects.filter(timestamp__date=today).count()
-        yesterday_alerts = FallAlert.objects.filter(timestamp__date=yesterday).count()
-        pending_alerts = FallAlert.objects.filter(acknowledged=False).count()
-        
-        # Urgent alerts count (only if fall_state field exists)
-        try:
-            urgent_alerts = FallAlert.objects.filter(fall_state='urgent', acknowledged=False).count()
-        except:
-            urgent_alerts = 0
-        
-        # Response rate calculation
-        total_real_alerts = FallAlert.objects.exclude(detected_by="test_upload").count()
-        acknowledged_alerts = FallAlert.objects.exclude(detected_by="test_upload").filter(acknowledged=True).count()
-        response_rate = (acknowledged_alerts / total_real_alerts * 100) if total_real_alerts > 0 else 0
-        
-        # Model accuracy calculation
-        accuracy_marked_alerts = FallAlert.objects.exclude(detected_by="test_upload").filter(is_accurate__isnull=False)
-        total_marked = accuracy_marked_alerts.count()
-        accurate_alerts = accuracy_marked_alerts.filter(is_accurate=True).count()
-        model_accuracy = (accurate_alerts / total_marked * 100) if total_marked > 0 else None
-        
-        # Weekly activity (last 7 days)
-        weekly_activity = []
-        max_daily_count = 0
-        for i in range(7):
-            date = today - timedelta(days=i)
-            count = FallAlert.objects.filter(timestamp__date=date).count()
-            max_daily_count = max(max_daily_count, count)
-            weekly_activity.append({
-                'day': date.strftime('%a %m/%d'),
-                'count': count,
-                'date': date
-            })
-        weekly_activity.reverse()  # Show oldest to newest
-        
-        for stat in weekly_activity:
-            stat['width'] = (stat['count'] / max_daily_count * 100) if max_daily_count > 0 else 0
-        # Detection sources
-        detection_sources = (
-            FallAlert.objects
-            .values('detected_by')
-            .annotate(count=Count('id'))
-            .order_by('-count')
-        )
-        
-        # Add percentages
-        for source in detection_sources:
-            source['percentage'] = (source['count'] / total_alerts * 100) if total_alerts > 0 else 0
-        
+
+        # Aggregated in a few queries and cached until an alert changes
+        stats = dict(get_dashboard_stats())
+
         # Recent alerts (last 10)
-        recent_alerts = FallAlert.objects.select_related('acknowledged_by').order_by('-timestamp')[:10]
-        
-        # Additional stats
-        avg_daily_alerts = FallAlert.objects.filter(
-            timestamp__gte=week_ago
-        ).count() / 7.0 if total_alerts > 0 else 0
-        
-        # Find peak hour - SQLite compatible version
-        peak_hour = None
-        if total_alerts > 0:
-            # Get all alerts and group by hour in Python (SQLite compatible)
-            alerts_with_hours = FallAlert.objects.all().values_list('timestamp', flat=True)
-            hour_counts = {}
-            for timestamp in alerts_with_hours:
-                hour = timestamp.hour
-                hour_counts[hour] = hour_counts.get(hour, 0) + 1
-            
-            if hour_counts:
-                peak_hour_num = max(hour_counts, key=hour_counts.get)
-                peak_hour = f"{peak_hour_num:02d}:00"
-        
-        # Average response time (for acknowledged alerts)
-        acknowledged_with_times = FallAlert.objects.filter(
-            acknowledged=True,
-            acknowledged_at__isnull=False
-        )
-        
-        avg_response_time = None
-        if acknowledged_with_times.exists():
-            total_response_time = sum([
-                (alert.acknowledged_at - alert.timestamp).total_seconds()
-                for alert in acknowledged_with_times
-            ])
-            avg_response_seconds = total_response_time / acknowledged_with_times.count()
-            avg_response_time = f"{int(avg_response_seconds // 60)}m {int(avg_response_seconds % 60)}s"
-        
-        # Get last alert time
-        last_alert = FallAlert.objects.order_by('-timestamp').first()
-        last_alert_time = last_alert.timestamp if last_alert else None
-        
-        context['stats'] = {
-            'total_alerts': total_alerts,
-            'today_alerts': today_alerts,
-            'today_vs_yesterday': today_alerts - yesterday_alerts,
-            'pending_alerts': pending_alerts,
-            'urgent_alerts': urgent_alerts,
-            'response_rate': response_rate,
-            'model_accuracy': model_accuracy,
-            'total_marked_accuracy': total_marked,
-            'weekly_activity': weekly_activity,
-            'max_daily_alerts': max_daily_count,
-            'detection_sources': detection_sources,
-            'recent_alerts': recent_alerts,
-            'avg_daily_alerts': avg_daily_alerts,
-            'peak_hour': peak_hour,
-            'avg_response_time': avg_response_time,
-            'last_alert_time': last_alert_time,
-        }
+        stats['recent_alerts'] = FallAlert.objects.select_related('acknowledged_by').order_by('-timestamp')[:10]
+
+        context['stats'] = stats
+        # Changes saved by other processes only reach the event stream through Redis;
+        # without it the page also refreshes itself now and then
+        context['fallback_refresh_secs'] = 300 if alert_events.cross_process else 60
         
         return context
 
+def filter_alerts(qs, params):
+    """
+    Apply the alert list filters of a query string (include_tests, date, hour,
+    detected_by, status, fall_state) to a FallAlert queryset.
+    """
+    if params.get("include_tests") != "1":
+        qs = qs.exclude(detected_by="test_upload")
+    # Date filter
+    date = params.get("date")
+    if date:
+        # Range on the raw column so the timestamp index can be used
+        try:
+            day = datetime.date.fromisoformat(date)
+        except ValueError:
+            day = None
+        if day:
+            start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+            qs = qs.filter(timestamp__gte=start, timestamp__lt=start + timedelta(days=1))
+    hour = params.get("hour")
+    if hour:
+        qs = qs.filter(timestamp__hour=hour.split(":")[0])
+    detected_by = params.getlist("detected_by")
+    if detected_by:
+        qs = qs.filter(detected_by__in=detected_by)
+    status = params.getlist("status")
+    if status:
+        if "acknowledged" in status and "new" not in status:
+            qs = qs.filter(acknowledged=True)
+        elif "new" in status and "acknowledged" not in status:
+            qs = qs.filter(acknowledged=False)
+
+    # Filter by fall state
+    fall_state = params.getlist("fall_state")
+    if fall_state:
+        qs = qs.filter(fall_state__in=fall_state)
+    return qs
+
+
 class AlertListView(LoginRequiredMixin, ListView):
     """
     Displays a paginated, filterable, and sortable list of fall alerts.
+
+    With a `cursor` query parameter (empty for the first page) and the default
+    newest-first order, pages are fetched by keyset instead of OFFSET and no
+    COUNT(*) is run; `before` goes back to newer alerts.
     """
     model = FallAlert
     template_name = "detection/alerts_list.html"
     context_object_name = "alerts"
     paginate_by = 20
 
+    def cursor_mode(self):
+        """True when keyset pagination is requested and the order allows it."""
+        params = self.request.GET
+        sort = params.get("sort")
+        newest_first = sort is None or (sort == "timestamp" and params.get("order") == "desc")
+        return newest_first and ("cursor" in params or "before" in params)
+
     def get_queryset(self):
         """
         Return the filtered and sorted queryset for the alert list.
         """
-        qs = super().get_queryset()
-        if self.request.GET.get("include_tests") != "1":
-            qs = qs.exclude(detected_by="test_upload")
-        # Date filter
-        date = self.request.GET.get("date")
-        if date:
-            qs = qs.filter(timestamp__date=date)
-        hour = self.request.GET.get("hour")
-        if hour:
-            qs = qs.filter(timestamp__hour=hour.split(":")[0])
-        detected_by = self.request.GET.getlist("detected_by")
-        if detected_by:
-            qs = qs.filter(detected_by__in=detected_by)
-        status = self.request.GET.getlist("status")
-        if status:
-            if "acknowledged" in status and "new" not in status:
-                qs = qs.filter(acknowledged=True)
-            elif "new" in status and "acknowledged" not in status:
-                qs = qs.filter(acknowledged=False)
-        
-        # Filter by fall state (only if field exists)
-        fall_state = self.request.GET.getlist("fall_state")
-        if fall_state:
-            try:
-                qs = qs.filter(fall_state__in=fall_state)
-            except:
-                pass  # Ignore if field doesn't exist yet
-            
+        qs = filter_alerts(super().get_queryset(), self.request.GET)
+
         # Sorting
         sort = self.request.GET.get("sort")
         order = self.request.GET.get("order", "asc")
@@ -228,20 +157,252 @@ class AlertListView(LoginRequiredMixin, ListView):
             qs = qs.order_by(sort)
         return qs
 
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Use keyset pagination in cursor mode, Django's paginator otherwise.
+        """
+        if not self.cursor_mode():
+            return super().paginate_queryset(queryset, page_size)
+        try:
+            page = keyset_page(
+                queryset.select_related("acknowledged_by"), page_size,
+                after=self.request.GET.get("cursor"), before=self.request.GET.get("before"),
+            )
+        except InvalidCursor:
+            page = keyset_page(queryset.select_related("acknowledged_by"), page_size)
+        self.keyset = page
+        return None, page, page.object_list, page.has_next or page.has_previous
+
     def get_context_data(self, **kwargs):
         """
         Add filter options and selections to the context.
         """
         ctx = super().get_context_data(**kwargs)
-        ctx["detected_by_options"] = FallAlert.objects.values_list("detected_by", flat=True).distinct()
+        ctx["detected_by_options"] = get_alert_sources()
         ctx["include_tests"] = (self.request.GET.get("include_tests") == "1")
         ctx["detected_by_selected"] = self.request.GET.getlist("detected_by")
         ctx["status_selected"] = self.request.GET.getlist("status")
         ctx["fall_state_selected"] = self.request.GET.getlist("fall_state")
         ctx["date_selected"] = self.request.GET.get("date", "")
         ctx["hour_selected"] = self.request.GET.get("hour", "")
+
+        if self.cursor_mode():
+            # Links keep the current filters and replace the cursor
+            params = self.request.GET.copy()
+            params.pop("cursor", None)
+            params.pop("before", None)
+            page = self.keyset
+            ctx["cursor_mode"] = True
+            ctx["next_cursor_query"] = (
+                f"{params.urlencode()}&cursor={page.next_cursor}" if page.next_cursor else None
+            )
+            ctx["previous_cursor_query"] = (
+                f"{params.urlencode()}&before={page.previous_cursor}" if page.previous_cursor else None
+            )
         return ctx
 
+
+class AlertFeedView(LoginRequiredMixin, View):
+    """
+    JSON feed of new alerts for nurse-station clients.
+
+    Without `since`, returns the latest `limit` alerts; with `since=<cursor>`,
+    the alerts created after that cursor. Alerts are returned oldest first and
+    `cursor` points at the newest one, to be sent back as `since` on the next
+    poll. Accepts the alert list filters (include_tests, detected_by, status,
+    fall_state).
+
+    Alerts are stamped before their row commits (the AlertWriter thread, other
+    processes), so one can commit after a poll whose cursor is already past
+    it. Each poll therefore also re-sends the alerts of the
+    ALERT_FEED_OVERLAP_SECS before `since`: clients deduplicate by id.
+    A poll is two index range scans (at most `limit` new rows, plus the window).
+    """
+    DEFAULT_LIMIT = 50
+    MAX_LIMIT = 200
+
+    def get(self, request, *args, **kwargs):
+        """
+        Return {"alerts": [...], "cursor": str | None, "has_more": bool}.
+        """
+        try:
+            limit = min(int(request.GET.get("limit", self.DEFAULT_LIMIT)), self.MAX_LIMIT)
+        except ValueError:
+            return JsonResponse({"error": "Invalid limit"}, status=400)
+        if limit < 1:
+            return JsonResponse({"error": "Invalid limit"}, status=400)
+
+        qs = filter_alerts(FallAlert.objects.all(), request.GET)
+        since = request.GET.get("since")
+        resent = []
+        if since:
+            overlap = getattr(settings, "ALERT_FEED_OVERLAP_SECS", 10.0)
+            try:
+                rows = list(qs.filter(newer_than(since)).order_by("timestamp", "pk")[:limit + 1])
+                if overlap > 0:
+                    resent = list(
+                        qs.filter(overlap_before(since, overlap)).order_by("timestamp", "pk")[:self.MAX_LIMIT]
+                    )
+            except InvalidCursor as e:
+                return JsonResponse({"error": str(e)}, status=400)
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+        else:
+            rows = list(qs.order_by("-timestamp", "-pk")[:limit])[::-1]
+            has_more = False
+
+        return JsonResponse({
+            "alerts": [self.serialize(alert) for alert in resent + rows],
+            "cursor": cursor_for(rows[-1]) if rows else since,
+            "has_more": has_more,
+        }, status=200)
+
+    @staticmethod
+    def serialize(alert: FallAlert) -> dict:
+        """JSON representation of an alert for the feed."""
+        return alert_payload(alert)
+
+
+class AlertObservationsView(LoginRequiredMixin, View):
+    """
+    JSON time series of the live sightings (FallObservation) of an alert's
+    incident, oldest first, read from the (alert, timestamp) index.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Return {"alert": {...}, "observations": [...]}.
+        """
+        alert = get_object_or_404(FallAlert, pk=kwargs["pk"])
+        rows = (
+            FallObservation.objects
+                           .filter(alert=alert)
+                           .order_by("timestamp")
+                           .values_list("timestamp", "track_id", "confidence", "fall_state",
+                                        "time_on_ground", "x1", "y1", "x2", "y2")
+        )
+        observations = [
+            {
+                "timestamp": timestamp.isoformat(),
+                "track_id": track_id,
+                "confidence": confidence,
+                "fall_state": fall_state,
+                "time_on_ground": time_on_ground,
+                "bbox": [x1, y1, x2, y2] if x1 is not None else None,
+            }
+            for timestamp, track_id, confidence, fall_state, time_on_ground, x1, y1, x2, y2 in rows
+        ]
+        return JsonResponse({"alert": alert_payload(alert), "observations": observations}, status=200)
+
+
+class AlertEventStreamView(LoginRequiredMixin, View):
+    """
+    Server-sent events stream of alert changes (alert.created, alert.escalated,
+    alert.acknowledged) for live screens, fed by the EventBroker.
+
+    A reconnecting client sends the last received event id (an alert cursor)
+    as Last-Event-ID and first receives the alerts created in the meantime.
+
+    The stream is only served under ASGI, where it waits on the event loop.
+    Under WSGI each open screen would hold a worker thread for as long as it
+    stays open, so the view answers 204 (EventSource then stops reconnecting)
+    and the dashboard falls back to periodic refreshes.
+
+    Without a cross-process relay (ALERT_EVENTS_REDIS_URL) the broker only
+    sees the alerts of this process: the stream then also polls the database
+    every ALERT_EVENTS_POLL_SECS for alerts created by other processes.
+    """
+    HEARTBEAT_SECS = 15   # Keeps proxies from closing an idle connection
+    REPLAY_LIMIT   = 100
+
+    def get(self, request, *args, **kwargs):
+        """
+        Open the event stream (ASGI only).
+        """
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+        stream = self.stream(request.headers.get("Last-Event-ID"))
+        response = StreamingHttpResponse(stream, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # Disable nginx buffering
+        return response
+
+    def missed_alerts(self, cursor, overlap=0.0):
+        """
+        Return the notifications of the alerts created after `cursor` and the
+        cursor to continue from (None if `cursor` is invalid).
+
+        With `overlap`, the alerts stamped up to `overlap` seconds before the
+        cursor are returned too: they may have committed since it was read.
+        """
+        try:
+            new = list(
+                FallAlert.objects.filter(newer_than(cursor)).order_by("timestamp", "pk")[:self.REPLAY_LIMIT]
+            )
+            resent = list(
+                FallAlert.objects.filter(overlap_before(cursor, overlap))
+                                 .order_by("timestamp", "pk")[:self.REPLAY_LIMIT]
+            ) if overlap > 0 else []
+        except InvalidCursor:
+            return [], None
+        notifications = [
+            AlertNotification(type="alert.created", data=alert_payload(alert), id=cursor_for(alert))
+            for alert in resent + new
+        ]
+        return notifications, cursor_for(new[-1]) if new else cursor
+
+    async def stream(self, last_event_id):
+        """Event stream served from the ASGI event loop."""
+        # Subscribed once the server starts sending, so a response that is never
+        # iterated holds no subscription; the missed alerts are read after it, so
+        # nothing falls in between
+        subscription = alert_events.subscribe()
+        try:
+            poll = 0.0 if alert_events.cross_process else getattr(settings, "ALERT_EVENTS_POLL_SECS", 5.0)
+            overlap = getattr(settings, "ALERT_FEED_OVERLAP_SECS", 10.0)
+            sent = deque(maxlen=1000)   # Ids of the created alerts already sent (polls overlap)
+
+            replay, cursor = [], None
+            if last_event_id:
+                replay, cursor = await sync_to_async(self.missed_alerts)(last_event_id)
+            cursor = cursor or encode_cursor(timezone.now(), 0)
+            yield "retry: 3000\n\n"
+            for notification in replay:
+                sent.append(notification.data["id"])
+                yield notification.to_sse()
+
+            loop = asyncio.get_running_loop()
+            last_write = loop.time()
+            next_poll = loop.time() + poll
+            while True:
+                timeout = last_write + self.HEARTBEAT_SECS - loop.time()
+                if poll > 0:
+                    timeout = min(timeout, next_poll - loop.time())
+                notification = await subscription.aget(timeout=max(timeout, 0.0))
+
+                chunks = []
+                if notification is not None:
+                    if notification.type == "alert.created":
+                        sent.append(notification.data["id"])
+                    chunks.append(notification.to_sse())
+                if poll > 0 and loop.time() >= next_poll:
+                    next_poll = loop.time() + poll
+                    polled, cursor = await sync_to_async(self.missed_alerts)(cursor, overlap)
+                    for missed in polled:
+                        if missed.data["id"] not in sent:
+                            sent.append(missed.data["id"])
+                            chunks.append(missed.to_sse())
+                if not chunks and loop.time() - last_write >= self.HEARTBEAT_SECS:
+                    chunks.append(": keepalive\n\n")
+
+                for chunk in chunks:
+                    yield chunk
+                if chunks:
+                    last_write = loop.time()
+        finally:
+            subscription.close()
+
+
 class AcknowledgeAlertView(LoginRequiredMixin, RedirectView):
     """
     Marks an alert as acknowledged and optionally marks its accuracy.
@@ -260,28 +421,36 @@ class AcknowledgeAlertView(LoginRequiredMixin, RedirectView):
         alert.acknowledged = True
         alert.acknowledged_by = self.request.user
         alert.acknowledged_at = timezone.now()
+        update_fields = ["acknowledged", "acknowledged_by", "acknowledged_at"]
         
         # Set accuracy if specified
         if is_accurate is not None:
             alert.is_accurate = is_accurate == 'true'
             alert.accuracy_marked_by = self.request.user
             alert.accuracy_marked_at = timezone.now()
+            update_fields += ["is_accurate", "accuracy_marked_by", "accuracy_marked_at"]
             
             accuracy_text = "accurate" if alert.is_accurate else "inaccurate"
             messages.success(self.request, f"Alert acknowledged and marked as {accuracy_text}.")
         else:
             messages.success(self.request, "Alert acknowledged successfully.")
         
-        alert.save()
+        # Only these columns, so a concurrent escalation of the alert is kept
+        alert.save(update_fields=update_fields)
         return reverse_lazy("detection:alerts")
 
 class TestDetectionView(LoginRequiredMixin, FormView):
     """
     Handles file uploads for test fall detection and displays results.
+
+    Images are analysed in the request. Videos are analysed as a whole by a
+    background job (see jobs.py): the upload redirects to `?job=<id>`, which
+    shows the job's progress until its results can be rendered.
     """
     template_name = "detection/test_detection.html"
     form_class    = TestDetectionForm
     success_url   = reverse_lazy("detection:test_detection")
+    IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tiff")
 
     def get_context_data(self, **kwargs):
         """
@@ -294,75 +463,64 @@ class TestDetectionView(LoginRequiredMixin, FormView):
         context["processed_image"] = kwargs.get("processed_image")
         context["fall_detected"]   = kwargs.get("fall_detected")
         context["confidence"]      = kwargs.get("confidence")
+        # whole-video analysis: per-second timeline and position of the preview frame
+        context["analysis"]        = kwargs.get("analysis")
+
+        job = self._requested_job()
+        if job is not None and job.status == Job.SUCCEEDED:
+            result = job.result
+            context["processed_image"] = result["preview"]
+            context["fall_detected"]   = result["fall"]
+            context["confidence"]      = result["confidence"] * 100 if result["confidence"] else None
+            context["analysis"]        = result
+        elif job is not None:
+            context["job"] = job
         return context
 
+    def _requested_job(self):
+        """The video analysis job of the `?job=` parameter, if any."""
+        job_id = self.request.GET.get("job")
+        if not job_id:
+            return None
+        try:
+            return Job.objects.filter(pk=job_id, kind="analyze_upload").first()
+        except ValidationError:
+            return None
+
     def form_valid(self, form):
         """
-        Process the uploaded file, run fall detection, and render results.
+        Run fall detection on an uploaded image, or queue the analysis of a video.
         """
         upload      = form.cleaned_data["upload_file"]
         description = form.cleaned_data.get("description", "")
-        temp_path   = None
+        ext         = os.path.splitext(upload.name)[1].lower()
+
+        if ext not in self.IMAGE_EXTENSIONS:
+            # Videos: kept in storage for the job, which deletes them when done
+            stored = default_storage.save(f"job_uploads/{uuid.uuid4().hex}{ext}", upload)
+            job = job_queue.enqueue(
+                "analyze_upload",
+                {"upload": stored, "name": upload.name, "description": description},
+                user=self.request.user,
+            )
+            return redirect(f"{self.success_url}?job={job.pk}")
 
         try:
-            # --- 1. save temp file so OpenCV can read it ---
-            if hasattr(upload, "temporary_file_path"):
-                temp_path = upload.temporary_file_path()
-            else:
-                import tempfile
-                suffix = os.path.splitext(upload.name)[1]
-                tmp    = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-                for chunk in upload.chunks():
-                    tmp.write(chunk)
-                tmp.flush(); tmp.close()
-                temp_path = tmp.name
-
-            # --- 2. read first frame ---
-            ext = os.path.splitext(upload.name)[1].lower()
-            if ext in [".jpg", ".jpeg", ".png", ".bmp", ".tiff"]:
-                frame = cv2.imdecode(
-                    np.fromfile(temp_path, dtype=np.uint8),
-                    cv2.IMREAD_COLOR
-                )
-            else:
-                cap = cv2.VideoCapture(temp_path)
-                ret, frame = cap.read()
-                cap.release()
-                if not ret:
-                    raise ValueError("Impossible de lire la première frame de la vidéo.")
-
-            # --- 3. run raw inference + boolean detection ---
-            raw_results      = fall_service.run_model(frame)
-            fall_detected, confidence = fall_service.detect_falls(frame)
-
-            # --- 4. draw boxes & labels on a copy of the frame ---
-            proc = frame.copy()
-            for r in raw_results:
-                for box in r.boxes:
-                    # unpack xyxy Tensor → Python ints
-                    x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                    cv2.rectangle(proc, (x1, y1), (x2, y2), (0, 0, 255), 2)
-
-                    # safely cast confidence Tensor → float before formatting
-                    cls_name = r.names[int(box.cls)]
-                    conf     = float(box.conf)
-                    label    = f"{cls_name}:{conf:.2f}"
-
-                    cv2.putText(
-                        proc,
-                        label,
-                        (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX,
-                        0.5,
-                        (0, 0, 255),
-                        1
-                    )
-
-            # --- 5. encode to base64 for template preview ---
-            _, buf  = cv2.imencode('.jpg', proc)
+            # --- 1. decode the image ---
+            frame = cv2.imdecode(np.frombuffer(upload.read(), dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                raise ValueError("Impossible de lire l'image.")
+
+            # --- 2. run a single inference pass (batched with the live frames) ---
+            detection     = inference_scheduler.submit(frame)
+            fall_detected = detection.fall
+            confidence    = detection.confidence
+
+            # --- 3. draw boxes & labels, encode to base64 for template preview ---
+            _, buf  = cv2.imencode('.jpg', detection.draw(frame))
             img_b64 = base64.b64encode(buf).decode()
 
-            # --- 6. if fall → create test alert in DB ---
+            # --- 4. if fall → create test alert in DB ---
             if fall_detected:
                 alert_data = {
                     "detected_by": "test_upload",
@@ -382,7 +540,7 @@ class TestDetectionView(LoginRequiredMixin, FormView):
             else:
                 messages.info(self.request, "Aucune chute détectée pour ce fichier.")
 
-            # --- 7. render immediately with the preview card shown ---
+            # --- 5. render immediately with the preview card shown ---
             return render(
                 self.request,
                 self.template_name,
@@ -398,19 +556,30 @@ class TestDetectionView(LoginRequiredMixin, FormView):
             messages.error(self.request, f"Error processing upload: {e}")
             return super().form_valid(form)
 
-        finally:
-            if temp_path and not hasattr(upload, "temporary_file_path"):
-                try:
-                    os.remove(temp_path)
-                except OSError:
-                    pass
+
+class ClientAlertHandler(IncidentHandler):
+    """
+    Opens the alerts posted by browser clients to CreateAlertView.
+    """
+
+    def open(self, observation):
+        """Create the alert from the posted fields."""
+        return FallAlert.objects.create(**observation.payload).pk
+
 
 class CreateAlertView(LoginRequiredMixin, View):
     """
-    API endpoint to create or update a FallAlert (live_camera alerts are throttled).
+    API endpoint to create or update a FallAlert (live_camera alerts are deduplicated).
     Handles yolo_confidence, yolo_class, description, snapshot_b64, and video clip.
+
+    Posts of a live_camera client while its incident is open (seen within the
+    last INCIDENT_TTL_SECS) return the open alert without any database write.
     """
-    THRESHOLD = timedelta(seconds=30)
+    incidents = IncidentEngine(
+        ClientAlertHandler(),
+        ttl=getattr(settings, "INCIDENT_TTL_SECS", 30.0),
+        prefix="client_incidents",
+    )
 
     def post(self, request, *args, **kwargs):
         """
@@ -430,36 +599,6 @@ class CreateAlertView(LoginRequiredMixin, View):
         snapshot_b64 = payload.get("snapshot_b64")
         make_clip    = payload.get("make_clip", False)
 
-        now = timezone.now()
-
-        # 2. Si c'est un live_camera, voir si on dépasse le seuil de throttle
-        if alert_type == "live_camera":
-            last = (
-                FallAlert.objects
-                         .filter(detected_by="live_camera")
-                         .order_by("-timestamp")
-                         .first()
-            )
-            if last and (now - last.timestamp) < self.THRESHOLD:
-                # réutiliser la même alerte
-                alert = last
-                alert.yolo_confidence = yolo_conf
-                alert.yolo_class      = yolo_cls
-                alert.description     = "Fall detected via YOLOv8"
-                alert.metadata        = metadata
-                alert.save()
-
-                # snapshot, si fourni
-                if snapshot_b64:
-                    self._attach_snapshot(alert, snapshot_b64)
-
-                # clip, si demandé
-                if make_clip:
-                    self._attach_clip(alert)
-
-                return JsonResponse({"status":"updated","alert_id":alert.id}, status=200)
-
-        # 3. Sinon, créer une nouvelle alerte
         alert_data = {
             "detected_by": alert_type,
             "description": description or ("Fall detected via YOLOv8"
@@ -468,23 +607,47 @@ class CreateAlertView(LoginRequiredMixin, View):
             "yolo_class": yolo_cls,
             "metadata": metadata,
         }
-        
+
         # Add fall_state if tracking is enabled
         if TRACKING_ENABLED:
             alert_data["fall_state"] = "monitoring"  # Start with monitoring state
-        
-        alert = FallAlert(**alert_data)
-        alert.save()
+
+        # 2. Si c'est un live_camera, rattacher à l'incident ouvert (pas d'écriture en base)
+        if alert_type == "live_camera":
+            observation = Observation(
+                camera_id=alert_type,
+                track_id="client",
+                fall_state="monitoring",
+                confidence=yolo_conf,
+                payload=alert_data,
+            )
+            action, alert_id = self.incidents.observe(observation)
+            if action != IncidentEngine.OPENED:
+                if not make_clip:
+                    return JsonResponse({"status":"updated","alert_id":alert_id}, status=200)
+                # clip, si demandé (extrait en tâche de fond)
+                alert = FallAlert.objects.filter(pk=alert_id).first()
+                if alert is not None:
+                    response = {"status":"updated","alert_id":alert_id,"clip_job":self._attach_clip(alert)}
+                    return JsonResponse(response, status=200)
+                # L'alerte de l'incident a été supprimée : oublier l'incident et en ouvrir un nouveau
+                self.incidents.discard(alert_type, observation.track_id)
+                action, alert_id = self.incidents.observe(observation)
+            alert = FallAlert.objects.get(pk=alert_id)
+        else:
+            # 3. Sinon, créer une nouvelle alerte
+            alert = FallAlert.objects.create(**alert_data)
 
         # 4. Attacher snapshot
         if snapshot_b64:
             self._attach_snapshot(alert, snapshot_b64)
 
-        # 5. Attacher clip vidéo si demandé
+        # 5. Attacher clip vidéo si demandé (extrait en tâche de fond)
+        response = {"status":"created","alert_id":alert.id}
         if make_clip:
-            self._attach_clip(alert)
+            response["clip_job"] = self._attach_clip(alert)
 
-        return JsonResponse({"status":"created","alert_id":alert.id}, status=201)
+        return JsonResponse(response, status=201)
 
     def _attach_snapshot(self, alert: FallAlert, b64: str) -> None:
         """
@@ -500,151 +663,93 @@ class CreateAlertView(LoginRequiredMixin, View):
         django_file = ContentFile(decoded, name=filename)
         alert.image_snapshot.save(filename, django_file, save=True)
 
-    def _attach_clip(self, alert: FallAlert) -> None:
+    def _attach_clip(self, alert: FallAlert) -> str:
         """
-        Use VideoClipService to attach a short video clip around alert.timestamp.
+        Queue a job attaching a short video clip around alert.timestamp
+        (VideoClipService) and return its id.
         """
-        from django.conf import settings
-        clip_service = VideoClipService(settings.CAMERA_RTSP_URL)
-        ts = alert.timestamp.timestamp()
-        clip_service.attach_clip_to_alert(alert, start_time=ts, duration=10.0)
+        job = job_queue.enqueue(
+            "attach_clip",
+            {"alert_id": alert.pk, "source": settings.CAMERA_RTSP_URL, "duration": 10.0},
+            user=self.request.user,
+        )
+        return str(job.pk)
 
 class RunYoloView(View):
     """
-    API endpoint to run YOLO inference on a base64 image and (optionally) create/update a live_camera alert.
+    API endpoint to run YOLO inference on a frame and (optionally) create/update a live_camera alert.
     Throttles alert creation to avoid duplicates and integrates fall tracking with improved persistence.
-    """
-    THRESHOLD_SECS = 30         # Do not create more than one alert every 30 seconds
-    CACHE_KEY      = "last_live_alert_ts"
 
+    The frame can be posted as JSON ({"image": "<base64>"}), as a raw `image/jpeg`
+    body, or as multipart/form-data with an `image` file part.
+    """
     def post(self, request, *args, **kwargs):
         """
-        Handle POST request with base64 image, run YOLO inference, and manage alert creation with improved tracking.
+        Handle POST request with an image, run YOLO inference, and manage alert creation with improved tracking.
         """
         try:
-            payload = json.loads(request.body.decode("utf-8"))
-        except json.JSONDecodeError:
-            return HttpResponseBadRequest("Invalid JSON")
-
-        base64_data = payload.get("image")
-        if not base64_data:
-            return JsonResponse({"error": "No image provided"}, status=400)
-
-        try:
-            img_bytes = base64.b64decode(base64_data)
-            nparr = np.frombuffer(img_bytes, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            if img is None:
-                raise ValueError("Image décompressée est None")
-        except Exception as e:
-            return JsonResponse({"error": f"Invalid image data: {str(e)}"}, status=400)
+            img = decode_request_frame(request)
+        except FrameDecodeError as e:
+            return JsonResponse({"error": str(e)}, status=400)
 
         try:
-            # Run YOLO detection
-            results = fall_service.run_model(img)
-            fall_detected, confidence = fall_service.detect_falls(img)
-            
-            # Initialize tracking variables
-            fall_state_value = "monitoring"
-            time_on_ground = 0
-            bbox_data = None
-            
-            # Always update missed detections counter (even if no fall detected)
-            if TRACKING_ENABLED:
-                fall_tracker.update_missed_detections()
-            
-            if not fall_detected:
-                # Check if we have persistent states to return
-                if TRACKING_ENABLED:
-                    persistent_states = fall_tracker.get_persistent_states()
-                    if persistent_states:
-                        # Return the most urgent persistent state
-                        person_id = "live_camera_person"
-                        if person_id in persistent_states:
-                            state = persistent_states[person_id]
-                            return JsonResponse({
-                                "fall": True,
-                                "confidence": 0.8,  # Confidence persistante
-                                "fall_state": state.current_state.value,
-                                "time_on_ground": state.time_on_ground(),
-                                "bbox": None,  # Pas de nouvelle bbox
-                                "persistent": True  # Indique que c'est un état persistant
-                            }, status=200)
-                
-                return JsonResponse({"fall": False}, status=200)
-            
-            # Extract bounding box for tracking (if tracking is enabled)
-            if TRACKING_ENABLED:
-                bbox = None
-                for r in results:
-                    for box in r.boxes:
-                        if r.names[int(box.cls)] == "Fall-Detected":
-                            bbox = tuple(map(int, box.xyxy[0].tolist()))
-                            bbox_data = {
-                                "x1": bbox[0],
-                                "y1": bbox[1], 
-                                "x2": bbox[2],
-                                "y2": bbox[3],
-                                "width": bbox[2] - bbox[0],
-                                "height": bbox[3] - bbox[1]
-                            }
-                            break
-                    if bbox:
-                        break
-                
-                if bbox:
-                    # Update fall tracker
-                    person_id = "live_camera_person"  # Single person tracking for live camera
-                    fall_state, time_on_ground = fall_tracker.update_detection(person_id, bbox)
-                    fall_state_value = fall_state.value
-            
-        except Exception as e:
+            response_data = live_pipeline.process(img)
+        except InferenceError as e:
             return JsonResponse({"error": f"YOLO inference error: {str(e)}"}, status=500)
 
-        now = timezone.now()
-        last_ts = cache.get(self.CACHE_KEY)
-        reuse = last_ts and (now.timestamp() - last_ts) < self.THRESHOLD_SECS
+        return JsonResponse(response_data, status=200)
+
+
+class JobStatusView(LoginRequiredMixin, View):
+    """
+    API endpoint returning the status, progress and result of a background job.
+    """
+
+    def get(self, request, pk, *args, **kwargs):
+        """
+        Return the job as JSON (polled by the upload page).
+        """
+        job = get_object_or_404(Job, pk=pk)
+        return JsonResponse(job_payload(job), status=200)
 
-        if reuse:
-            alert = (
-                FallAlert.objects
-                         .filter(detected_by="live_camera")
-                         .order_by("-timestamp")
-                         .first()
-            )
-            if alert:
-                alert.yolo_confidence = confidence
-                if TRACKING_ENABLED:
-                    alert.fall_state = fall_state_value
-                    alert.time_on_ground = time_on_ground
-                alert.save()
-                alert.save_snapshot_from_frame(img)
-                alert.save()
-        else:
-            alert_data = {
-                "detected_by": "live_camera",
-                "description": "Fall detected via YOLOv8",
-                "yolo_confidence": confidence,
-                "yolo_class": "Fall-Detected",
-            }
-            
-            if TRACKING_ENABLED:
-                alert_data["fall_state"] = fall_state_value
-                alert_data["time_on_ground"] = time_on_ground
-            
-            alert = FallAlert.objects.create(**alert_data)
-            alert.save_snapshot_from_frame(img)
-            alert.save()
-            cache.set(self.CACHE_KEY, now.timestamp(), timeout=None)
 
-        response_data = {
-            "fall": True, 
-            "confidence": confidence,
+class JobCancelView(LoginRequiredMixin, View):
+    """
+    API endpoint cancelling a background job: a queued job never starts, a
+    running job stops at its next progress report.
+    """
+
+    def post(self, request, pk, *args, **kwargs):
+        """
+        Request the cancellation and return the job as JSON.
+        """
+        job = job_queue.cancel(get_object_or_404(Job, pk=pk))
+        return JsonResponse(job_payload(job), status=200)
+
+
+class InferenceMetricsView(LoginRequiredMixin, View):
+    """
+    API endpoint exposing live pipeline metrics (model load timings, batching,
+    motion gate skip rate, alert writer queue, frame buffer memory and clip
+    encoding) as JSON.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """
+        Return the current metrics of the inference pipeline.
+        """
+        data = {
+            "models": model_registry.metrics(),
+            "jobs": job_queue.metrics(),
+            "batching": inference_scheduler.metrics(),
+            "alert_writer": alert_writer.metrics(),
+            "alert_events": alert_events.metrics(),
+            "incidents": live_pipeline.incidents.metrics(),
+            "observations": observation_recorder.metrics(),
         }
-        
-        if TRACKING_ENABLED:
-            response_data["fall_state"] = fall_state_value
-            response_data["time_on_ground"] = time_on_ground
-            response_data["bbox"] = bbox_data
-        
-        return JsonResponse(response_data, status=200)
\ No newline at end of file
+        if motion_gate is not None:
+            data["motion_gate"] = motion_gate.metrics()
+        if clip_recorder is not None:
+            data["frame_buffers"] = clip_recorder.buffers.metrics()
+            data["clips"] = clip_recorder.metrics()
+        return JsonResponse(data, status=200)